@@ -0,0 +1,36 @@
+import typing as t
+
+from PIL import Image as PILImage
+
+from tungstenkit import BaseIO, Image, MaskedImage, define_model
+
+
+class Input(BaseIO):
+    masked_image: MaskedImage
+
+
+class Output(BaseIO):
+    done: bool
+
+
+@define_model(
+    input=Input,
+    output=Output,
+    include_files=[__file__],
+)
+class MaskedImageModel:
+    def setup(self):
+        pass
+
+    def predict(self, inputs: t.List[Input]) -> t.List[Output]:
+        return [Output(done=True) for _ in inputs]
+
+    @staticmethod
+    def create_input(size: int) -> Input:
+        gradient = PILImage.linear_gradient("L").resize((size, size))
+        return Input(
+            masked_image=MaskedImage(
+                image=Image.from_pil_image(gradient.convert("RGB")),
+                mask=Image.from_pil_image(gradient),
+            )
+        )
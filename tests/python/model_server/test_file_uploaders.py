@@ -0,0 +1,377 @@
+import errno
+import os
+import time
+import typing as t
+from pathlib import Path
+from uuid import uuid4
+
+import boto3
+import pytest
+import requests
+from azure.core.exceptions import ServiceRequestError
+from azure.storage.blob import ContainerClient
+from moto.server import ThreadedMotoServer
+from w3lib.url import parse_data_uri
+
+from tungstenkit import exceptions
+from tungstenkit._internal.io import Binary, File, Image
+from tungstenkit._internal.model_server.file_uploaders import (
+    DedupFileUploader,
+    local_fs_file_uploader,
+)
+from tungstenkit._internal.model_server.file_uploaders.azure_file_uploader import (
+    AzureBlobFileUploader,
+)
+from tungstenkit._internal.model_server.file_uploaders.in_memory_file_uploader import (
+    InMemoryFileUploader,
+)
+from tungstenkit._internal.model_server.file_uploaders.local_fs_file_uploader import (
+    LocalFSFileUploader,
+)
+from tungstenkit._internal.model_server.file_uploaders.s3_file_uploader import S3FileUploader
+
+S3_BUCKET = "outputs"
+AZURITE_URL = os.environ.get("AZURITE_BLOB_URL", "http://127.0.0.1:10000/devstoreaccount1")
+# Well-known account key of the Azurite emulator
+AZURITE_ACCOUNT_KEY = (
+    "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+)
+
+
+@pytest.fixture
+def s3_endpoint(monkeypatch: pytest.MonkeyPatch) -> t.Iterator[str]:
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    endpoint = f"http://{host}:{port}"
+    boto3.client("s3", endpoint_url=endpoint).create_bucket(Bucket=S3_BUCKET)
+    yield endpoint
+    server.stop()
+
+
+@pytest.fixture
+def azure_container_url() -> t.Iterator[str]:
+    container_url = f"{AZURITE_URL}/outputs-{uuid4().hex}"
+    container = ContainerClient.from_container_url(
+        container_url, credential=AZURITE_ACCOUNT_KEY, retry_total=0
+    )
+    try:
+        container.create_container()
+    except ServiceRequestError:
+        pytest.skip(f"Azurite is not running at {AZURITE_URL}")
+    yield container_url
+    container.delete_container()
+
+
+def _write_file(path: Path, data: bytes) -> Path:
+    path.write_bytes(data)
+    return path
+
+
+def test_in_memory_file_uploader(tmp_path: Path):
+    png = os.urandom(1024 * 1024 + 1)
+    text = b"hello world\n" * 1000
+    binary = bytes(range(256))
+    files = [
+        Image.from_path(_write_file(tmp_path / "image.png", png)),
+        File.from_path(_write_file(tmp_path / "text", text)),
+        Binary.from_path(_write_file(tmp_path / "binary", binary)),
+        Binary.from_bytes(binary),
+        File.from_path(_write_file(tmp_path / "empty", b"")),
+    ]
+
+    uploaded = InMemoryFileUploader().upload(files)
+    assert [f.__class__ for f in uploaded] == [f.__class__ for f in files]
+    parsed = [parse_data_uri(f.__root__) for f in uploaded]
+    assert [p.data for p in parsed] == [png, text, binary, binary, b""]
+    assert [p.media_type for p in parsed] == [
+        "image/png",
+        "text/plain",
+        "application/octet-stream",
+        "application/octet-stream",
+        "text/plain",
+    ]
+    assert uploaded[3].__root__ is files[3].__root__
+    assert InMemoryFileUploader().upload([]) == []
+
+
+def test_in_memory_file_uploader_throughput(tmp_path: Path):
+    num_batches = 3
+    batch_size = 8
+    file_size = 8 * 1024 * 1024
+    files = [
+        Image.from_path(_write_file(tmp_path / f"image{i}.png", os.urandom(file_size)))
+        for i in range(batch_size)
+    ]
+    uploader = InMemoryFileUploader()
+
+    start_time = time.monotonic()
+    for _ in range(num_batches):
+        uploaded = uploader.upload(files)
+    elapsed = time.monotonic() - start_time
+
+    assert parse_data_uri(uploaded[-1].__root__).data == files[-1].path.read_bytes()
+    throughput = num_batches * batch_size * file_size / elapsed / 1024 / 1024
+    print(f"In-memory upload throughput: {throughput:.0f}MB/s")
+    assert throughput > 50
+
+
+def test_local_fs_file_uploader(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    mount_point = tmp_path / "mount"
+    temp_dir = tmp_path / "tmp"
+    mount_point.mkdir()
+    temp_dir.mkdir()
+    uploader = LocalFSFileUploader(mount_point=mount_point, temp_dirs=[temp_dir])
+
+    # Hardlinked, since it is on the same filesystem
+    src = _write_file(tmp_path / "image.png", b"png")
+    uploaded = uploader.upload([Image.from_path(src), Image.from_path(src)])
+    assert uploaded[0].__root__ == uploaded[1].__root__
+    dest = uploaded[0].path
+    assert dest.parent == mount_point and dest.name.endswith("-image.png")
+    assert dest.stat().st_ino == src.stat().st_ino
+    assert dest.stat().st_mode & 0o777 == 0o666
+
+    # Without hardlinks and reflinks, temp files are moved and the others are copied
+    def unsupported(src: Path, dest: Path) -> bool:
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(local_fs_file_uploader, "_link", unsupported)
+    monkeypatch.setattr(local_fs_file_uploader, "_reflink", unsupported)
+    temp_file = _write_file(temp_dir / "temp", b"temp")
+    uploaded = uploader.upload([File.from_path(temp_file), File.from_path(src)])
+    assert [f.path.read_bytes() for f in uploaded] == [b"temp", b"png"]
+    assert not temp_file.exists()
+    assert src.exists() and uploaded[1].path.stat().st_ino != src.stat().st_ino
+
+    assert uploader.upload([]) == []
+
+
+def test_local_fs_file_uploader_sync_timeout(tmp_path: Path):
+    start_time = time.monotonic()
+    with pytest.raises(exceptions.UploadError):
+        local_fs_file_uploader._wait_for_sync([tmp_path / "missing"], timeout=0.3)
+    assert 0.3 <= time.monotonic() - start_time < 1
+
+
+def test_local_fs_file_uploader_latency(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    file_size = 256 * 1024 * 1024
+    mount_point = tmp_path / "mount"
+    mount_point.mkdir()
+    src = tmp_path / "video.mp4"
+    with open(src, "wb") as f:
+        for _ in range(file_size // (16 * 1024 * 1024)):
+            f.write(os.urandom(16 * 1024 * 1024))
+    uploader = LocalFSFileUploader(mount_point=mount_point, temp_dirs=[])
+
+    start_time = time.monotonic()
+    uploader.upload([File.from_path(src)])
+    link_latency = time.monotonic() - start_time
+
+    monkeypatch.setattr(local_fs_file_uploader, "_link", lambda src, dest: False)
+    monkeypatch.setattr(local_fs_file_uploader, "_reflink", lambda src, dest: False)
+    start_time = time.monotonic()
+    uploader.upload([File.from_path(src)])
+    copy_latency = time.monotonic() - start_time
+
+    print(
+        f"Local FS upload latency of {file_size // 1024 // 1024}MB: "
+        f"{link_latency * 1000:.1f}ms (hardlink), {copy_latency * 1000:.1f}ms (copy)"
+    )
+    assert link_latency * 10 < copy_latency
+
+
+def test_s3_file_uploader(tmp_path: Path, s3_endpoint: str):
+    png = os.urandom(1024)
+    large = os.urandom(40 * 1024 * 1024)
+    binary = bytes(range(256))
+    files = [
+        Image.from_path(_write_file(tmp_path / "a.png", png)),
+        Image.from_path(_write_file(tmp_path / "b.png", png)),
+        Binary.from_bytes(binary),
+        File.from_path(_write_file(tmp_path / "large.bin", large)),
+    ]
+    uploader = S3FileUploader(url=f"{s3_endpoint}/{S3_BUCKET}/prefix")
+
+    uploaded = uploader.upload(files)
+    assert [f.__class__ for f in uploaded] == [f.__class__ for f in files]
+    # Identical files are stored once
+    assert uploaded[0].__root__ == uploaded[1].__root__
+    responses = [requests.get(f.__root__) for f in uploaded]
+    assert [r.status_code for r in responses] == [200] * 4
+    assert [r.content for r in responses] == [png, png, binary, large]
+    assert responses[0].headers["content-type"] == "image/png"
+    assert responses[2].headers["content-type"] == "application/octet-stream"
+
+    client = boto3.client("s3", endpoint_url=s3_endpoint)
+    objects = client.list_objects_v2(Bucket=S3_BUCKET)["Contents"]
+    assert len(objects) == 3
+    assert all(o["Key"].startswith("prefix/") for o in objects)
+    # Uploaded in 5 parts
+    etags = [o["ETag"] for o in objects if o["Size"] == len(large)]
+    assert len(etags) == 1 and etags[0].endswith('-5"')
+
+    # Files in the bucket are not uploaded again
+    last_modified = {o["Key"]: o["LastModified"] for o in objects}
+    time.sleep(1)
+    assert [f.__root__.split("?")[0] for f in uploader.upload(files)] == [
+        f.__root__.split("?")[0] for f in uploaded
+    ]
+    objects = client.list_objects_v2(Bucket=S3_BUCKET)["Contents"]
+    assert {o["Key"]: o["LastModified"] for o in objects} == last_modified
+
+    public_uploader = S3FileUploader(
+        url=f"{s3_endpoint}/{S3_BUCKET}", public_url="https://cdn.example.com/outputs/"
+    )
+    uploaded = public_uploader.upload(files[:1])
+    assert uploaded[0].__root__.startswith("https://cdn.example.com/outputs/")
+    assert uploaded[0].__root__.endswith(".png")
+
+
+def test_s3_file_uploader_invalid_url():
+    with pytest.raises(ValueError):
+        S3FileUploader(url="http://localhost:9000")
+
+
+def test_azure_blob_file_uploader(tmp_path: Path, azure_container_url: str):
+    png = os.urandom(1024)
+    large = os.urandom(40 * 1024 * 1024)
+    binary = bytes(range(256))
+    files = [
+        Image.from_path(_write_file(tmp_path / "a.png", png)),
+        Image.from_path(_write_file(tmp_path / "b.png", png)),
+        Binary.from_bytes(binary),
+        File.from_path(_write_file(tmp_path / "large.bin", large)),
+    ]
+    uploader = AzureBlobFileUploader(url=azure_container_url, account_key=AZURITE_ACCOUNT_KEY)
+
+    uploaded = uploader.upload(files)
+    assert [f.__class__ for f in uploaded] == [f.__class__ for f in files]
+    # Identical files are stored once
+    assert uploaded[0].__root__.split("?")[0] == uploaded[1].__root__.split("?")[0]
+    responses = [requests.get(f.__root__) for f in uploaded]
+    assert [r.status_code for r in responses] == [200] * 4
+    assert [r.content for r in responses] == [png, png, binary, large]
+    assert responses[0].headers["content-type"] == "image/png"
+    assert responses[2].headers["content-type"] == "application/octet-stream"
+
+    container = ContainerClient.from_container_url(
+        azure_container_url, credential=AZURITE_ACCOUNT_KEY
+    )
+    blobs = list(container.list_blobs())
+    assert len(blobs) == 3
+    # Staged in 5 blocks
+    large_blob_name = next(b.name for b in blobs if b.size == len(large))
+    committed, _ = container.get_blob_client(large_blob_name).get_block_list()
+    assert len(committed) == 5
+
+    # Files in the container are not uploaded again
+    last_modified = {b.name: b.last_modified for b in blobs}
+    time.sleep(1)
+    uploader.upload(files)
+    assert {b.name: b.last_modified for b in container.list_blobs()} == last_modified
+
+    public_uploader = AzureBlobFileUploader(
+        url=azure_container_url,
+        account_key=AZURITE_ACCOUNT_KEY,
+        public_url="https://cdn.example.com/outputs/",
+    )
+    uploaded = public_uploader.upload(files[:1])
+    assert uploaded[0].__root__.startswith("https://cdn.example.com/outputs/")
+    assert uploaded[0].__root__.endswith(".png")
+
+
+def test_azure_blob_file_uploader_throughput(tmp_path: Path, azure_container_url: str):
+    file_size = 256 * 1024 * 1024
+    throughputs = dict()
+    for max_concurrency in [1, 16]:
+        # Write different contents, since identical files are not uploaded again
+        path = tmp_path / f"video{max_concurrency}.mp4"
+        with open(path, "wb") as f:
+            for _ in range(file_size // (16 * 1024 * 1024)):
+                f.write(os.urandom(16 * 1024 * 1024))
+        uploader = AzureBlobFileUploader(
+            url=azure_container_url,
+            account_key=AZURITE_ACCOUNT_KEY,
+            max_concurrency=max_concurrency,
+        )
+
+        start_time = time.monotonic()
+        uploaded = uploader.upload([File.from_path(path)])
+        throughputs[max_concurrency] = file_size / (time.monotonic() - start_time) / 1024 / 1024
+        assert int(requests.head(uploaded[0].__root__).headers["content-length"]) == file_size
+
+    print(
+        f"Azure Blob upload throughput of {file_size // 1024 // 1024}MB: "
+        + ", ".join(f"{v:.0f}MB/s ({k} concurrent blocks)" for k, v in throughputs.items())
+    )
+    assert throughputs[16] > 10
+
+
+def test_dedup_file_uploader(tmp_path: Path):
+    mount_point = tmp_path / "mount"
+    mount_point.mkdir()
+    png = os.urandom(1024)
+    other = os.urandom(2048)
+    uploader = DedupFileUploader(
+        LocalFSFileUploader(mount_point=mount_point, temp_dirs=[]), max_entries=3, ttl=0.5
+    )
+
+    # Identical files in a batch are uploaded once. Files with other suffixes are not identical.
+    files = [
+        Image.from_path(_write_file(tmp_path / "a.png", png)),
+        Image.from_path(_write_file(tmp_path / "b.png", png)),
+        Image.from_path(_write_file(tmp_path / "c.png", other)),
+        Binary.from_path(_write_file(tmp_path / "d.bin", png)),
+    ]
+    uploaded = uploader.upload(files)
+    assert [f.__class__ for f in uploaded] == [f.__class__ for f in files]
+    assert [f.path.read_bytes() for f in uploaded] == [png, png, other, png]
+    assert uploaded[0].__root__ == uploaded[1].__root__
+    assert len(list(mount_point.iterdir())) == 3
+    stats = uploader.get_stats()
+    assert (stats.hits, stats.misses, stats.bytes_saved) == (1, 3, len(png))
+
+    # Uploaded files are reused across batches
+    uploaded_again = uploader.upload([Image.from_path(_write_file(tmp_path / "e.png", png))])
+    assert uploaded_again[0].__root__ == uploaded[0].__root__
+    assert len(list(mount_point.iterdir())) == 3
+    stats = uploader.get_stats()
+    assert (stats.hits, stats.misses, stats.bytes_saved) == (2, 3, 2 * len(png))
+
+    # Until they expire
+    time.sleep(0.5)
+    uploaded_again = uploader.upload(files[:1])
+    assert uploaded_again[0].__root__ != uploaded[0].__root__
+    assert len(list(mount_point.iterdir())) == 4
+    assert uploader.get_stats().misses == 4
+
+    assert uploader.upload([]) == []
+
+
+def test_dedup_file_uploader_latency(tmp_path: Path):
+    num_batches = 8
+    file_size = 8 * 1024 * 1024
+    # A placeholder emitted by every prediction
+    path = _write_file(tmp_path / "placeholder.png", os.urandom(file_size))
+    files = [Image.from_path(path)]
+    latencies = dict()
+    for name, uploader in [
+        ("in-memory", InMemoryFileUploader()),
+        ("dedup", DedupFileUploader(InMemoryFileUploader(), max_entries=16, ttl=60.0)),
+    ]:
+        uploader.upload(files)
+        start_time = time.monotonic()
+        for _ in range(num_batches):
+            uploaded = uploader.upload(files)
+        latencies[name] = (time.monotonic() - start_time) / num_batches
+        assert parse_data_uri(uploaded[0].__root__).data == path.read_bytes()
+
+    print(
+        f"Upload latency of a repeated {file_size // 1024 // 1024}MB output: "
+        + ", ".join(f"{v * 1000:.1f}ms ({k})" for k, v in latencies.items())
+    )
+    assert latencies["dedup"] * 2 < latencies["in-memory"]
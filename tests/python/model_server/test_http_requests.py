@@ -1,12 +1,33 @@
+import asyncio
+import base64
+import json
+import os
+import random
+import threading
 import time
 from typing import List, Type, TypeVar
 from urllib.parse import urljoin
 
+import httpx
 import pytest
 import requests
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
 
+from tungstenkit import BaseIO
+
+from tungstenkit._internal.model_def_loader import create_model_def_loader
+from tungstenkit._internal.model_server.config import StandaloneSettings
+from tungstenkit._internal.model_server.http_server import (
+    build_prediction_content,
+    create_app,
+)
+from tungstenkit._internal.model_server.prediction_worker import PredictionWorker
+from tungstenkit._internal.model_server.result_caches import Result
 from tungstenkit._internal.model_server.schema import (
+    DemoID,
     DemoResponse,
     PredictionID,
     PredictionRequest,
@@ -33,6 +54,345 @@ def test_file_tunnel_server_endpoints(dummy_io_generator, file_tunnel_model_serv
     _test_endpoints(dummy_io_generator, file_tunnel_model_server)
 
 
+@pytest.mark.timeout(30)
+def test_concurrent_sync_predictions(dummy_io_generator):
+    """Waiting on many synchronous predictions shouldn't occupy a thread per request"""
+    num_requests = 300
+    app, _ = _create_in_process_app()
+
+    async def run():
+        max_num_threads = baseline = threading.active_count()
+        inputs, gts = dummy_io_generator(n=num_requests, delay=0.0)
+        async with httpx.AsyncClient(app=app, base_url="http://test", timeout=20.0) as client:
+            pending = [
+                asyncio.ensure_future(
+                    client.post("/predict", json=jsonable_encoder([inp])),
+                )
+                for inp in inputs
+            ]
+            while not all(r.done() for r in pending):
+                max_num_threads = max(max_num_threads, threading.active_count())
+                await asyncio.sleep(0.01)
+        return [r.result() for r in pending], gts, max_num_threads - baseline
+
+    responses, gts, num_added_threads = asyncio.run(run())
+    assert all(resp.status_code == 200 for resp in responses)
+    assert [resp.json()["outputs"][0] for resp in responses] == gts
+    assert num_added_threads < 10
+
+
+@pytest.mark.timeout(30)
+def test_long_poll_and_event_stream(dummy_io_generator):
+    app, _ = _create_in_process_app()
+
+    async def run():
+        async with httpx.AsyncClient(app=app, base_url="http://test", timeout=10.0) as client:
+            # Long-poll returns as soon as the prediction is done
+            inputs, gts = dummy_io_generator(n=2, delay=0.5, structure_gts=True)
+            raw_resp = await client.post("/predictions", json=jsonable_encoder(inputs))
+            prediction_id = PredictionID.parse_raw(raw_resp.text).prediction_id
+            raw_resp = await client.get(f"/predictions/{prediction_id}", params={"wait": 0.1})
+            assert DummyModelPredictionResponse.parse_raw(raw_resp.text).status != "success"
+            start_time = time.monotonic()
+            raw_resp = await client.get(f"/predictions/{prediction_id}", params={"wait": 5})
+            assert time.monotonic() - start_time < 2.0
+            resp = DummyModelPredictionResponse.parse_raw(raw_resp.text)
+            assert resp.status == "success"
+            assert resp.outputs == gts
+
+            raw_resp = await client.get(f"/predictions/{prediction_id}", params={"wait": 1000})
+            assert raw_resp.status_code == 422
+            raw_resp = await client.get("/predictions/unknown/events")
+            assert raw_resp.status_code == 404
+
+            # Event stream pushes status and log updates until the demo is done
+            inputs, gts = dummy_io_generator(n=2, delay=1, structure_gts=True, print_log=True)
+            raw_resp = await client.post("/demo", json=jsonable_encoder(inputs))
+            demo_id = DemoID.parse_raw(raw_resp.text).demo_id
+            events = []
+            async with client.stream("GET", f"/demo/{demo_id}/events") as raw_resp:
+                assert raw_resp.headers["content-type"].startswith("text/event-stream")
+                async for line in raw_resp.aiter_lines():
+                    field, _, value = line.partition(":")
+                    if field == "data":
+                        events.append(DummyModelDemoResponse.parse_raw(value))
+            return events, gts
+
+    events, gts = asyncio.run(run())
+    assert events[-1].status == "success"
+    assert events[-1].outputs == gts
+    assert all(events[i] != events[i + 1] for i in range(len(events) - 1))
+    assert any(
+        e.status == "running" and e.logs and e.logs.strip() == DummyModel.build_log(2)
+        for e in events
+    )
+
+
+@pytest.mark.timeout(30)
+def test_admission_control(dummy_io_generator):
+    app, worker = _create_in_process_app(max_queued_inputs=5, max_client_concurrency=1)
+
+    async def run():
+        async with httpx.AsyncClient(app=app, base_url="http://test", timeout=10.0) as client:
+
+            async def create_pred(inputs, client_id: str = "client"):
+                return await client.post(
+                    "/predictions",
+                    json=jsonable_encoder(inputs),
+                    headers={"X-Client-ID": client_id},
+                )
+
+            # A batch is running and another is queued
+            raw_resp = await create_pred(dummy_io_generator(n=4, delay=1.0)[0])
+            assert raw_resp.status_code == 200
+            running_id = PredictionID.parse_raw(raw_resp.text).prediction_id
+            await asyncio.sleep(0.3)
+            raw_resp = await create_pred(dummy_io_generator(n=4, delay=0.5)[0], "other")
+            assert raw_resp.status_code == 200
+
+            # The queue is full
+            raw_resp = await create_pred(dummy_io_generator(n=2)[0], "another")
+            assert raw_resp.status_code == 429
+            assert int(raw_resp.headers["Retry-After"]) >= 1
+
+            # The client has too many predictions.
+            # The queue has room for one input, even if the other batch is still queued.
+            await client.get(f"/predictions/{running_id}", params={"wait": 5})
+            raw_resp = await create_pred(dummy_io_generator(n=1, delay=0.5)[0])
+            assert raw_resp.status_code == 200
+            raw_resp = await create_pred(dummy_io_generator(n=1, delay=0.5)[0])
+            assert raw_resp.status_code == 429
+            assert int(raw_resp.headers["Retry-After"]) >= 1
+
+    asyncio.run(run())
+    stats = worker.get_admission_stats()
+    assert stats.admitted == 3
+    assert stats.rejected_queue_full == 1
+    assert stats.rejected_client_limit == 1
+    assert stats.batch_latency is not None and stats.batch_latency >= 1.0
+
+
+@pytest.mark.timeout(30)
+def test_metrics(dummy_io_generator):
+    app, _ = _create_in_process_app(memoize_size=4, output_dedup_size=4)
+
+    async def run():
+        async with httpx.AsyncClient(app=app, base_url="http://test", timeout=10.0) as client:
+            inputs, _ = dummy_io_generator(n=3, delay=0.2)
+            for _ in range(2):
+                raw_resp = await client.post("/predictions", json=jsonable_encoder(inputs))
+                prediction_id = PredictionID.parse_raw(raw_resp.text).prediction_id
+                raw_resp = await client.get(f"/predictions/{prediction_id}", params={"wait": 5})
+                assert DummyModelPredictionResponse.parse_raw(raw_resp.text).status == "success"
+
+            raw_resp = await client.get("/metrics")
+            assert raw_resp.status_code == 200
+            assert raw_resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+            return raw_resp.text
+
+    text = asyncio.run(run())
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+
+    for stage in [
+        "queue_wait",
+        "transport",
+        "predict",
+        "validation",
+        "upload",
+        "result_cache_write",
+    ]:
+        assert samples[f'tungsten_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}}'] > 0
+    # Each input is counted in the queue wait, and each batch in the others
+    assert samples['tungsten_stage_latency_seconds_count{stage="queue_wait"}'] == 3
+    assert samples['tungsten_stage_latency_seconds_count{stage="predict"}'] == 1
+    assert samples['tungsten_stage_latency_seconds_sum{stage="predict"}'] >= 0.2
+    assert samples['tungsten_stage_latency_seconds_bucket{stage="predict",le="0.1"}'] == 0
+    assert samples['tungsten_batch_size_bucket{le="2"}'] == 0
+    assert samples['tungsten_batch_size_bucket{le="4"}'] == 1
+    assert samples["tungsten_queued_inputs"] == 0
+    assert samples["tungsten_inputs_in_flight"] == 0
+    assert samples["tungsten_admitted_predictions_total"] == 2
+    assert samples['tungsten_memoizer_lookups_total{result="miss"}'] == 1
+    # No files in outputs
+    assert samples['tungsten_output_dedup_lookups_total{result="miss"}'] == 0
+    assert samples["tungsten_output_dedup_saved_bytes_total"] == 0
+
+
+class EmbeddingOutput(BaseIO):
+    embedding: List[float]
+    data_uri: str
+
+
+def test_response_serialization_cpu_time():
+    """Compare building a response from serialized outputs with validating them again"""
+    num_responses = 20
+    outputs = [
+        jsonable_encoder(
+            EmbeddingOutput(
+                embedding=[random.random() for _ in range(1024)],
+                data_uri="data:application/octet-stream;base64,"
+                + base64.b64encode(os.urandom(1024 * 1024)).decode(),
+            )
+        )
+        for _ in range(4)
+    ]
+    result = Result(status="success", outputs=outputs)
+    response_model = PredictionResponse.with_type(EmbeddingOutput)
+    response_field = create_response_field(name="response", type_=response_model)
+
+    async def build_validated() -> bytes:
+        # Wrap outputs in the response model and let FastAPI validate and serialize it
+        resp = response_model(outputs=result.outputs, status=result.status)  # type: ignore
+        content = await serialize_response(
+            field=response_field, response_content=resp, is_coroutine=True
+        )
+        return JSONResponse(content).body
+
+    async def measure():
+        start_time = time.process_time()
+        for _ in range(num_responses):
+            validated = await build_validated()
+        validated_cpu_time = (time.process_time() - start_time) / num_responses
+
+        start_time = time.process_time()
+        for _ in range(num_responses):
+            passed_through = ORJSONResponse(build_prediction_content(result)).body
+        passed_through_cpu_time = (time.process_time() - start_time) / num_responses
+        return validated, validated_cpu_time, passed_through, passed_through_cpu_time
+
+    validated, validated_cpu_time, passed_through, passed_through_cpu_time = asyncio.run(measure())
+    print(
+        f"CPU time per response: {validated_cpu_time * 1000:.2f}ms with validation, "
+        f"{passed_through_cpu_time * 1000:.2f}ms without validation"
+    )
+    assert PredictionResponse.parse_raw(passed_through) == PredictionResponse.parse_raw(validated)
+    assert passed_through_cpu_time * 3 < validated_cpu_time
+
+
+@pytest.mark.timeout(30)
+def test_file_inputs(dummy_io_generator):
+    app, _ = _create_in_process_app()
+    spool_dir = app.state.file_input_dir
+
+    async def run():
+        async with httpx.AsyncClient(app=app, base_url="http://test", timeout=10.0) as client:
+            # Multipart with inputs in JSON and files in binary
+            inputs, gts = dummy_io_generator(n=2, delay=0.5)
+            inputs = jsonable_encoder(inputs)
+            for inp in inputs:
+                del inp["image"]
+            raw_resp = await client.post(
+                "/predictions",
+                data={"inputs": json.dumps(inputs)},
+                files={
+                    f"{idx}.image": (f"image{idx}.png", os.urandom(1024), "image/png")
+                    for idx in range(2)
+                },
+            )
+            assert raw_resp.status_code == 200
+            prediction_id = PredictionID.parse_raw(raw_resp.text).prediction_id
+            assert sorted(p.suffix for p in spool_dir.iterdir()) == [".png", ".png"]
+            raw_resp = await client.get(f"/predictions/{prediction_id}", params={"wait": 5})
+            resp = DummyModelPredictionResponse.parse_raw(raw_resp.text)
+            assert resp.status == "success"
+            assert jsonable_encoder(resp.outputs) == gts
+            await asyncio.sleep(0.1)
+            assert not list(spool_dir.iterdir())
+
+            # Raw body with the other fields in query parameters
+            inp = inputs[0]
+            raw_resp = await client.post(
+                "/predict",
+                content=os.urandom(1024),
+                headers={"Content-Type": "image/png"},
+                params={k: v for k, v in inp.items()},
+            )
+            resp = DummyModelPredictionResponse.parse_raw(raw_resp.text)
+            assert resp.status == "success"
+            assert jsonable_encoder(resp.outputs) == gts[:1]
+
+            # Invalid requests
+            raw_resp = await client.post(
+                "/predictions",
+                data={"inputs": json.dumps(inputs)},
+                files={"image": ("image.png", b"", "image/png")},
+            )
+            assert raw_resp.status_code == 400
+            raw_resp = await client.post("/predictions", data={"inputs": json.dumps(inputs)})
+            assert raw_resp.status_code == 422
+            await asyncio.sleep(0.1)
+            assert not list(spool_dir.iterdir())
+
+    asyncio.run(run())
+    request_body = app.openapi()["paths"]["/predictions"]["post"]["requestBody"]
+    assert set(request_body["content"].keys()) == {"application/json", "multipart/form-data"}
+
+
+@pytest.mark.timeout(60)
+def test_file_input_latency(dummy_io_generator):
+    """Compare latencies of predictions on 10MB images in base64 and in binary"""
+    num_requests = 5
+    image = os.urandom(10 * 1024 * 1024)
+    app, _ = _create_in_process_app()
+
+    async def measure():
+        inp = jsonable_encoder(dummy_io_generator(n=1, delay=0.0)[0][0])
+        data_uri = "data:image/png;base64," + base64.b64encode(image).decode()
+        json_inputs = [{**inp, "image": data_uri}]
+        del inp["image"]
+        async with httpx.AsyncClient(app=app, base_url="http://test", timeout=10.0) as client:
+
+            async def predict(**kwargs) -> float:
+                start_time = time.monotonic()
+                raw_resp = await client.post("/predict", **kwargs)
+                assert raw_resp.status_code == 200
+                return time.monotonic() - start_time
+
+            base64_latencies = [await predict(json=json_inputs) for _ in range(num_requests)]
+            multipart_latencies = [
+                await predict(
+                    data={"inputs": json.dumps([inp])},
+                    files={"0.image": ("image.png", image, "image/png")},
+                )
+                for _ in range(num_requests)
+            ]
+            return sorted(base64_latencies), sorted(multipart_latencies)
+
+    base64_latencies, multipart_latencies = asyncio.run(measure())
+    base64_latency = base64_latencies[num_requests // 2]
+    multipart_latency = multipart_latencies[num_requests // 2]
+    print(
+        f"Median latency on a 10MB image: {base64_latency * 1000:.0f}ms in base64, "
+        f"{multipart_latency * 1000:.0f}ms in multipart/form-data"
+    )
+    assert multipart_latency < base64_latency
+
+
+def _create_in_process_app(**worker_kwargs):
+    settings = StandaloneSettings(
+        TUNGSTEN_MODEL_CLASS=DummyModel.__name__, TUNGSTEN_MODEL_MODULE=DummyModel.__module__
+    )
+    model_loader = create_model_def_loader(
+        settings.TUNGSTEN_MODEL_MODULE, settings.TUNGSTEN_MODEL_CLASS
+    )
+    worker = PredictionWorker(
+        model_loader,
+        cache_config=settings.cache_config,
+        storage_config=settings.storage_config,
+        max_batch_size=4,
+        prediction_timeout=10.0,
+        setup_timeout=10.0,
+        **worker_kwargs,
+    )
+    worker.start()
+    worker.wait_for_setup()
+    return create_app(worker, model_loader), worker
+
+
 def _test_endpoints(dummy_io_generator, server: ModelServer):
     # _test_predict(dummy_io_generator, server)
     _test_predict_async(dummy_io_generator, server)
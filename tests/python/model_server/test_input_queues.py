@@ -1,14 +1,30 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 
+import fakeredis
 from fastapi.encoders import jsonable_encoder
 
+from tungstenkit._internal.model_server.ids import (
+    get_input_ids_from_prediction_id,
+    get_prediction_id_from_input_id,
+)
 from tungstenkit._internal.model_server.input_queues import AbstractInputQueue
+from tungstenkit._internal.model_server.input_queues.redis_input_queue import RedisInputQueue
 
 
 def _generate_prediction_id():
     return uuid4().hex
 
 
+def _create_input_queue(cls) -> AbstractInputQueue:
+    if cls is RedisInputQueue:
+        return RedisInputQueue(
+            fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        )
+    return cls()
+
+
 def _test_input_queue(dummy_io_generator, queue: AbstractInputQueue):
     all_inputs = []
 
@@ -24,10 +40,13 @@ def _test_input_queue(dummy_io_generator, queue: AbstractInputQueue):
     all_inputs.extend(inputs)
     queue.push(_generate_prediction_id(), inputs, is_demo=False)
 
+    assert queue.get_num_queued() == 5
     queue.remove(to_be_removed)
+    assert queue.get_num_queued() == 4
 
     poped = queue.pop(4)
     assert len(poped.data) == 4
+    assert queue.get_num_queued() == 0
     for i in range(4):
         poped.data[i] == jsonable_encoder(all_inputs[i])
     try:
@@ -40,4 +59,82 @@ def _test_input_queue(dummy_io_generator, queue: AbstractInputQueue):
 def test_queues(dummy_io_generator):
     assert len(AbstractInputQueue.__subclasses__()) > 0
     for c in AbstractInputQueue.__subclasses__():
-        _test_input_queue(dummy_io_generator, c())
+        _test_input_queue(dummy_io_generator, _create_input_queue(c))
+
+
+def _test_blocking_pop(dummy_io_generator, queue: AbstractInputQueue):
+    inputs = dummy_io_generator(n=1)[0]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        fut = executor.submit(queue.pop, 4, 5.0)
+        time.sleep(0.1)
+        assert not fut.done()
+        pushed_at = time.monotonic()
+        input_ids = queue.push(_generate_prediction_id(), inputs, is_demo=False)
+        poped = fut.result(timeout=1.0)
+        assert time.monotonic() - pushed_at < 0.5
+    assert poped.input_ids == input_ids
+
+
+def test_blocking_pop(dummy_io_generator):
+    for c in AbstractInputQueue.__subclasses__():
+        _test_blocking_pop(dummy_io_generator, _create_input_queue(c))
+
+
+def _test_batching_order(dummy_io_generator, queue: AbstractInputQueue):
+    first_id = _generate_prediction_id()
+    queue.push(first_id, dummy_io_generator(n=2)[0], is_demo=False)
+    other_option_id = _generate_prediction_id()
+    queue.push(other_option_id, dummy_io_generator(n=2, option="other")[0], is_demo=False)
+    demo_id = _generate_prediction_id()
+    queue.push(demo_id, dummy_io_generator(n=1)[0], is_demo=True)
+    last_id = _generate_prediction_id()
+    queue.push(last_id, dummy_io_generator(n=3)[0], is_demo=False)
+
+    poped = queue.pop(4)
+    assert not poped.is_demo
+    assert [get_prediction_id_from_input_id(i) for i in poped.input_ids] == [
+        first_id,
+        first_id,
+        last_id,
+        last_id,
+    ]
+    poped = queue.pop(4)
+    assert [get_prediction_id_from_input_id(i) for i in poped.input_ids] == [
+        other_option_id,
+        other_option_id,
+    ]
+    assert queue.remove(demo_id) == get_input_ids_from_prediction_id(demo_id, 1)
+    poped = queue.pop(4)
+    assert poped.input_ids == get_input_ids_from_prediction_id(last_id, 3)[2:]
+    try:
+        queue.pop(4, timeout=0.1)
+        raise ValueError
+    except TimeoutError:
+        pass
+
+
+def test_batching_order(dummy_io_generator):
+    for c in AbstractInputQueue.__subclasses__():
+        _test_batching_order(dummy_io_generator, _create_input_queue(c))
+
+
+def _test_max_batch_delay(dummy_io_generator, queue: AbstractInputQueue):
+    queue.push(_generate_prediction_id(), dummy_io_generator(n=1)[0], is_demo=False)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        fut = executor.submit(queue.pop, 4, None, 5.0)
+        time.sleep(0.1)
+        assert not fut.done()
+        queue.push(_generate_prediction_id(), dummy_io_generator(n=3)[0], is_demo=False)
+        poped = fut.result(timeout=1.0)
+    assert len(poped.input_ids) == 4
+    assert poped.batching_delay < 1.0
+
+    queue.push(_generate_prediction_id(), dummy_io_generator(n=1)[0], is_demo=False)
+    poped = queue.pop(4, max_batch_delay=0.1)
+    assert len(poped.input_ids) == 1
+    assert poped.batching_delay >= 0.1
+
+
+def test_max_batch_delay(dummy_io_generator):
+    for c in AbstractInputQueue.__subclasses__():
+        _test_max_batch_delay(dummy_io_generator, _create_input_queue(c))
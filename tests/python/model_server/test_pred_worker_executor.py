@@ -1,6 +1,10 @@
+import base64
+import os
 import tempfile
 import time
+import typing as t
 from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
 from io import StringIO
 from pathlib import Path
 from threading import Thread
@@ -8,6 +12,8 @@ from unittest.mock import patch
 
 from fastapi.encoders import jsonable_encoder
 
+from tungstenkit import Binary, Image
+from tungstenkit._internal.io import BaseIO
 from tungstenkit._internal.model_def_loader import create_model_def_loader
 from tungstenkit._internal.model_server.prediction_worker.executor import (
     Executor,
@@ -16,7 +22,7 @@ from tungstenkit._internal.model_server.prediction_worker.executor import (
 )
 
 from .. import dummy_model
-from . import setup_failure_model
+from . import masked_image_model, setup_failure_model, typed_inputs_model
 
 
 def test_executor_setup():
@@ -90,6 +96,46 @@ def test_executor_predictions(dummy_io_generator, tmp_path):
             assert result.err_msg.strip().endswith("Canceled")
 
 
+def test_executor_latency(dummy_io_generator):
+    executor = Executor(
+        create_model_def_loader(dummy_model.__name__, dummy_model.DummyModel.__name__),
+        setup_timeout=10.0,
+        prediction_timeout=5.0,
+    )
+    with _start_executor(executor) as exec:
+        assert exec.setup()
+        inputs = jsonable_encoder(dummy_io_generator(n=1, delay=0.0)[0])
+        history = []
+        for _ in range(20):
+            start_time = time.monotonic()
+            result = exec.predict(inputs=inputs, is_demo=False, log_path=None)
+            history.append(time.monotonic() - start_time)
+            assert isinstance(result, PredictionSuccess)
+
+        assert sum(history) / len(history) < 0.01
+
+
+def test_executor_large_inputs(dummy_io_generator):
+    executor = Executor(
+        create_model_def_loader(dummy_model.__name__, dummy_model.DummyModel.__name__),
+        setup_timeout=10.0,
+        prediction_timeout=5.0,
+    )
+    with _start_executor(executor) as exec:
+        assert exec.setup()
+        inputs, gts = dummy_io_generator(n=2, delay=0.0)
+        large_image = (
+            "data:image/png;base64," + base64.b64encode(os.urandom(2 * 1024 * 1024)).decode()
+        )
+        encoded_inputs = jsonable_encoder(inputs)
+        for inp in encoded_inputs:
+            inp["image"] = large_image
+        result = exec.predict(inputs=encoded_inputs, is_demo=False, log_path=None)
+        assert isinstance(result, PredictionSuccess)
+        assert result.outputs == gts
+        assert not any(exec._spool_dir.iterdir())
+
+
 def _cancel_executor(after: float, executor: Executor):
     time.sleep(after)
     executor.cancel()
@@ -102,3 +148,102 @@ def _start_executor(executor: Executor):
         yield executor
     finally:
         executor.terminate()
+
+
+def test_executor_input_validation_overhead():
+    executor = Executor(
+        create_model_def_loader(
+            masked_image_model.__name__, masked_image_model.MaskedImageModel.__name__
+        ),
+        setup_timeout=10.0,
+        prediction_timeout=10.0,
+    )
+    with _start_executor(executor) as exec:
+        assert exec.setup()
+        inputs = jsonable_encoder([masked_image_model.MaskedImageModel.create_input(1024)] * 4)
+
+        # Inputs were validated when they were created, so the subprocess shouldn't
+        # decode and re-encode the images again.
+        validation_history = []
+        prediction_history = []
+        for _ in range(5):
+            start_time = time.monotonic()
+            [masked_image_model.Input.parse_obj(inp) for inp in inputs]
+            validation_history.append(time.monotonic() - start_time)
+
+            start_time = time.monotonic()
+            result = exec.predict(inputs=inputs, is_demo=False, log_path=None)
+            prediction_history.append(time.monotonic() - start_time)
+            assert isinstance(result, PredictionSuccess)
+            assert result.outputs == [{"done": True}] * 4
+
+        validation_time = sorted(validation_history)[len(validation_history) // 2]
+        prediction_time = sorted(prediction_history)[len(prediction_history) // 2]
+        assert prediction_time < 0.5 * validation_time
+
+
+def test_construct_inputs_from_jsonable():
+    class Nested(BaseIO):
+        images: t.List[Image]
+
+    class Input(BaseIO):
+        images: t.List[Image]
+        files: t.Dict[str, Binary]
+        color: typed_inputs_model.Color
+        created_at: datetime
+        nested: t.List[Nested]
+        pair: t.Tuple[Image, int]
+        scale: float
+
+    image_uri = Image.from_bytes(b"image").__root__
+    binary_uri = Binary.from_bytes(b"binary").__root__
+    validated = Input(
+        images=[image_uri, image_uri],
+        files={"a": binary_uri},
+        color="red",
+        created_at="2020-01-01T00:00:00",
+        nested=[{"images": [image_uri]}],
+        pair=(image_uri, 1),
+        scale=1,
+    )
+    constructed = Input._construct_from_jsonable(jsonable_encoder(validated))
+    assert constructed == validated
+    assert all(isinstance(img, Image) for img in constructed.images)
+    assert isinstance(constructed.files["a"], Binary)
+    assert constructed.color is typed_inputs_model.Color.RED
+    assert constructed.created_at == datetime(2020, 1, 1)
+    assert isinstance(constructed.nested[0], Nested)
+    assert isinstance(constructed.nested[0].images[0], Image)
+    assert isinstance(constructed.pair, tuple) and isinstance(constructed.pair[0], Image)
+    assert isinstance(constructed.scale, float)
+
+
+def test_executor_input_types():
+    executor = Executor(
+        create_model_def_loader(
+            typed_inputs_model.__name__, typed_inputs_model.TypedInputsModel.__name__
+        ),
+        setup_timeout=10.0,
+        prediction_timeout=10.0,
+    )
+    with _start_executor(executor) as exec:
+        assert exec.setup()
+        masked_image = masked_image_model.MaskedImageModel.create_input(8).masked_image
+        inputs = [
+            typed_inputs_model.Input(color="red", scale=1, masked_image=masked_image),
+            typed_inputs_model.Input(
+                color="blue", scale=0.5, image=masked_image.image, masked_image=masked_image
+            ),
+        ]
+        result = exec.predict(inputs=jsonable_encoder(inputs), is_demo=False, log_path=None)
+        assert isinstance(result, PredictionSuccess)
+        expected = {
+            "color": "Color",
+            "scale": "float",
+            "masked_image": "MaskedImage",
+            "masked_image.image": "Image",
+        }
+        assert result.outputs == [
+            {"types": {**expected, "image": "NoneType"}},
+            {"types": {**expected, "image": "Image"}},
+        ]
@@ -1,8 +1,14 @@
+import base64
+import os
 import time
 import typing as t
 from concurrent.futures import ThreadPoolExecutor
+from threading import Event
 from unittest.mock import patch
 
+import pytest
+
+from tungstenkit import Image
 from tungstenkit._internal.model_def_loader import create_model_def_loader
 from tungstenkit._internal.model_server.config import MODE_TO_SETTING_MAPPING
 from tungstenkit._internal.model_server.enums import ModelServerMode
@@ -188,7 +194,7 @@ def _test_performance(dummy_io_generator, worker: PredictionWorker, max_latency:
     assert sum(history) / len(history) < max_latency
 
 
-def _test_worker(dummy_io_generator, mode: ModelServerMode, envvars: t.Dict):
+def _test_worker(dummy_io_generator, mode: ModelServerMode, envvars: t.Dict, **worker_kwargs):
     settings = MODE_TO_SETTING_MAPPING[mode](
         TUNGSTEN_MODEL_CLASS=DummyModel.__name__,
         TUNGSTEN_MODEL_MODULE=DummyModel.__module__,
@@ -201,6 +207,7 @@ def _test_worker(dummy_io_generator, mode: ModelServerMode, envvars: t.Dict):
         max_batch_size=BATCH_SIZE,
         prediction_timeout=10.0,
         setup_timeout=10.0,
+        **worker_kwargs,
     )
     _test_correctness(dummy_io_generator, worker)
     _test_performance(dummy_io_generator, worker, 0.05)
@@ -209,3 +216,186 @@ def _test_worker(dummy_io_generator, mode: ModelServerMode, envvars: t.Dict):
 def test_standalone_worker(dummy_io_generator):
     mode = ModelServerMode.STANDALONE
     return _test_worker(dummy_io_generator, mode=mode, envvars=dict())
+
+
+def test_pipelined_worker(dummy_io_generator):
+    mode = ModelServerMode.STANDALONE
+    return _test_worker(dummy_io_generator, mode=mode, envvars=dict(), pipelined=True)
+
+
+def test_pipelined_worker_stages(dummy_io_generator):
+    settings = MODE_TO_SETTING_MAPPING[ModelServerMode.STANDALONE](
+        TUNGSTEN_MODEL_CLASS=DummyModel.__name__,
+        TUNGSTEN_MODEL_MODULE=DummyModel.__module__,
+    )
+    worker = PredictionWorker(
+        create_model_def_loader(settings.TUNGSTEN_MODEL_MODULE, settings.TUNGSTEN_MODEL_CLASS),
+        cache_config=settings.cache_config,
+        storage_config=settings.storage_config,
+        max_batch_size=BATCH_SIZE,
+        prediction_timeout=10.0,
+        setup_timeout=10.0,
+        pipelined=True,
+    )
+    executor = worker._executors[0]
+    uploader = worker._file_uploader
+    orig_prefetch, orig_predict, orig_upload = (
+        worker._prefetch_batch,
+        executor.predict,
+        uploader.upload,
+    )
+    prefetched = [Event(), Event()]
+    predicting = [Event(), Event()]
+    canceled = Event()
+    num_predictions: t.List[int] = []
+    num_uploads: t.List[int] = []
+    overlaps: t.List[bool] = []
+
+    def prefetch_batch(*args):
+        orig_prefetch(*args)
+        if worker._prefetched_batches[0] is not None:
+            next(event for event in prefetched if not event.is_set()).set()
+
+    def predict(*args, **kwargs):
+        idx = len(num_predictions)
+        num_predictions.append(idx)
+        predicting[idx].set()
+        if idx == 0:
+            # The next batch is prefetched while predicting
+            overlaps.append(prefetched[0].wait(10.0))
+        else:
+            overlaps.append(prefetched[1].wait(10.0) and canceled.wait(10.0))
+        return orig_predict(*args, **kwargs)
+
+    def upload(files):
+        if not num_uploads:
+            # The next batch is predicted while uploading
+            overlaps.append(predicting[1].wait(10.0))
+        num_uploads.append(len(num_uploads))
+        return orig_upload(files)
+
+    large_image = Image.parse_obj(
+        "data:image/png;base64," + base64.b64encode(os.urandom(2 * 1024 * 1024)).decode()
+    )
+    with patch.object(worker, "_prefetch_batch", prefetch_batch), patch.object(
+        executor, "predict", predict
+    ), patch.object(uploader, "upload", upload):
+        worker.start()
+        worker.wait_for_setup()
+        prediction_ids = [
+            worker.create_prediction(inputs=dummy_io_generator(n=BATCH_SIZE)[0], is_demo=False)
+            for _ in range(2)
+        ]
+        # Large files are spooled when prefetched, and removed when canceled
+        large_inputs = [
+            inp.copy(update={"image": large_image}) for inp in dummy_io_generator(n=BATCH_SIZE)[0]
+        ]
+        prediction_ids.append(worker.create_prediction(inputs=large_inputs, is_demo=False))
+        assert prefetched[1].wait(10.0)
+        assert worker._get_num_queued() == BATCH_SIZE
+        assert any(executor._spool_dir.iterdir())
+        worker.cancel_prediction(prediction_ids[-1])
+        assert worker._get_num_queued() == 0
+        assert not any(executor._spool_dir.iterdir())
+        canceled.set()
+
+        assert worker.get_prediction_result(prediction_ids[-1]).status == "failed"
+        for prediction_id in prediction_ids[:-1]:
+            worker.wait_for_prediction(prediction_id)
+            assert worker.get_prediction_result(prediction_id).status == "success"
+
+    assert overlaps == [True, True, True]
+    assert len(num_predictions) == 2
+
+
+def _test_concurrent_replicas(dummy_io_generator, worker: PredictionWorker):
+    start_time = time.monotonic()
+    prediction_ids = [
+        worker.create_prediction(
+            inputs=dummy_io_generator(n=BATCH_SIZE, delay=1.0)[0], is_demo=False
+        )
+        for _ in range(worker.num_replicas)
+    ]
+    for prediction_id in prediction_ids:
+        worker.wait_for_prediction(prediction_id)
+        assert worker.get_prediction_result(prediction_id).status == "success"
+    assert time.monotonic() - start_time < 1.0 * worker.num_replicas
+
+
+@pytest.mark.parametrize("fork_replicas", [False, True])
+def test_multi_replica_worker(dummy_io_generator, fork_replicas: bool):
+    settings = MODE_TO_SETTING_MAPPING[ModelServerMode.STANDALONE](
+        TUNGSTEN_MODEL_CLASS=DummyModel.__name__,
+        TUNGSTEN_MODEL_MODULE=DummyModel.__module__,
+    )
+    worker = PredictionWorker(
+        create_model_def_loader(settings.TUNGSTEN_MODEL_MODULE, settings.TUNGSTEN_MODEL_CLASS),
+        cache_config=settings.cache_config,
+        storage_config=settings.storage_config,
+        max_batch_size=BATCH_SIZE,
+        prediction_timeout=10.0,
+        setup_timeout=10.0,
+        num_replicas=2,
+        fork_replicas=fork_replicas,
+    )
+    worker.start()
+    worker.wait_for_setup()
+    _test_success(dummy_io_generator, worker)
+    _test_failure(dummy_io_generator, worker)
+    _test_logging(dummy_io_generator, worker)
+    _test_concurrent_replicas(dummy_io_generator, worker)
+    _test_cancel_running_prediction(dummy_io_generator, worker)
+    _test_cancel_queued_prediction(dummy_io_generator, worker)
+
+
+def test_memoizing_worker(dummy_io_generator, tmp_path):
+    settings = MODE_TO_SETTING_MAPPING[ModelServerMode.STANDALONE](
+        TUNGSTEN_MODEL_CLASS=DummyModel.__name__,
+        TUNGSTEN_MODEL_MODULE=DummyModel.__module__,
+    )
+    worker = PredictionWorker(
+        create_model_def_loader(settings.TUNGSTEN_MODEL_MODULE, settings.TUNGSTEN_MODEL_CLASS),
+        cache_config=settings.cache_config,
+        storage_config=settings.storage_config,
+        max_batch_size=BATCH_SIZE,
+        prediction_timeout=10.0,
+        setup_timeout=10.0,
+        memoize_size=16,
+    )
+    worker.start()
+    worker.wait_for_setup()
+
+    # Files are hashed by contents
+    inputs = dummy_io_generator(n=1, input_file_dir=tmp_path)[0]
+    same_inputs = [inputs[0].copy(update={"image": dummy_io_generator(n=1)[0][0].image})]
+    assert inputs[0]._hash_for_memoization() == same_inputs[0]._hash_for_memoization()
+
+    # Duplicates of a running prediction share its result
+    inputs, gts = dummy_io_generator(n=BATCH_SIZE, delay=1.0)
+    start_time = time.monotonic()
+    prediction_ids = [worker.create_prediction(inputs=inputs, is_demo=False) for _ in range(3)]
+    for prediction_id in prediction_ids:
+        worker.wait_for_prediction(prediction_id)
+        assert worker.get_prediction_result(prediction_id).outputs == gts
+    assert time.monotonic() - start_time < 2.0
+
+    # Finished predictions are memoized
+    prediction_id = worker.create_prediction(inputs=inputs, is_demo=False)
+    assert worker.get_prediction_result(prediction_id).outputs == gts
+    stats = worker.get_memoizer_stats()
+    assert stats is not None
+    assert (stats.hits, stats.coalesced, stats.misses) == (1, 2, 1)
+    assert stats.hit_rate == 0.75
+
+    # Canceling a prediction doesn't cancel its duplicates
+    inputs, gts = dummy_io_generator(n=BATCH_SIZE, delay=0.5)
+    leader_id = worker.create_prediction(inputs=inputs, is_demo=False)
+    first_follower_id = worker.create_prediction(inputs=inputs, is_demo=False)
+    second_follower_id = worker.create_prediction(inputs=inputs, is_demo=False)
+    worker.cancel_prediction(second_follower_id)
+    worker.cancel_prediction(leader_id)
+    for prediction_id in [leader_id, second_follower_id]:
+        worker.wait_for_prediction(prediction_id)
+        assert worker.get_prediction_result(prediction_id).status == "failed"
+    worker.wait_for_prediction(first_follower_id)
+    assert worker.get_prediction_result(first_follower_id).outputs == gts
@@ -1,10 +1,20 @@
+import asyncio
+import os
 import tempfile
 import time
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import fakeredis
+
 from tungstenkit._internal.model_server.ids import get_input_ids_from_prediction_id
 from tungstenkit._internal.model_server.result_caches import AbstractResultCache
+from tungstenkit._internal.model_server.result_caches.local_result_cache import (
+    LocalResultCache,
+)
+from tungstenkit._internal.model_server.result_caches.redis_result_cache import (
+    RedisResultCache,
+)
 from tungstenkit._internal.model_server.server_exceptions import (
     PredictionIDNotFound,
     PredictionTimeout,
@@ -95,6 +105,43 @@ def _test_wait(dummy_io_generator, result_cache: AbstractResultCache):
         assert all(result.outputs[i] == outputs[i] for i in range(len(outputs)))
 
 
+def _test_wait_async(dummy_io_generator, result_cache: AbstractResultCache):
+    outputs = dummy_io_generator(n=2)[1]
+    prediction_id = result_cache.register(num_inputs=2)
+    input_ids = get_input_ids_from_prediction_id(prediction_id, 2)
+
+    async def wait():
+        waits = [
+            asyncio.ensure_future(result_cache.wait_until_done_async(prediction_id, 10.0))
+            for _ in range(100)
+        ]
+        try:
+            await result_cache.wait_until_done_async(prediction_id, 0.1)
+            raise ValueError
+        except PredictionTimeout:
+            pass
+
+        # Set results from another thread while the waits are pending
+        await asyncio.sleep(0.1)
+        assert not any(w.done() for w in waits)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: result_cache.set_success(
+                input_ids=input_ids, outputs=outputs, demo_outputs=outputs
+            ),
+        )
+        await asyncio.wait_for(asyncio.gather(*waits), timeout=1.0)
+
+        # Return immediately if already done
+        await asyncio.wait_for(result_cache.wait_until_done_async(prediction_id, 10.0), 1.0)
+
+    asyncio.run(wait())
+    result = result_cache.get_result(prediction_id)
+    assert result.status == "success"
+    result_cache.remove(prediction_id)
+
+
 def _test_failure(dummy_io_generator, result_cache: AbstractResultCache):
     outputs = dummy_io_generator(n=2)[1]
     prediction_id = result_cache.register(num_inputs=2)
@@ -119,8 +166,8 @@ def _test_failure(dummy_io_generator, result_cache: AbstractResultCache):
     return prediction_id
 
 
-def _test_cleanup(to_be_removed: str, cache: AbstractResultCache):
-    time.sleep(0.5)
+def _test_cleanup(to_be_removed: str, cache: AbstractResultCache, expiration: float):
+    time.sleep(expiration)
     cache.cleanup()
     try:
         cache.get_result(prediction_id=to_be_removed)
@@ -129,11 +176,141 @@ def _test_cleanup(to_be_removed: str, cache: AbstractResultCache):
         pass
 
 
+def _test_cleanup_logs(dummy_io_generator, cache: AbstractResultCache):
+    outputs = dummy_io_generator(n=2)[1]
+    first_id = cache.register(num_inputs=1)
+    second_id = cache.register(num_inputs=1)
+    input_ids = [
+        get_input_ids_from_prediction_id(first_id, 1)[0],
+        get_input_ids_from_prediction_id(second_id, 1)[0],
+    ]
+    fd, name = tempfile.mkstemp()
+    os.close(fd)
+    log_path = Path(name)
+
+    # A log shared by two predictions is removed with the last one
+    cache.set_log_path(input_ids=input_ids, log_path=log_path)
+    cache.set_success(input_ids=input_ids[:1], outputs=outputs[:1], demo_outputs=outputs[:1])
+    time.sleep(0.5)
+    cache.set_success(input_ids=input_ids[1:], outputs=outputs[1:], demo_outputs=outputs[1:])
+    cache.cleanup()
+    assert log_path.exists()
+    assert cache.get_result(second_id).status == "success"
+    time.sleep(0.5)
+    cache.cleanup()
+    assert not log_path.exists()
+
+
+def _test_cleanup_cost(dummy_io_generator, cache: AbstractResultCache):
+    outputs = dummy_io_generator(n=1)[1]
+    for _ in range(10000):
+        prediction_id = cache.register(num_inputs=1)
+        input_ids = get_input_ids_from_prediction_id(prediction_id, 1)
+        cache.set_success(input_ids=input_ids, outputs=outputs, demo_outputs=outputs)
+
+    # Nothing is expired yet, so cleanup shouldn't visit retained results
+    start_time = time.monotonic()
+    cache.cleanup()
+    assert time.monotonic() - start_time < 0.01
+    assert cache.get_result(prediction_id).status == "success"
+
+
+def _create_result_cache(cls, expiration: float) -> AbstractResultCache:
+    if cls is RedisResultCache:
+        cache = RedisResultCache(
+            fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True),
+            expiration=expiration,
+        )
+        cache.start()
+        return cache
+    return cls(expiration)
+
+
 def test_result_cache(dummy_io_generator):
     assert len(AbstractResultCache.__subclasses__()) > 0
     for c in AbstractResultCache.__subclasses__():
-        cache = c(0.5)
+        # Results in Redis expire by themselves, so keep them until checked
+        expiration = 1.5 if c is RedisResultCache else 0.5
+        cache = _create_result_cache(c, expiration)
         _test_success(dummy_io_generator, cache)
         _test_wait(dummy_io_generator, cache)
+        _test_wait_async(dummy_io_generator, cache)
         to_be_removed = _test_failure(dummy_io_generator, cache)
-        _test_cleanup(to_be_removed, cache)
+        _test_cleanup(to_be_removed, cache, expiration)
+
+
+def test_local_result_cache_cleanup(dummy_io_generator):
+    _test_cleanup_logs(dummy_io_generator, LocalResultCache(0.5))
+    _test_cleanup_cost(dummy_io_generator, LocalResultCache(60.0))
+
+
+def test_local_result_cache_spill():
+    output_size = 10000
+    cache = LocalResultCache(60.0, max_bytes=3 * output_size, max_disk_bytes=3 * output_size)
+
+    prediction_ids = []
+    for i in range(10):
+        prediction_id = cache.register(num_inputs=1)
+        input_ids = get_input_ids_from_prediction_id(prediction_id, 1)
+        cache.set_success(
+            input_ids=input_ids, outputs=[{"o": str(i) * output_size}], demo_outputs=[None]
+        )
+        prediction_ids.append(prediction_id)
+
+    stats = cache.get_stats()
+    assert stats.memory_bytes <= 3 * output_size
+    assert stats.disk_bytes <= 3 * output_size
+    assert stats.spills == 8
+    assert stats.evictions == 6
+
+    # The oldest results are evicted, colder ones are read from disk
+    for prediction_id in prediction_ids[:6]:
+        try:
+            cache.get_result(prediction_id)
+            raise ValueError()
+        except PredictionIDNotFound:
+            pass
+    for i, prediction_id in enumerate(prediction_ids[6:], start=6):
+        result = cache.get_result(prediction_id)
+        assert result.status == "success"
+        assert result.outputs == [{"o": str(i) * output_size}]
+    stats = cache.get_stats()
+    assert stats.hits == 2
+    assert stats.misses == 2
+
+    cache.remove(prediction_ids[6])
+    assert cache.get_stats().disk_bytes < stats.disk_bytes
+
+
+def test_local_result_cache_polling_throughput(dummy_io_generator):
+    num_pollers = 8
+    num_polls = 5000
+    outputs = dummy_io_generator(n=4)[1]
+    cache = LocalResultCache(60.0)
+    prediction_ids = [cache.register(num_inputs=4) for _ in range(100)]
+    for prediction_id in prediction_ids[::2]:
+        input_ids = get_input_ids_from_prediction_id(prediction_id, 4)
+        cache.set_success(input_ids=input_ids, outputs=outputs, demo_outputs=outputs)
+
+    def poll():
+        for i in range(num_polls):
+            cache.get_result(prediction_ids[i % len(prediction_ids)])
+
+    def update():
+        # Results of the other predictions keep changing while polling
+        for prediction_id in prediction_ids[1::2]:
+            input_ids = get_input_ids_from_prediction_id(prediction_id, 4)
+            cache.set_running(input_ids=input_ids)
+            cache.set_success(input_ids=input_ids, outputs=outputs, demo_outputs=outputs)
+
+    start_time = time.monotonic()
+    with ThreadPoolExecutor(max_workers=num_pollers + 1) as executor:
+        futures = [executor.submit(poll) for _ in range(num_pollers)]
+        futures.append(executor.submit(update))
+        for future in futures:
+            future.result()
+    elapsed = time.monotonic() - start_time
+
+    throughput = num_pollers * num_polls / elapsed
+    print(f"Polling throughput: {throughput:.0f} polls/s")
+    assert throughput > 20000
@@ -0,0 +1,36 @@
+import base64
+import os
+
+from tungstenkit._internal.model_server.prediction_worker.transport import (
+    create_spool_dir,
+    remove_spool_dir,
+    remove_spooled_files,
+    spool_large_data_uris,
+)
+from tungstenkit._internal.utils.uri import get_path_from_file_url
+
+
+def test_spool_large_data_uris():
+    spool_dir = create_spool_dir()
+    try:
+        large = os.urandom(2048)
+        large_uri = "data:image/png;base64," + base64.b64encode(large).decode()
+        small_uri = "data:image/png;base64," + base64.b64encode(b"small").decode()
+        jsonable = [{"image": large_uri, "mask": small_uri}, {"images": [large_uri]}]
+
+        converted, spooled = spool_large_data_uris(jsonable, spool_dir, threshold=1024)
+        assert list(spooled.keys()) == [large_uri]
+        path = spooled[large_uri]
+        assert path.parent == spool_dir
+        assert path.read_bytes() == large
+        assert converted == [
+            {"image": path.as_uri(), "mask": small_uri},
+            {"images": [path.as_uri()]},
+        ]
+        assert get_path_from_file_url(converted[0]["image"]) == path
+
+        remove_spooled_files(spooled.values())
+        assert not path.exists()
+    finally:
+        remove_spool_dir(spool_dir)
+    assert not spool_dir.exists()
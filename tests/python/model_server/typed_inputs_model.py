@@ -0,0 +1,46 @@
+import typing as t
+from enum import Enum
+
+from tungstenkit import BaseIO, Image, MaskedImage, define_model
+
+
+class Color(str, Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+class Input(BaseIO):
+    color: Color
+    scale: float
+    image: t.Optional[Image] = None
+    masked_image: MaskedImage
+
+
+class Output(BaseIO):
+    types: t.Dict[str, str]
+
+
+@define_model(
+    input=Input,
+    output=Output,
+    include_files=[__file__],
+)
+class TypedInputsModel:
+    """Tell the types of the inputs it received"""
+
+    def setup(self):
+        pass
+
+    def predict(self, inputs: t.List[Input]) -> t.List[Output]:
+        return [
+            Output(
+                types={
+                    "color": type(inp.color).__name__,
+                    "scale": type(inp.scale).__name__,
+                    "image": type(inp.image).__name__,
+                    "masked_image": type(inp.masked_image).__name__,
+                    "masked_image.image": type(inp.masked_image.image).__name__,
+                }
+            )
+            for inp in inputs
+        ]
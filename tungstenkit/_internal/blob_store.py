@@ -13,7 +13,7 @@ from fasteners import InterProcessReaderWriterLock
 from typing_extensions import Literal, TypeAlias
 
 from tungstenkit._internal.constants import DATA_DIR, LOCK_DIR
-from tungstenkit._internal.utils.file import list_dirs, list_files
+from tungstenkit._internal.utils.file import hash_file, list_dirs, list_files
 
 BlobStorableType = t.TypeVar("BlobStorableType", bound="BlobStorable")
 BlobContainerType = t.TypeVar("BlobContainerType")
@@ -21,7 +21,6 @@ FileBlobCreatePolicy: TypeAlias = Literal["copy", "rename"]
 
 BLOBS_DATA_DIR = DATA_DIR / "blobs" / "data"
 BLOBS_LOCK_PATH = LOCK_DIR / "blobs.lock"
-BUF_SIZE_FOR_HASHING = 1048576  # 1MB
 
 
 @attrs.frozen(kw_only=True, order=True)
@@ -92,7 +91,7 @@ class BlobStore:
                 )
 
             else:
-                digest = _hash_file(path_or_named_bytes.resolve())
+                digest = hash_file(path_or_named_bytes.resolve())
                 new_blob = (path_or_named_bytes.name, path_or_named_bytes)
 
             if not self.check_if_contained(digest):
@@ -132,7 +131,7 @@ class BlobStore:
 
     def add_by_renaming(self, path: Path) -> Blob:
         path = path.resolve()
-        digest = _hash_file(path)
+        digest = hash_file(path)
         if self.check_if_contained(digest):
             return self.get_by_digest(digest)
         blob_dir = _build_blob_dir_path(digest)
@@ -191,17 +190,6 @@ def _hash_bytes(bytes_: bytes) -> str:
     return hash_.hexdigest()
 
 
-def _hash_file(path: Path) -> str:
-    hash_ = hashlib.sha256()
-    with open(path, "rb") as f:
-        while True:
-            data = f.read(BUF_SIZE_FOR_HASHING)
-            if not data:
-                break
-            hash_.update(data)
-    return hash_.hexdigest()
-
-
 def _write_blob(blob_dir: Path, file_name: str, path_or_bytes: t.Union[Path, bytes]):
     blob_dir.mkdir(parents=True)
     try:
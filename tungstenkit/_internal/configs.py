@@ -109,6 +109,7 @@ class ModelBuildConfig(BuildConfig):
     model_module_ref: str
     model_class_name: str
     batch_size: int = 1
+    max_batch_delay_ms: float = 0.0
     readme_md: t.Optional[Path] = None
     input_schema: t.Dict
     output_schema: t.Dict
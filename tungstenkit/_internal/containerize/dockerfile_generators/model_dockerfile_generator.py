@@ -11,6 +11,9 @@ class ModelDockerfileGenerator(BaseDockerfileGenerator):
     def _build_template_args(self, *args, **kwargs):
         template_args = super()._build_template_args(*args, **kwargs)
         template_args.tungsten_env_vars["TUNGSTEN_MAX_BATCH_SIZE"] = self.config.batch_size
+        template_args.tungsten_env_vars[
+            "TUNGSTEN_MAX_BATCH_DELAY_MS"
+        ] = self.config.max_batch_delay_ms
         if self.config.has_post_build:
             template_args.dockerfile_commands.append(
                 f"RUN python -m {post_model_build.__name__} "
@@ -1,8 +1,8 @@
 import base64
 import hashlib
+import inspect
 import io
 import json
-import mimetypes
 import re
 import typing as t
 from enum import Enum
@@ -10,14 +10,24 @@ from io import BufferedIOBase, TextIOBase
 from pathlib import Path
 
 import jsonref
-from binaryornot.check import is_binary
 from fastapi.encoders import jsonable_encoder
 from furl import furl
 from PIL import Image as PILImage
 from pydantic import BaseModel
 from pydantic import Field as PydanticField
-from pydantic import validator
-from pydantic.fields import ModelField, Undefined
+from pydantic import ValidationError, validator
+from pydantic.fields import (
+    SHAPE_DICT,
+    SHAPE_FROZENSET,
+    SHAPE_LIST,
+    SHAPE_MAPPING,
+    SHAPE_SET,
+    SHAPE_SINGLETON,
+    SHAPE_TUPLE,
+    SHAPE_TUPLE_ELLIPSIS,
+    ModelField,
+    Undefined,
+)
 from typing_extensions import Literal
 from w3lib.url import parse_data_uri
 
@@ -25,14 +35,29 @@ from tungstenkit._internal import contexts
 from tungstenkit._internal.utils.jsonschema import remove_useless_allof_in_jsonschema
 from tungstenkit._internal.utils.requests import download_file
 from tungstenkit._internal.utils.string import camel_to_snake
-from tungstenkit._internal.utils.uri import get_path_from_file_url, get_uri_scheme, save_data_url
+from tungstenkit._internal.utils.uri import (
+    build_data_uri_from_path,
+    get_path_from_file_url,
+    get_uri_scheme,
+    save_data_url,
+)
 
 F = t.TypeVar("F", bound="File")
 
-RE_BASE64 = "^([A-Za-z0-9+/]{4})*([A-Za-z0-9+/]{3}=|[A-Za-z0-9+/]{2}==)?$"
+# Base64 strings also have lengths of multiples of 4, which is checked separately not to
+# backtrack over groups of 4 characters in multi-MB strings
+RE_BASE64 = re.compile(r"[A-Za-z0-9+/]*={0,2}")
 SUPPORTED_URL_SCHEMES_FOR_FILES = ["http", "https", "data", "file"]
 IMAGE_MODES_IN_PILLOW = ["RGB", "RGBA", "CMYK", "YCbCr", "LAB", "HSV", "1", "L", "P", "I", "F"]
 BUFFER_SIZE = 4 * 1024 * 1024
+# Jsonable values of these types are valid as they are
+JSONABLE_SCALAR_TYPES = (str, int, float, bool)
+COLLECTION_SHAPES: t.Dict[int, t.Callable[[t.List[t.Any]], t.Any]] = {
+    SHAPE_LIST: list,
+    SHAPE_TUPLE_ELLIPSIS: tuple,
+    SHAPE_SET: set,
+    SHAPE_FROZENSET: frozenset,
+}
 
 
 class FieldAnnotation(str, Enum):
@@ -68,13 +93,7 @@ class URIForFile(str):
             return self
 
         file_uri = self.to_file_uri()
-        path = get_path_from_file_url(file_uri)
-        mimetype = mimetypes.guess_type(url=file_uri, strict=False)[0]
-        if mimetype is None:
-            mimetype = "application/octet-stream" if is_binary(str(path)) else "text/plain"
-        return URIForFile(
-            f"data:{mimetype};base64,{base64.b64encode(path.read_bytes()).decode('utf-8')}"
-        )
+        return URIForFile(build_data_uri_from_path(get_path_from_file_url(file_uri)))
 
     @classmethod
     def __get_validators__(cls):
@@ -279,6 +298,30 @@ class BaseIO(BaseModel):
         m.update(to_be_hashsed.encode("utf-8"))
         return "sha256:" + m.hexdigest()
 
+    def _hash_for_memoization(self):
+        """
+        Hash of all fields, where files are represented by digests of their contents.
+        Equal inputs have the same hash regardless of how files are encoded.
+        """
+        m = hashlib.sha256()
+        m.update(json.dumps(_get_canonical_value(self), sort_keys=True).encode("utf-8"))
+        return "sha256:" + m.hexdigest()
+
+    @classmethod
+    def _construct_from_jsonable(cls, data: t.Dict[str, t.Any]):
+        """
+        Build an instance from the jsonable form of an already validated instance
+        without running validators again.
+
+        Files and nested BaseIO objects are constructed, also in lists, tuples and dicts.
+        Values of other types, e.g. enums and datetimes, are validated to be converted back.
+        """
+        values: t.Dict[str, t.Any] = dict()
+        for field in cls.__fields__.values():
+            if field.alias in data:
+                values[field.alias] = _construct_value(field, data[field.alias], cls)
+        return cls.construct(**values)
+
     if contexts.APP == contexts.Application.CLI:
 
         @classmethod
@@ -394,8 +437,75 @@ def build_uri_for_file(file: t.Any) -> URIForFile:
 
 
 def _check_base64(s: str) -> bool:
-    return False if s is None or not re.search(RE_BASE64, s) else True
+    return s is not None and len(s) % 4 == 0 and RE_BASE64.fullmatch(s) is not None
+
+
+def _construct_value(field: ModelField, value: t.Any, model_cls: t.Type[BaseModel]) -> t.Any:
+    if value is None:
+        return value
+
+    sub_fields = field.sub_fields
+    if field.shape == SHAPE_SINGLETON and sub_fields is None:
+        type_ = field.type_
+        if inspect.isclass(type_) and issubclass(type_, File):
+            return type_.construct(__root__=URIForFile(value))
+        if inspect.isclass(type_) and issubclass(type_, BaseIO):
+            return type_._construct_from_jsonable(value)
+        if type_ in JSONABLE_SCALAR_TYPES and type(value) is type_:
+            return value
+    elif field.shape in COLLECTION_SHAPES and sub_fields and isinstance(value, list):
+        return COLLECTION_SHAPES[field.shape](
+            [_construct_value(sub_fields[0], v, model_cls) for v in value]
+        )
+    elif field.shape == SHAPE_TUPLE and sub_fields and isinstance(value, list):
+        return tuple(_construct_value(f, v, model_cls) for f, v in zip(sub_fields, value))
+    elif field.shape in (SHAPE_DICT, SHAPE_MAPPING) and sub_fields and isinstance(value, dict):
+        key_field = t.cast(ModelField, field.key_field)
+        return {
+            _construct_value(key_field, k, model_cls): _construct_value(
+                sub_fields[0], v, model_cls
+            )
+            for k, v in value.items()
+        }
+
+    validated, errors = field.validate(value, {}, loc=field.alias, cls=model_cls)
+    if errors:
+        raise ValidationError([errors], model_cls)
+    return validated
 
 
 def _build_data_url(data: bytes) -> URIForFile:
     return URIForFile.from_b64str(base64.b64encode(data).decode())
+
+
+def _get_canonical_value(value: t.Any) -> t.Any:
+    if isinstance(value, File):
+        return {"file": _get_file_digest(value.__root__)}
+    if isinstance(value, BaseModel):
+        return {name: _get_canonical_value(getattr(value, name)) for name in value.__fields__}
+    if isinstance(value, (list, tuple)):
+        return [_get_canonical_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _get_canonical_value(v) for k, v in value.items()}
+    return jsonable_encoder(value)
+
+
+def _get_file_digest(uri: URIForFile) -> str:
+    """
+    Get the digest of the contents of a file.
+    Remote files are not downloaded, so they are identified by urls.
+    """
+    scheme = get_uri_scheme(uri)
+    m = hashlib.sha256()
+    if scheme == "data":
+        m.update(parse_data_uri(uri).data)
+    elif scheme == "file":
+        with open(get_path_from_file_url(uri), "rb") as f:
+            while True:
+                chunk = f.read(BUFFER_SIZE)
+                if not chunk:
+                    break
+                m.update(chunk)
+    else:
+        return "url:" + uri
+    return "sha256:" + m.hexdigest()
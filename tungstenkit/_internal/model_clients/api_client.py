@@ -12,6 +12,8 @@ from . import schemas
 
 CONNECTION_TIMEOUT = 5
 
+R = t.TypeVar("R", bound=schemas.PredictionResponse)
+
 
 class ModelAPIClient:
     def __init__(self, base_url: str, model_name: t.Optional[str] = None) -> None:
@@ -55,11 +57,16 @@ class ModelAPIClient:
         parsed = schemas.PredictionID.parse_raw(r.text)
         return parsed.prediction_id
 
-    def get_prediction(self, prediction_id: str) -> schemas.PredictionResponse:
+    def get_prediction(self, prediction_id: str, wait: float = 0.0) -> schemas.PredictionResponse:
+        """
+        Get a prediction. If ``wait`` is given, the server holds the request
+        up to ``wait`` seconds until the prediction is done.
+        """
         f = furl(self.base_url)
         f.path = f.path / "predictions" / prediction_id
+        f.args.update(_get_wait_args(wait))
         log_request(url=f.url, method="GET")
-        r = self.sess.get(url=f.url, timeout=CONNECTION_TIMEOUT)
+        r = self.sess.get(url=f.url, timeout=CONNECTION_TIMEOUT + wait)
         if r.status_code == 404 or r.status_code == 405:
             # legacy api
             f = furl(self.base_url)
@@ -70,6 +77,14 @@ class ModelAPIClient:
         self._check_resp(r, f.url, self.get_prediction)
         return schemas.PredictionResponse.parse_raw(r.text)
 
+    def stream_prediction(self, prediction_id: str) -> t.Iterator[schemas.PredictionResponse]:
+        """Iterate over updates of a prediction until it's done"""
+        f = furl(self.base_url)
+        f.path = f.path / "predictions" / prediction_id / "events"
+        return self._stream_events(
+            f.url, response_type=schemas.PredictionResponse, method=self.stream_prediction
+        )
+
     def cancel_prediction(self, prediction_id: str) -> None:
         f = furl(self.base_url)
         f.path = f.path / "predictions" / prediction_id / "cancel"
@@ -92,14 +107,27 @@ class ModelAPIClient:
         parsed = schemas.DemoID.parse_raw(r.text)
         return parsed.demo_id
 
-    def get_demo(self, demo_id: str) -> schemas.DemoResponse:
+    def get_demo(self, demo_id: str, wait: float = 0.0) -> schemas.DemoResponse:
+        """
+        Get a demo. If ``wait`` is given, the server holds the request
+        up to ``wait`` seconds until the demo is done.
+        """
         f = furl(self.base_url)
         f.path = f.path / "demo" / demo_id
+        f.args.update(_get_wait_args(wait))
         log_request(url=f.url, method="GET")
-        r = self.sess.get(url=f.url, timeout=CONNECTION_TIMEOUT)
+        r = self.sess.get(url=f.url, timeout=CONNECTION_TIMEOUT + wait)
         self._check_resp(r, f.url, self.get_demo)
         return schemas.DemoResponse.parse_raw(r.text)
 
+    def stream_demo(self, demo_id: str) -> t.Iterator[schemas.DemoResponse]:
+        """Iterate over updates of a demo, including logs, until it's done"""
+        f = furl(self.base_url)
+        f.path = f.path / "demo" / demo_id / "events"
+        return self._stream_events(
+            f.url, response_type=schemas.DemoResponse, method=self.stream_demo
+        )
+
     def cancel_demo(self, demo_id: str) -> None:
         f = furl(self.base_url)
         f.path = f.path / "demo" / demo_id / "cancel"
@@ -117,6 +145,23 @@ class ModelAPIClient:
         log_request(url=url, method="POST", data=jsonable)
         return self.sess.post(url=url, json=jsonable, timeout=timeout)
 
+    def _stream_events(
+        self, url: str, response_type: t.Type[R], method: t.Callable
+    ) -> t.Iterator[R]:
+        """Parse server-sent events of a prediction"""
+        log_request(url=url, method="GET")
+        # Events are sent only on updates, so don't time out while reading
+        with self.sess.get(url=url, stream=True, timeout=(CONNECTION_TIMEOUT, None)) as r:
+            self._check_resp(r, url, method)
+            data_lines: t.List[str] = []
+            for line in r.iter_lines(decode_unicode=True):
+                field, _, value = line.partition(":")
+                if field == "data":
+                    data_lines.append(value.strip())
+                elif not line and data_lines:
+                    yield response_type.parse_raw("\n".join(data_lines))
+                    data_lines = []
+
     def _check_resp(self, resp: requests.Response, url: str, method: t.Callable):
         name = " ".join(method.__name__.split("_"))
         err_msg_prefix = f"Failed to {name} "
@@ -125,3 +170,8 @@ class ModelAPIClient:
         else:
             err_msg_prefix += f"in model server at {self.base_url}"
         check_resp(resp=resp, url=url, exc_type=ModelClientError, err_msg_prefix=err_msg_prefix)
+
+
+def _get_wait_args(wait: float) -> t.Dict[str, str]:
+    # Legacy servers don't accept the argument, so send it only if needed
+    return {"wait": str(wait)} if wait > 0 else {}
@@ -8,6 +8,9 @@ from .api_client import ModelAPIClient
 if t.TYPE_CHECKING:
     from tungstenkit._internal.containers import ModelContainer
 
+# Seconds to wait for a demo to be done per request
+DEMO_WAIT_SEC = 10.0
+
 
 class ModelContainerClient:
     def __init__(self, container: "ModelContainer", rename_files: bool = False) -> None:
@@ -61,11 +64,14 @@ class ModelContainerClient:
         files.extend(files_in_inputs)
         demo_id = self._api.create_demo(inputs)
         while True:
-            result = self._api.get_demo(demo_id)
+            requested_at = time.monotonic()
+            result = self._api.get_demo(demo_id, wait=DEMO_WAIT_SEC)
             if result.status == "success" or result.status == "failed":
                 break
 
-            time.sleep(0.1)
+            # Legacy servers return without waiting
+            if time.monotonic() - requested_at < DEMO_WAIT_SEC:
+                time.sleep(0.1)
 
         if result.outputs:
             result.outputs, files_in_outputs = self._container.convert_file_uris_in_outputs(
@@ -75,6 +75,7 @@ def define_model(
     force_install_system_cuda: bool = False,
     readme_md: t.Optional[str] = None,
     batch_size: int = 1,
+    max_batch_delay_ms: float = 0.0,
     gpu_mem_gb: float = DEFAULT_GPU_MEM_GB,
     mem_gb: float = 8.0,
     include_files: t.Optional[t.List[str]] = None,
@@ -101,6 +102,7 @@ def define_model(
     force_install_system_cuda: bool = False,
     readme_md: t.Optional[str] = None,
     batch_size: int = 1,
+    max_batch_delay_ms: float = 0.0,
     gpu_mem_gb: float = DEFAULT_GPU_MEM_GB,
     mem_gb: float = 8.0,
     include_files: t.Optional[t.List[str]] = None,
@@ -126,6 +128,7 @@ def define_model(
     force_install_system_cuda: bool = False,
     readme_md: t.Optional[str] = None,
     batch_size: int = 1,
+    max_batch_delay_ms: float = 0.0,
     gpu_mem_gb: float = DEFAULT_GPU_MEM_GB,
     mem_gb: float = 8.0,
     include_files: t.Optional[t.List[str]] = None,
@@ -175,6 +178,10 @@ def define_model(
 
         batch_size (int): Max batch size for adaptive batching.
 
+        max_batch_delay_ms (float): Max time in milliseconds to wait for a batch to be filled
+            up to ``batch_size`` before running a prediction. If ``0`` (default), a prediction
+            runs with the inputs available at the moment.
+
         gpu_mem_gb (int): Minimum GPU memory size required to run the model. This argument will be
             ignored if ``gpu==False``.
 
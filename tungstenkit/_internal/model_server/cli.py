@@ -43,6 +43,106 @@ from .prediction_worker import PredictionWorker
     show_default=True,
     help="Max batch size",
 )
+@click.option(
+    "--max-batch-delay-ms",
+    default=float(os.environ.get("TUNGSTEN_MAX_BATCH_DELAY_MS", "0")),
+    type=float,
+    show_default=True,
+    help="Max time in milliseconds to wait for a batch to be filled",
+)
+@click.option(
+    "--pipelined",
+    is_flag=True,
+    default=os.environ.get("TUNGSTEN_PIPELINED", "0") != "0",
+    help="Upload outputs and save results while running the next prediction",
+)
+@click.option(
+    "--num-replicas",
+    "-n",
+    default=int(os.environ.get("TUNGSTEN_NUM_REPLICAS", "1")),
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="Number of model replicas, each running in its own subprocess",
+)
+@click.option(
+    "--pin-replicas",
+    is_flag=True,
+    default=os.environ.get("TUNGSTEN_PIN_REPLICAS", "0") != "0",
+    help="Pin each replica to a disjoint set of CPUs",
+)
+@click.option(
+    "--fork-replicas",
+    is_flag=True,
+    default=os.environ.get("TUNGSTEN_FORK_REPLICAS", "0") != "0",
+    help=(
+        "Set up the model once and fork replicas from it to share memory copy-on-write. "
+        "Only for models running on CPUs."
+    ),
+)
+@click.option(
+    "--memoize-size",
+    default=int(os.environ.get("TUNGSTEN_MEMOIZE_SIZE", "0")),
+    type=click.IntRange(min=0),
+    show_default=True,
+    help=(
+        "Max number of finished predictions to memoize by inputs (0 to disable). "
+        "Duplicates of running predictions also share their results."
+    ),
+)
+@click.option(
+    "--memoize-ttl",
+    default=float(os.environ.get("TUNGSTEN_MEMOIZE_TTL", "3600")),
+    type=float,
+    show_default=True,
+    help="Seconds to keep memoized predictions",
+)
+@click.option(
+    "--output-dedup-size",
+    default=int(os.environ.get("TUNGSTEN_OUTPUT_DEDUP_SIZE", "0")),
+    type=click.IntRange(min=0),
+    show_default=True,
+    help=(
+        "Max number of uploaded output files to remember by contents (0 to disable). "
+        "Identical files are not uploaded again."
+    ),
+)
+@click.option(
+    "--output-dedup-ttl",
+    default=float(os.environ.get("TUNGSTEN_OUTPUT_DEDUP_TTL", "600")),
+    type=float,
+    show_default=True,
+    help=(
+        "Seconds to reuse uploaded output files. "
+        "Should be shorter than uploaded files live, e.g. the expiration of presigned urls."
+    ),
+)
+@click.option(
+    "--max-queued-inputs",
+    default=int(os.environ.get("TUNGSTEN_MAX_QUEUED_INPUTS", "0")),
+    type=click.IntRange(min=0),
+    show_default=True,
+    help="Reject predictions if more inputs would be queued (0 for unlimited)",
+)
+@click.option(
+    "--max-queue-wait",
+    default=float(os.environ.get("TUNGSTEN_MAX_QUEUE_WAIT", "0")),
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help=(
+        "Reject predictions if the estimated wait in the queue is longer "
+        "than this in seconds (0 for unlimited)"
+    ),
+)
+@click.option(
+    "--max-client-concurrency",
+    default=int(os.environ.get("TUNGSTEN_MAX_CLIENT_CONCURRENCY", "0")),
+    type=click.IntRange(min=0),
+    show_default=True,
+    help=(
+        "Max number of unfinished predictions per client, identified by the X-Client-ID "
+        "header or the address (0 for unlimited)"
+    ),
+)
 @click.option(
     "--log-level",
     default="info",
@@ -55,12 +155,25 @@ def serve(
     http_port: int,
     mode: ModelServerMode,
     max_batch_size: int,
+    max_batch_delay_ms: float,
+    pipelined: bool,
+    num_replicas: int,
+    pin_replicas: bool,
+    fork_replicas: bool,
+    memoize_size: int,
+    memoize_ttl: float,
+    output_dedup_size: int,
+    output_dedup_ttl: float,
+    max_queued_inputs: int,
+    max_queue_wait: float,
+    max_client_concurrency: int,
     log_level: str,
 ):
     """Run tungsten model server."""
     from tungstenkit._internal import contexts
     from tungstenkit._internal.io import SUPPORTED_URL_SCHEMES_FOR_FILES
     from tungstenkit._internal.model_def_loader import create_model_def_loader
+    from tungstenkit._internal.utils.cpu import split_cpus
 
     try:
         mp.set_start_method("spawn")  # For CUDA
@@ -70,6 +183,8 @@ def serve(
 
     path = tempfile.mkdtemp()
     tempfile.tempdir = path
+    # Make spawned model processes create temp files there too, so they can be moved on upload
+    os.environ["TMPDIR"] = path
     atexit.register(shutil.rmtree, path)
 
     logger.remove()
@@ -88,6 +203,18 @@ def serve(
         cache_config=settings.cache_config,
         storage_config=settings.storage_config,
         max_batch_size=max_batch_size,
+        max_batch_delay=max_batch_delay_ms / 1000,
+        pipelined=pipelined,
+        num_replicas=num_replicas,
+        replica_cpu_sets=split_cpus(num_replicas) if pin_replicas else None,
+        fork_replicas=fork_replicas,
+        memoize_size=memoize_size,
+        memoize_ttl=memoize_ttl,
+        output_dedup_size=output_dedup_size,
+        output_dedup_ttl=output_dedup_ttl,
+        max_queued_inputs=max_queued_inputs,
+        max_queue_wait=max_queue_wait,
+        max_client_concurrency=max_client_concurrency,
         setup_timeout=settings.SETUP_TIMEOUT,
         prediction_timeout=settings.PREDICTION_TIMEOUT,
     )
@@ -16,8 +16,10 @@ class BaseCacheConfig:
     result_expiration: float
 
 
+@attrs.define(kw_only=True)
 class LocalCacheConfig(BaseCacheConfig):
-    pass
+    max_bytes: Optional[int] = None
+    max_disk_bytes: Optional[int] = None
 
 
 @attrs.define(kw_only=True)
@@ -45,14 +47,22 @@ class LocalFSStorageConfig(BaseStorageConfig):
 
 @attrs.define(kw_only=True)
 class S3StorageConfig(BaseStorageConfig):
+    # Endpoint followed by the bucket and an optional key prefix
     url: str
-    # TODO
+    region: Optional[str] = None
+    # Base url of public objects. Presigned urls are returned if not set.
+    public_url: Optional[str] = None
+    url_expiration: float = 3600.0
 
 
 @attrs.define(kw_only=True)
 class AzureBlobStorageConfig(BaseStorageConfig):
+    # Url of the container, optionally with a SAS token
     url: str
-    # TODO
+    account_key: Optional[str] = None
+    # Base url of public blobs. Blob urls with SAS tokens are returned if not set.
+    public_url: Optional[str] = None
+    url_expiration: float = 3600.0
 
 
 # ========================================================
@@ -68,6 +78,10 @@ class BaseModelServerSettings(pydantic.BaseSettings):
     PREDICTION_TIMEOUT: float = 7200.0
 
     RESULT_EXPIRATION: float = 3600.0
+    # Budgets for outputs in the local result cache (0 for unlimited).
+    # Outputs exceeding the memory budget are spilled to disk.
+    RESULT_CACHE_MAX_BYTES: int = 0
+    RESULT_CACHE_MAX_DISK_BYTES: int = 0
 
     @property
     def cache_config(self) -> BaseCacheConfig:
@@ -83,6 +97,8 @@ class StandaloneSettings(BaseModelServerSettings):
     def cache_config(self):
         return LocalCacheConfig(
             result_expiration=self.RESULT_EXPIRATION,
+            max_bytes=self.RESULT_CACHE_MAX_BYTES or None,
+            max_disk_bytes=self.RESULT_CACHE_MAX_DISK_BYTES or None,
         )
 
     @property
@@ -97,6 +113,8 @@ class FileTunnelSettings(BaseModelServerSettings):
     def cache_config(self):
         return LocalCacheConfig(
             result_expiration=self.RESULT_EXPIRATION,
+            max_bytes=self.RESULT_CACHE_MAX_BYTES or None,
+            max_disk_bytes=self.RESULT_CACHE_MAX_DISK_BYTES or None,
         )
 
     @property
@@ -105,9 +123,13 @@ class FileTunnelSettings(BaseModelServerSettings):
 
 
 class ClusterSettings(BaseModelServerSettings):
-    REDIS_URL: pydantic.AnyHttpUrl
+    REDIS_URL: pydantic.RedisDsn
     S3_URL: Optional[pydantic.AnyHttpUrl] = None
+    S3_REGION: Optional[str] = None
+    S3_PUBLIC_URL: Optional[pydantic.AnyHttpUrl] = None
     AZURE_BLOB_STORAGE_URL: Optional[pydantic.AnyHttpUrl] = None
+    AZURE_STORAGE_ACCOUNT_KEY: Optional[str] = None
+    AZURE_BLOB_PUBLIC_URL: Optional[pydantic.AnyHttpUrl] = None
 
     @property
     def cache_config(self) -> RedisConfig:
@@ -121,18 +143,28 @@ class ClusterSettings(BaseModelServerSettings):
         self,
     ) -> Union[S3StorageConfig, AzureBlobStorageConfig, InMemoryStorageConfig]:
         if self.S3_URL:
-            return S3StorageConfig(url=self.S3_URL)
+            return S3StorageConfig(
+                url=self.S3_URL,
+                region=self.S3_REGION,
+                public_url=self.S3_PUBLIC_URL,
+                url_expiration=self.RESULT_EXPIRATION,
+            )
 
         if self.AZURE_BLOB_STORAGE_URL:
-            return AzureBlobStorageConfig(url=self.AZURE_BLOB_STORAGE_URL)
+            return AzureBlobStorageConfig(
+                url=self.AZURE_BLOB_STORAGE_URL,
+                account_key=self.AZURE_STORAGE_ACCOUNT_KEY,
+                public_url=self.AZURE_BLOB_PUBLIC_URL,
+                url_expiration=self.RESULT_EXPIRATION,
+            )
 
         return InMemoryStorageConfig()
 
     @pydantic.root_validator()
     def validate_storage(cls, values: Dict[str, Any]) -> Dict[str, Any]:
-        if values.get("S3_URL") and values.get("BLOB_STORAGE_URL"):
+        if values.get("S3_URL") and values.get("AZURE_BLOB_STORAGE_URL"):
             raise ValueError(
-                "Expected only one, either `S3_URL` or `BLOB_STORAGE_URL`, not together"
+                "Expected only one, either `S3_URL` or `AZURE_BLOB_STORAGE_URL`, not together"
             )
         return values
 
@@ -1,10 +1,16 @@
-from ..config import BaseCacheConfig, LocalCacheConfig
+import redis
+
+from ..config import BaseCacheConfig, LocalCacheConfig, RedisConfig
 from .abstract_event_bus import AbstractEventBus
 from .local_event_bus import LocalEventBus
+from .redis_event_bus import RedisEventBus
 
 
 def create_event_bus(cache_config: BaseCacheConfig) -> AbstractEventBus:
     if isinstance(cache_config, LocalCacheConfig):
         return LocalEventBus()
 
+    if isinstance(cache_config, RedisConfig):
+        return RedisEventBus(redis.Redis.from_url(cache_config.redis_url, decode_responses=True))
+
     raise NotImplementedError()
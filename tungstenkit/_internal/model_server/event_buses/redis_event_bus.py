@@ -0,0 +1,31 @@
+import json
+import typing as t
+
+import redis
+
+from .abstract_event_bus import AbstractEventBus
+from .event import EventMessage
+
+
+class RedisEventBus(AbstractEventBus):
+    """
+    Event bus on a Redis pub/sub channel.
+    Events are delivered to all model servers using the same key prefix.
+    """
+
+    def __init__(self, client: redis.Redis, key_prefix: str = "tungsten") -> None:
+        self._client = client
+        self._channel = key_prefix + ":events"
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self._channel)
+        super().__init__()
+
+    def post(self, event_type: str, payload: t.Optional[str] = None) -> None:
+        message = json.dumps({"event_type": event_type, "payload": payload})
+        self._client.publish(self._channel, message)
+
+    def get(self) -> EventMessage:
+        for message in self._pubsub.listen():
+            if message["type"] == "message":
+                return EventMessage(**json.loads(message["data"]))
+        raise RuntimeError("Unsubscribed from the event channel")
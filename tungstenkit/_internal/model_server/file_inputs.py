@@ -0,0 +1,264 @@
+import inspect
+import mimetypes
+import re
+import typing as t
+from pathlib import Path
+from uuid import uuid4
+
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from multipart.multipart import MultipartParser, parse_options_header
+
+from tungstenkit._internal.io import BaseIO, File
+
+from .prediction_worker.transport import remove_spooled_files
+
+# Name of the multipart field containing inputs in JSON
+INPUTS_FIELD = "inputs"
+MULTIPART_CONTENT_TYPE = "multipart/form-data"
+RE_FILE_SUFFIX = re.compile(r"^\.[A-Za-z0-9]{1,16}$")
+
+# Request body of multipart requests in the OpenAPI schema
+MULTIPART_OPENAPI_EXTRA = {
+    "requestBody": {
+        "content": {
+            MULTIPART_CONTENT_TYPE: {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        INPUTS_FIELD: {
+                            "type": "string",
+                            "description": "Inputs in JSON. File fields can be omitted.",
+                        }
+                    },
+                    "additionalProperties": {
+                        "type": "string",
+                        "format": "binary",
+                        "description": "File of a field, named '<input index>.<field name>'",
+                    },
+                }
+            }
+        }
+    }
+}
+
+
+def create_file_input_route_class(spool_dir: Path, input_cls: t.Type[BaseIO]) -> t.Type[APIRoute]:
+    """
+    Create a route class accepting files in binary instead of base64 data uris.
+
+    Bodies of ``multipart/form-data`` are parsed into the ``inputs`` field in JSON and file
+    parts named ``<input index>.<field name>``. Other bodies that are not JSON are regarded
+    as the file of a single input, if the input has only one file field. Its other fields
+    are read from query parameters.
+
+    Files are streamed to ``spool_dir`` and referenced by file uris in inputs, which are
+    passed to the endpoint as a JSON body. So validation and the OpenAPI schema are the
+    same as JSON requests. Spooled files are removed when the request ends, unless they're
+    taken over by ``take_spooled_paths``.
+    """
+    file_fields = [
+        f.alias
+        for f in input_cls.__fields__.values()
+        if inspect.isclass(f.outer_type_) and issubclass(f.outer_type_, File)
+    ]
+
+    class FileInputRoute(APIRoute):
+        def get_route_handler(self) -> t.Callable[[Request], t.Coroutine[t.Any, t.Any, Response]]:
+            handle = super().get_route_handler()
+
+            async def handle_file_inputs(request: Request) -> Response:
+                mimetype = _get_mimetype(request)
+                if self.body_field is None or not mimetype or _is_json(mimetype):
+                    return await handle(request)
+
+                spooled: t.List[Path] = []
+                request.state.spooled_paths = spooled
+                try:
+                    if mimetype == MULTIPART_CONTENT_TYPE:
+                        inputs = await _spool_multipart(request, spool_dir, spooled)
+                    else:
+                        inputs = await _spool_raw(request, spool_dir, file_fields, spooled)
+                    return await handle(_with_json_body(request, inputs))
+                finally:
+                    remove_spooled_files(spooled)
+
+            return handle_file_inputs
+
+    return FileInputRoute
+
+
+def take_spooled_paths(request: Request) -> t.List[Path]:
+    """Take over files spooled from a request, so that they're not removed with it"""
+    spooled: t.Optional[t.List[Path]] = getattr(request.state, "spooled_paths", None)
+    if not spooled:
+        return []
+    taken = list(spooled)
+    spooled.clear()
+    return taken
+
+
+class _PartReceiver:
+    """Callbacks of ``MultipartParser``, writing file parts to files and keeping the others"""
+
+    def __init__(self, spool_dir: Path, spooled: t.List[Path]) -> None:
+        self.fields: t.Dict[str, str] = dict()
+        self.files: t.Dict[str, Path] = dict()
+        self._spool_dir = spool_dir
+        self._spooled = spooled
+        self._headers: t.Dict[bytes, bytes] = dict()
+        self._header_field = b""
+        self._header_value = b""
+        self._name = ""
+        self._data = bytearray()
+        self._file: t.Optional[t.BinaryIO] = None
+
+    @property
+    def callbacks(self) -> t.Dict[str, t.Callable]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = dict()
+        self._data = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise ValueError("Content-Disposition of a part has no name")
+        self._name = options[b"name"].decode()
+        if b"filename" in options:
+            suffix = Path(options[b"filename"].decode(errors="replace")).suffix
+            path = self._spool_dir / (
+                uuid4().hex + (suffix if RE_FILE_SUFFIX.match(suffix) else "")
+            )
+            self._spooled.append(path)
+            self._file = open(path, "wb")
+            self.files[self._name] = path
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._file is not None:
+            self._file.write(data[start:end])
+        else:
+            self._data += data[start:end]
+
+    def on_part_end(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        else:
+            self.fields[self._name] = self._data.decode()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+async def _spool_multipart(
+    request: Request, spool_dir: Path, spooled: t.List[Path]
+) -> t.List[t.Dict]:
+    _, params = parse_options_header(request.headers["content-type"])
+    if b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="No boundary in multipart/form-data")
+
+    receiver = _PartReceiver(spool_dir, spooled)
+    parser = MultipartParser(params[b"boundary"], receiver.callbacks)
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid multipart/form-data: {e}")
+    finally:
+        receiver.close()
+
+    try:
+        inputs = orjson.loads(receiver.fields.get(INPUTS_FIELD, "[]"))
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON in '{INPUTS_FIELD}': {e}")
+    if not isinstance(inputs, list) or not all(isinstance(inp, dict) for inp in inputs):
+        raise HTTPException(
+            status_code=400, detail=f"'{INPUTS_FIELD}' should be a list of objects"
+        )
+
+    for name, path in receiver.files.items():
+        idx, _, field_path = name.partition(".")
+        if not idx.isdigit() or not field_path or int(idx) > len(inputs) + len(receiver.files):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid name of file part: '{name}'. "
+                "It should be '<input index>.<field name>'.",
+            )
+        while len(inputs) <= int(idx):
+            inputs.append(dict())
+        target = inputs[int(idx)]
+        keys = field_path.split(".")
+        for key in keys[:-1]:
+            target = target.setdefault(key, dict())
+            if not isinstance(target, dict):
+                raise HTTPException(status_code=400, detail=f"'{name}' is not in an object")
+        target[keys[-1]] = path.as_uri()
+
+    return inputs
+
+
+async def _spool_raw(
+    request: Request, spool_dir: Path, file_fields: t.List[str], spooled: t.List[Path]
+) -> t.List[t.Dict]:
+    if len(file_fields) != 1:
+        raise HTTPException(
+            status_code=415,
+            detail="Raw request bodies are only for inputs with a single file field. "
+            f"Use application/json or {MULTIPART_CONTENT_TYPE} instead.",
+        )
+
+    suffix = mimetypes.guess_extension(_get_mimetype(request), strict=False) or ""
+    path = spool_dir / (uuid4().hex + suffix)
+    spooled.append(path)
+    with open(path, "wb") as f:
+        async for chunk in request.stream():
+            f.write(chunk)
+
+    inp: t.Dict[str, t.Any] = dict(request.query_params)
+    inp[file_fields[0]] = path.as_uri()
+    return [inp]
+
+
+def _with_json_body(request: Request, inputs: t.List[t.Dict]) -> Request:
+    scope = dict(request.scope)
+    scope["headers"] = [
+        (k, v)
+        for k, v in request.scope["headers"]
+        if k not in (b"content-type", b"content-length")
+    ] + [(b"content-type", b"application/json")]
+    converted = Request(scope, request.receive)
+    converted._body = orjson.dumps(inputs)
+    return converted
+
+
+def _get_mimetype(request: Request) -> str:
+    return request.headers.get("content-type", "").partition(";")[0].strip().lower()
+
+
+def _is_json(mimetype: str) -> bool:
+    return mimetype == "application/json" or mimetype.endswith("+json")
@@ -1,3 +1,5 @@
+from .abstract_file_uploader import AbstractFileUploader
+from .dedup_file_uploader import DedupFileUploader, DedupStats
 from .factory import create_file_uploader
 
-__all__ = ["create_file_uploader"]
+__all__ = ["AbstractFileUploader", "DedupFileUploader", "DedupStats", "create_file_uploader"]
@@ -1 +1,149 @@
-# TODO
+import logging
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+import requests
+from azure.core.exceptions import AzureError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import (
+    BlobBlock,
+    BlobClient,
+    BlobSasPermissions,
+    ContainerClient,
+    ContentSettings,
+    generate_blob_sas,
+)
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from tungstenkit import exceptions
+from tungstenkit._internal import io
+
+from .abstract_file_uploader import AbstractFileUploader
+from .sources import UploadSource, load_upload_source
+
+MAX_CONCURRENCY = 16
+BLOCK_SIZE = 8 * 1024 * 1024
+# Files larger than this are staged in blocks
+MAX_SINGLE_PUT_SIZE = 16 * 1024 * 1024
+
+# The SDK logs every request and response at INFO
+logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
+
+
+class AzureBlobFileUploader(AbstractFileUploader):
+    """
+    Upload files to a container of Azure Blob Storage.
+
+    ``url`` is the url of the container, e.g. ``https://<account>.blob.core.windows.net/<name>``,
+    optionally with a SAS token in the query. The container is accessed with ``account_key``
+    if it's set.
+
+    Files are named by their SHA-256 digests, so identical outputs are stored once.
+    Large files are staged in blocks, which are sent in parallel and committed at once.
+    The container client and its pooled connections are shared by all batches.
+
+    Uploaded files are returned as:
+    - urls under ``public_url``, if it's set
+    - blob urls with read-only SAS tokens valid for ``url_expiration`` seconds,
+      if ``account_key`` is set
+    - blob urls with the SAS token in ``url``, otherwise
+    """
+
+    def __init__(
+        self,
+        url: str,
+        account_key: t.Optional[str] = None,
+        public_url: t.Optional[str] = None,
+        url_expiration: float = 3600.0,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> None:
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.url_expiration = url_expiration
+        self._account_key = account_key
+        self._max_concurrency = max_concurrency
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_concurrency)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self._container = ContainerClient.from_container_url(
+            url, credential=account_key, transport=RequestsTransport(session=session)
+        )
+        # Shared by all uploads, so that blocks of all files are staged with bounded concurrency
+        self._block_executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="azure-block-stager"
+        )
+
+    def upload(self, files: t.List[io.File]) -> t.List[io.File]:
+        """Upload files to the container, skipping files already in it"""
+        if not files:
+            return []
+
+        uris = list(dict.fromkeys(f.__root__ for f in files))
+        with ThreadPoolExecutor(max_workers=min(len(uris), self._max_concurrency)) as executor:
+            url_dict = dict(zip(uris, executor.map(self._upload, uris)))
+
+        return [f.__class__.from_url(url_dict[f.__root__]) for f in files]
+
+    def _upload(self, uri: io.URIForFile) -> str:
+        source = load_upload_source(uri)
+        blob = self._container.get_blob_client(source.key)
+        content_settings = ContentSettings(content_type=source.content_type)
+        try:
+            if blob.exists():
+                logger.debug(
+                    f"Skipped uploading '{source.key}', which is already in the container"
+                )
+            elif source.size <= MAX_SINGLE_PUT_SIZE:
+                with source.open() as f:
+                    blob.upload_blob(
+                        f, length=source.size, overwrite=True, content_settings=content_settings
+                    )
+                logger.debug(f"Uploaded '{source.key}'")
+            else:
+                self._upload_in_blocks(blob, source, content_settings)
+                logger.debug(f"Uploaded '{source.key}' in blocks")
+            return self._get_url(blob)
+        except AzureError as e:
+            raise exceptions.UploadError(f"Failed to upload '{source.key}' to Azure Blob: {e}")
+
+    def _upload_in_blocks(
+        self, blob: BlobClient, source: UploadSource, content_settings: ContentSettings
+    ) -> None:
+        offsets = range(0, source.size, BLOCK_SIZE)
+        # Block ids should be of the same length in a blob
+        block_ids = [f"{i:06d}" for i in range(len(offsets))]
+        futures = [
+            self._block_executor.submit(_stage_block, blob, block_id, source, offset)
+            for block_id, offset in zip(block_ids, offsets)
+        ]
+        for future in futures:
+            future.result()
+        blob.commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=content_settings,
+        )
+
+    def _get_url(self, blob: BlobClient) -> str:
+        if self.public_url:
+            return self.public_url + "/" + quote(blob.blob_name)
+
+        if self._account_key:
+            sas_token = generate_blob_sas(
+                account_name=blob.account_name,
+                container_name=blob.container_name,
+                blob_name=blob.blob_name,
+                account_key=self._account_key,
+                permission=BlobSasPermissions(read=True),
+                expiry=datetime.now(timezone.utc) + timedelta(seconds=self.url_expiration),
+            )
+            return blob.url.partition("?")[0] + "?" + sas_token
+
+        return blob.url
+
+
+def _stage_block(blob: BlobClient, block_id: str, source: UploadSource, offset: int) -> None:
+    blob.stage_block(block_id, source.read(offset, BLOCK_SIZE))
@@ -0,0 +1,100 @@
+import time
+import typing as t
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import attrs
+
+from tungstenkit._internal import io
+
+from .abstract_file_uploader import AbstractFileUploader
+from .sources import UploadSource, load_upload_source
+
+MAX_WORKERS = 8
+
+
+@attrs.define(kw_only=True)
+class DedupStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0
+
+
+@attrs.define(kw_only=True)
+class _Entry:
+    uri: io.URIForFile
+    expires_at: float
+
+
+class DedupFileUploader(AbstractFileUploader):
+    """
+    Skips uploading files whose contents were uploaded before, reusing their uploaded uris.
+
+    Files are identified by the SHA-256 digests of their contents and their suffixes.
+    Uploaded uris of up to ``max_entries`` files are kept for ``ttl`` seconds, which should
+    be shorter than uploaded files live, e.g. the expiration of presigned urls.
+    """
+
+    def __init__(self, uploader: AbstractFileUploader, max_entries: int, ttl: float) -> None:
+        self._uploader = uploader
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._stats = DedupStats()
+        self._lock = Lock()
+
+    def upload(self, files: t.List[io.File]) -> t.List[io.File]:
+        """Upload files not uploaded before with the wrapped uploader"""
+        if not files:
+            return []
+
+        uris = list(dict.fromkeys(f.__root__ for f in files))
+        with ThreadPoolExecutor(max_workers=min(len(uris), MAX_WORKERS)) as executor:
+            source_dict = dict(zip(uris, executor.map(load_upload_source, uris)))
+        sources = [source_dict[f.__root__] for f in files]
+
+        uploaded_uris: t.Dict[str, io.URIForFile] = dict()
+        # Files to upload by their keys. Identical files in a batch are uploaded once.
+        missed: t.Dict[str, io.File] = dict()
+        with self._lock:
+            now = time.monotonic()
+            for f, source in zip(files, sources):
+                entry = self._entries.get(source.key)
+                if entry is not None and entry.expires_at <= now:
+                    del self._entries[source.key]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(source.key)
+                    uploaded_uris[source.key] = entry.uri
+                    self._count_hit(source)
+                elif source.key in missed:
+                    self._count_hit(source)
+                else:
+                    missed[source.key] = f
+                    self._stats.misses += 1
+
+        if missed:
+            uploaded = self._uploader.upload(list(missed.values()))
+            expires_at = time.monotonic() + self._ttl
+            with self._lock:
+                for key, f in zip(missed.keys(), uploaded):
+                    uploaded_uris[key] = f.__root__
+                    self._entries[key] = _Entry(uri=f.__root__, expires_at=expires_at)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+
+        # Uploaded uris are already validated
+        return [
+            f.__class__.construct(__root__=uploaded_uris[source.key])
+            for f, source in zip(files, sources)
+        ]
+
+    def get_stats(self) -> DedupStats:
+        with self._lock:
+            return attrs.evolve(self._stats)
+
+    def _count_hit(self, source: UploadSource) -> None:
+        self._stats.hits += 1
+        self._stats.bytes_saved += source.size
@@ -1,7 +1,15 @@
-from ..config import BaseStorageConfig, InMemoryStorageConfig, LocalFSStorageConfig
+from ..config import (
+    AzureBlobStorageConfig,
+    BaseStorageConfig,
+    InMemoryStorageConfig,
+    LocalFSStorageConfig,
+    S3StorageConfig,
+)
 from .abstract_file_uploader import AbstractFileUploader
+from .azure_file_uploader import AzureBlobFileUploader
 from .in_memory_file_uploader import InMemoryFileUploader
 from .local_fs_file_uploader import LocalFSFileUploader
+from .s3_file_uploader import S3FileUploader
 
 
 def create_file_uploader(storage_config: BaseStorageConfig) -> AbstractFileUploader:
@@ -11,4 +19,20 @@ def create_file_uploader(storage_config: BaseStorageConfig) -> AbstractFileUploa
     if isinstance(storage_config, LocalFSStorageConfig):
         return LocalFSFileUploader(mount_point=storage_config.mount_point)
 
+    if isinstance(storage_config, S3StorageConfig):
+        return S3FileUploader(
+            url=storage_config.url,
+            region=storage_config.region,
+            public_url=storage_config.public_url,
+            url_expiration=storage_config.url_expiration,
+        )
+
+    if isinstance(storage_config, AzureBlobStorageConfig):
+        return AzureBlobFileUploader(
+            url=storage_config.url,
+            account_key=storage_config.account_key,
+            public_url=storage_config.public_url,
+            url_expiration=storage_config.url_expiration,
+        )
+
     raise NotImplementedError
@@ -2,19 +2,28 @@ import typing as t
 from concurrent.futures import ThreadPoolExecutor
 
 from tungstenkit._internal import io
+from tungstenkit._internal.utils.uri import build_data_uri_from_path, get_path_from_file_url
 
 from .abstract_file_uploader import AbstractFileUploader
 
+MAX_WORKERS = 8
+
 
 class InMemoryFileUploader(AbstractFileUploader):
     def upload(self, files: t.List[io.File]) -> t.List[io.File]:
-        """Load files as data uris"""
-        classes = [f.__class__ for f in files]
-        rets = []
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            for i, file in enumerate(files):
-                fut = executor.submit(file.__root__.to_data_uri)
-                data_uri = fut.result()
-                rets.append(classes[i](__root__=data_uri))
-
-        return rets
+        """Load files as data uris, converting them in parallel"""
+        if not files:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(len(files), MAX_WORKERS)) as executor:
+            data_uris = list(executor.map(_load_as_data_uri, files))
+
+        # Data uris are built here, so skip validation not to copy them again
+        return [f.__class__.construct(__root__=data_uri) for f, data_uri in zip(files, data_uris)]
+
+
+def _load_as_data_uri(file: io.File) -> io.URIForFile:
+    uri = file.__root__
+    if uri.get_scheme() == "data":
+        return uri
+    return io.URIForFile(build_data_uri_from_path(get_path_from_file_url(uri.to_file_uri())))
@@ -1,57 +1,153 @@
+import errno
+import os
 import shutil
+import tempfile
 import time
 import typing as t
-from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from uuid import uuid4
 
+from loguru import logger
+
 from tungstenkit import exceptions
 from tungstenkit._internal import io
+from tungstenkit._internal.utils.file import is_relative_to
 from tungstenkit._internal.utils.uri import get_path_from_file_url
 
 from .abstract_file_uploader import AbstractFileUploader
 
-BUFFER_SIZE = 4 * 1024 * 1024
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+MAX_WORKERS = 8
+SAVE_TIMEOUT = 60
+SYNC_TIMEOUT = 10
+SYNC_POLL_INTERVAL = 0.1
+
+# ioctl request of cloning a file, from linux/fs.h. Not in ``fcntl`` before Python 3.12.
+FICLONE = 0x40049409
+
+# Errors meaning that a strategy isn't available for a file. Others are raised as they are.
+UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EACCES,
+    errno.EMLINK,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    errno.EBADF,
+}
 
 
 class LocalFSFileUploader(AbstractFileUploader):
-    def __init__(self, mount_point: Path) -> None:
+    """
+    Save files to the mount point, avoiding copies where possible.
+
+    A file is saved with the first of these that works:
+
+    1. Hardlink, if it is on the same filesystem as the mount point
+    2. Reflink (``FICLONE``), if the filesystem supports copy-on-write clones
+    3. Rename, if the model created it in one of ``temp_dirs``
+    4. Copy
+
+    Hardlinked outputs share the inode of the source, so a model shouldn't rewrite a file
+    in place after returning it.
+    """
+
+    def __init__(self, mount_point: Path, temp_dirs: t.Optional[t.List[Path]] = None) -> None:
         self.mount_point = mount_point
+        if temp_dirs is None:
+            temp_dirs = [Path(tempfile.gettempdir())]
+        self.temp_dirs = [d.resolve() for d in temp_dirs]
 
     def upload(self, files: t.List[io.File]) -> t.List[io.File]:
         """Save files to the mount point"""
-        # TODO cleanup
-        type_dict = {i: f.__class__ for i, f in enumerate(files)}
-        future_dict: t.Dict[int, Future] = dict()
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            for idx, src in executor.map(self._save, range(len(files)), files):
-                dest = self.mount_point / ("output-" + uuid4().hex + "-" + src.name)
-                future_dict[idx] = executor.submit(shutil.copy, str(src), str(dest))
-
-            saved_paths: t.List[Path] = [
-                Path(future_dict[i].result(timeout=60)) for i in range(len(files))
-            ]
-
-        # Wait for sync with docker volume
-        start_time = time.monotonic()
-        all_files_exist = all(p.exists() for p in saved_paths)
-        while all_files_exist and time.monotonic() - start_time < 10:
-            all_files_exist = all(p.exists() for p in saved_paths)
-            if all_files_exist:
-                break
-            else:
-                time.sleep(0.1)
-
-        for p in saved_paths:
-            p.chmod(0o666)
-
-        if not all_files_exist:
-            raise exceptions.UploadError("Failed to save files to the volume")
-
-        out = [type_dict[i].from_path(p) for i, p in enumerate(saved_paths)]
-        return out
-
-    def _save(self, idx: int, file: io.File) -> t.Tuple[int, Path]:
-        file_uri = io.URIForFile(file.__root__).to_file_uri()
-        path = get_path_from_file_url(file_uri)
-        return idx, path
+        if not files:
+            return []
+
+        src_paths = [_get_path(f) for f in files]
+        # The same file can be in outputs more than once. Save it once, since it may be moved.
+        unique_src_paths = list(dict.fromkeys(src_paths))
+        with ThreadPoolExecutor(max_workers=min(len(unique_src_paths), MAX_WORKERS)) as executor:
+            dest_dict = dict(
+                zip(
+                    unique_src_paths,
+                    executor.map(self._save, unique_src_paths, timeout=SAVE_TIMEOUT),
+                )
+            )
+        saved_paths = [dest_dict[p] for p in src_paths]
+
+        _wait_for_sync(dest_dict.values(), timeout=SYNC_TIMEOUT)
+
+        return [f.__class__.from_path(p) for f, p in zip(files, saved_paths)]
+
+    def _save(self, src: Path) -> Path:
+        dest = self.mount_point / ("output-" + uuid4().hex + "-" + src.name)
+        for strategy in (_link, _reflink, self._move_temp_file):
+            try:
+                if strategy(src, dest):
+                    break
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+        else:
+            shutil.copy(str(src), str(dest))
+            logger.debug(f"Copied '{src}' to '{dest}'")
+
+        dest.chmod(0o666)
+        return dest
+
+    def _move_temp_file(self, src: Path, dest: Path) -> bool:
+        real_src = src.resolve()
+        if not any(is_relative_to(real_src, d) for d in self.temp_dirs):
+            return False
+        os.replace(src, dest)
+        logger.debug(f"Moved '{src}' to '{dest}'")
+        return True
+
+
+def _get_path(file: io.File) -> Path:
+    file_uri = io.URIForFile(file.__root__).to_file_uri()
+    return get_path_from_file_url(file_uri)
+
+
+def _link(src: Path, dest: Path) -> bool:
+    if os.stat(src).st_dev != os.stat(dest.parent).st_dev:
+        return False
+    os.link(src, dest)
+    logger.debug(f"Hardlinked '{src}' to '{dest}'")
+    return True
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    if fcntl is None:
+        return False
+    with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+        try:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dest_file.close()
+            os.remove(dest)
+            raise
+    shutil.copymode(str(src), str(dest))
+    logger.debug(f"Reflinked '{src}' to '{dest}'")
+    return True
+
+
+def _wait_for_sync(paths: t.Iterable[Path], timeout: float) -> None:
+    """Wait until files are visible, e.g. in a docker volume synced with the host"""
+    deadline = time.monotonic() + timeout
+    missing = [p for p in paths if not p.exists()]
+    while missing:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise exceptions.UploadError(
+                f"Failed to save files to the volume: {', '.join(str(p) for p in missing)}"
+            )
+        time.sleep(min(SYNC_POLL_INTERVAL, remaining))
+        missing = [p for p in missing if not p.exists()]
@@ -1 +1,130 @@
-# TODO
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from loguru import logger
+
+from tungstenkit import exceptions
+from tungstenkit._internal import io
+
+from .abstract_file_uploader import AbstractFileUploader
+from .sources import load_upload_source
+
+MAX_CONCURRENCY = 16
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_ATTEMPTS = 5
+# Presigned urls of SigV4 expire in 7 days at most
+MAX_URL_EXPIRATION = 7 * 24 * 3600
+
+NOT_FOUND_ERROR_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+class S3FileUploader(AbstractFileUploader):
+    """
+    Upload files to an S3-compatible object store.
+
+    ``url`` is the endpoint followed by the bucket and an optional key prefix, e.g.
+    ``https://s3.us-east-1.amazonaws.com/my-bucket/outputs``. Credentials are read by boto3,
+    e.g. from ``AWS_ACCESS_KEY_ID`` and ``AWS_SECRET_ACCESS_KEY``.
+
+    Files are keyed by their SHA-256 digests, so identical outputs are stored once.
+    Large files are uploaded in parts, which are sent in parallel. The client and its
+    connection pool are shared by all batches.
+
+    Uploaded files are returned as urls under ``public_url`` if it's set, or presigned urls
+    valid for ``url_expiration`` seconds.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        region: t.Optional[str] = None,
+        public_url: t.Optional[str] = None,
+        url_expiration: float = 3600.0,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> None:
+        endpoint_url, self.bucket, self.key_prefix = _parse_url(url)
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.url_expiration = int(min(url_expiration, MAX_URL_EXPIRATION))
+        self._max_concurrency = max_concurrency
+        self._client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(
+                signature_version="s3v4",
+                max_pool_connections=max_concurrency,
+                retries={"max_attempts": MAX_ATTEMPTS, "mode": "standard"},
+                # Virtual-hosted-style requests are not supported by MinIO by default
+                s3={"addressing_style": "path"},
+            ),
+        )
+        self._transfer_manager = create_transfer_manager(
+            self._client,
+            TransferConfig(
+                multipart_threshold=MULTIPART_THRESHOLD,
+                multipart_chunksize=MULTIPART_CHUNK_SIZE,
+                max_concurrency=max_concurrency,
+            ),
+        )
+
+    def upload(self, files: t.List[io.File]) -> t.List[io.File]:
+        """Upload files to the bucket, skipping files already in it"""
+        if not files:
+            return []
+
+        uris = list(dict.fromkeys(f.__root__ for f in files))
+        with ThreadPoolExecutor(max_workers=min(len(uris), self._max_concurrency)) as executor:
+            url_dict = dict(zip(uris, executor.map(self._upload, uris)))
+
+        return [f.__class__.from_url(url_dict[f.__root__]) for f in files]
+
+    def _upload(self, uri: io.URIForFile) -> str:
+        source = load_upload_source(uri)
+        key = self.key_prefix + source.key
+        try:
+            if self._exists(key):
+                logger.debug(f"Skipped uploading '{key}', which is already in the bucket")
+            else:
+                body = str(source.path) if source.path else source.open()
+                self._transfer_manager.upload(
+                    body, self.bucket, key, extra_args={"ContentType": source.content_type}
+                ).result()
+                logger.debug(f"Uploaded '{key}'")
+            return self._get_url(key)
+        except (BotoCoreError, ClientError) as e:
+            raise exceptions.UploadError(f"Failed to upload '{key}' to S3: {e}")
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in NOT_FOUND_ERROR_CODES:
+                return False
+            raise
+
+    def _get_url(self, key: str) -> str:
+        if self.public_url:
+            return self.public_url + "/" + quote(key)
+        return self._client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.url_expiration,
+        )
+
+
+def _parse_url(url: str) -> t.Tuple[str, str, str]:
+    """Split an url into the endpoint, the bucket and the key prefix"""
+    parsed = urlsplit(url)
+    bucket, _, key_prefix = parsed.path.strip("/").partition("/")
+    if not parsed.scheme or not parsed.netloc or not bucket:
+        raise ValueError(f"Invalid S3 url: '{url}'. It should be '<endpoint>/<bucket>[/<prefix>]'")
+    if key_prefix:
+        key_prefix += "/"
+    return f"{parsed.scheme}://{parsed.netloc}", bucket, key_prefix
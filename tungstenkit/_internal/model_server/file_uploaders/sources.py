@@ -0,0 +1,67 @@
+import hashlib
+import mimetypes
+import os
+import typing as t
+from io import BytesIO
+from pathlib import Path
+
+import attrs
+from w3lib.url import parse_data_uri
+
+from tungstenkit._internal import io
+from tungstenkit._internal.utils.file import hash_file
+from tungstenkit._internal.utils.uri import get_path_from_file_url
+
+
+@attrs.frozen(kw_only=True)
+class UploadSource:
+    """Contents of a file to upload, either in a local file or in memory"""
+
+    digest: str
+    content_type: str
+    suffix: str
+    size: int
+    path: t.Optional[Path] = None
+    data: t.Optional[bytes] = None
+
+    @property
+    def key(self) -> str:
+        """Name of the file in content-addressed storages"""
+        return self.digest + self.suffix
+
+    def open(self) -> t.BinaryIO:
+        if self.path is not None:
+            return open(self.path, "rb")
+        assert self.data is not None
+        return BytesIO(self.data)
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self.path is None:
+            assert self.data is not None
+            end = offset + length
+            return self.data[offset:end]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+
+def load_upload_source(uri: io.URIForFile) -> UploadSource:
+    """Get the contents of a file uri or data uri, with their SHA-256 digest"""
+    if uri.get_scheme() == "data":
+        parsed = parse_data_uri(uri)
+        return UploadSource(
+            digest=hashlib.sha256(parsed.data).hexdigest(),
+            content_type=parsed.media_type,
+            suffix=mimetypes.guess_extension(parsed.media_type, strict=False) or "",
+            size=len(parsed.data),
+            data=parsed.data,
+        )
+
+    path = get_path_from_file_url(io.URIForFile(uri).to_file_uri())
+    return UploadSource(
+        digest=hash_file(path),
+        content_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+        suffix=path.suffix,
+        size=os.path.getsize(path),
+        path=path,
+    )
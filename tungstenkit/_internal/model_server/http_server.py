@@ -1,20 +1,45 @@
+import asyncio
+import math
 import typing as t
+from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Response
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from loguru import logger
+from starlette.concurrency import run_in_threadpool
 
 from tungstenkit._internal.model_def_loader import ModelDefLoader
 from tungstenkit._versions import pkg_version
 
 from . import schema, server_exceptions
+from .file_inputs import (
+    MULTIPART_OPENAPI_EXTRA,
+    create_file_input_route_class,
+    take_spooled_paths,
+)
 from .prediction_worker import PredictionWorker
+from .prediction_worker.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .prediction_worker.transport import (
+    create_spool_dir,
+    remove_spool_dir,
+    remove_spooled_files,
+)
+from .result_caches import Result
 
 R = t.TypeVar("R", bound=schema.PredictionResponse)
 
 OPENAPI_TITLE = "Tungsten Model"
 
+# Max seconds to hold a long-poll request
+MAX_WAIT_SEC = 60.0
+# Seconds between checks for status and log updates in event streams
+EVENT_STREAM_INTERVAL_SEC = 0.5
+# Header to identify clients for admission control. Addresses are used if not given.
+CLIENT_ID_HEADER = "X-Client-ID"
+
 
 def create_app(
     prediction_worker: PredictionWorker,
@@ -29,6 +54,14 @@ def create_app(
         allow_methods=["*"],
         allow_headers=["*"],
     )
+
+    # Files sent in binary are spooled here until their predictions are done
+    app.state.file_input_dir = create_spool_dir()
+    app.add_event_handler("shutdown", lambda: remove_spool_dir(app.state.file_input_dir))
+    app.router.route_class = create_file_input_route_class(
+        app.state.file_input_dir, model_loader.input_class
+    )
+
     _add_endpoints(app, prediction_worker=prediction_worker, model_loader=model_loader)
     _setup_openapi(app)
 
@@ -50,6 +83,8 @@ def _add_endpoints(
 
     # TODO define route class
 
+    # Handlers are async except for cancelation, which may poll the result cache.
+    # Waiting for a result is awaited, so in-flight requests don't occupy threads.
     def cancel(prediction_id: str) -> Response:
         try:
             prediction_worker.cancel_prediction(prediction_id)
@@ -60,28 +95,121 @@ def _add_endpoints(
             raise HTTPException(status_code=500)
         return Response(status_code=200)
 
+    def create_prediction(request: Request, inputs: t.List, is_demo: bool) -> str:
+        client_id = request.headers.get(CLIENT_ID_HEADER) or (
+            request.client.host if request.client else None
+        )
+        try:
+            prediction_id = prediction_worker.create_prediction(
+                inputs=inputs, is_demo=is_demo, client_id=client_id
+            )
+        except server_exceptions.PredictionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(status_code=500)
+
+        spooled_paths = take_spooled_paths(request)
+        if spooled_paths:
+            asyncio.ensure_future(remove_spooled_inputs(prediction_id, spooled_paths))
+        return prediction_id
+
+    async def remove_spooled_inputs(prediction_id: str, spooled_paths: t.List[Path]) -> None:
+        """Remove files spooled from a request when its prediction is done"""
+        try:
+            while True:
+                try:
+                    await prediction_worker.wait_for_prediction_async(
+                        prediction_id, timeout=MAX_WAIT_SEC
+                    )
+                    return
+                except server_exceptions.PredictionTimeout:
+                    continue
+        except server_exceptions.PredictionIDNotFound:
+            pass
+        finally:
+            remove_spooled_files(spooled_paths)
+
+    async def get_result(prediction_id: str, wait: float) -> Result:
+        """Get a result, waiting up to ``wait`` seconds for the prediction to be done"""
+        try:
+            if wait > 0:
+                try:
+                    await prediction_worker.wait_for_prediction_async(prediction_id, timeout=wait)
+                except server_exceptions.PredictionTimeout:
+                    pass
+            return prediction_worker.get_prediction_result(prediction_id)
+        except server_exceptions.PredictionIDNotFound as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(status_code=500)
+
+    async def stream_results(
+        prediction_id: str, build_content: t.Callable[[Result], t.Dict[str, t.Any]]
+    ) -> StreamingResponse:
+        """
+        Stream a server-sent event whenever the response changes, until the prediction
+        is done. The stream wakes up as soon as the prediction is done, and checks for
+        status and log updates in between.
+        """
+        first_result = await get_result(prediction_id, wait=0.0)
+
+        async def generate_events() -> t.AsyncIterator[str]:
+            result = first_result
+            last_data = None
+            while True:
+                data = orjson.dumps(build_content(result)).decode()
+                if data != last_data:
+                    yield f"event: {result.status}\ndata: {data}\n\n"
+                    last_data = data
+                if result.status == "success" or result.status == "failed":
+                    return
+
+                try:
+                    await prediction_worker.wait_for_prediction_async(
+                        prediction_id, timeout=EVENT_STREAM_INTERVAL_SEC
+                    )
+                except server_exceptions.PredictionTimeout:
+                    pass
+                try:
+                    result = prediction_worker.get_prediction_result(prediction_id)
+                except server_exceptions.PredictionIDNotFound:
+                    return
+
+        return StreamingResponse(
+            generate_events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+
     @app.get("/", response_model=schema.Metadata)
     async def get_metadata():
         return basic_info
 
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def get_metrics():
+        return PlainTextResponse(prediction_worker.get_metrics(), media_type=METRICS_CONTENT_TYPE)
+
     @app.post(
         "/predict",
         response_model=PredictionResponse,
+        openapi_extra=MULTIPART_OPENAPI_EXTRA,
     )
-    def predict_synchronously(req: PredictionRequest):  # type: ignore
-        try:
-            prediction_id = prediction_worker.create_prediction(
-                inputs=req.__root__, is_demo=False  # type: ignore
-            )
-        except Exception as e:
-            logger.exception(e)
-            raise HTTPException(status_code=500)
+    async def predict_synchronously(req: PredictionRequest, request: Request):  # type: ignore
+        prediction_id = create_prediction(request, req.__root__, is_demo=False)  # type: ignore
 
         async_resp = schema.PredictionID(prediction_id=prediction_id)
 
+        done = False
         try:
             try:
-                prediction_worker.wait_for_prediction(async_resp.prediction_id)
+                await prediction_worker.wait_for_prediction_async(async_resp.prediction_id)
+                done = True
             except Exception as e:
                 logger.exception(e)
                 raise HTTPException(status_code=500)
@@ -93,17 +221,14 @@ def _add_endpoints(
                 logger.exception(e)
                 raise HTTPException(status_code=500)
 
-            resp = PredictionResponse(
-                outputs=result.outputs,  # type: ignore
-                status=result.status,
-                error_message=result.error_message,
-            )
+            resp = ORJSONResponse(build_prediction_content(result))
 
         finally:
-            try:
-                cancel(async_resp.prediction_id)
-            except Exception:
-                pass
+            if not done:
+                try:
+                    await run_in_threadpool(cancel, async_resp.prediction_id)
+                except Exception:
+                    pass
 
             try:
                 prediction_worker.remove_prediction_result(async_resp.prediction_id)
@@ -112,37 +237,28 @@ def _add_endpoints(
 
         return resp
 
-    @app.post("/predictions", response_model=schema.PredictionID)
-    def predict_asynchronously(req: PredictionRequest):  # type: ignore
-        try:
-            prediction_id = prediction_worker.create_prediction(
-                inputs=req.__root__,  # type: ignore
-                is_demo=False,
-            )
-        except Exception as e:
-            logger.exception(e)
-            raise HTTPException(status_code=500)
-
+    @app.post(
+        "/predictions",
+        response_model=schema.PredictionID,
+        openapi_extra=MULTIPART_OPENAPI_EXTRA,
+    )
+    async def predict_asynchronously(req: PredictionRequest, request: Request):  # type: ignore
+        prediction_id = create_prediction(request, req.__root__, is_demo=False)  # type: ignore
         return schema.PredictionID(prediction_id=prediction_id)
 
     @app.get(
         "/predictions/{prediction_id}",
         response_model=PredictionResponse,
     )
-    def get_prediction_result(prediction_id: str):
-        try:
-            result = prediction_worker.get_prediction_result(prediction_id)
-        except server_exceptions.PredictionIDNotFound as e:
-            raise HTTPException(status_code=404, detail=str(e))
-        except Exception as e:
-            logger.exception(e)
-            raise HTTPException(status_code=500)
+    async def get_prediction_result(
+        prediction_id: str, wait: float = Query(default=0.0, ge=0.0, le=MAX_WAIT_SEC)
+    ):
+        result = await get_result(prediction_id, wait)
+        return ORJSONResponse(build_prediction_content(result))
 
-        return PredictionResponse(
-            outputs=result.outputs,  # type: ignore
-            status=result.status,
-            error_message=result.error_message,
-        )
+    @app.get("/predictions/{prediction_id}/events")
+    async def stream_prediction_events(prediction_id: str):
+        return await stream_results(prediction_id, build_prediction_content)
 
     @app.post("/predictions/{prediction_id}/cancel")
     def cancel_prediction(prediction_id: str):
@@ -151,38 +267,25 @@ def _add_endpoints(
     @app.post(
         "/demo",
         response_model=schema.DemoID,
+        openapi_extra=MULTIPART_OPENAPI_EXTRA,
     )
-    def request_demo(req: PredictionRequest):  # type: ignore
-        try:
-            demo_id = prediction_worker.create_prediction(
-                inputs=req.__root__,  # type: ignore
-                is_demo=True,
-            )
-        except Exception as e:
-            logger.exception(e)
-            raise HTTPException(status_code=500)
+    async def request_demo(req: PredictionRequest, request: Request):  # type: ignore
+        demo_id = create_prediction(request, req.__root__, is_demo=True)  # type: ignore
         return schema.DemoID(demo_id=demo_id)
 
     @app.get(
         "/demo/{demo_id}",
         response_model=DemoResponse,
     )
-    def get_demo_result(demo_id: str):
-        try:
-            result = prediction_worker.get_prediction_result(demo_id)
-        except server_exceptions.PredictionIDNotFound as e:
-            raise HTTPException(status_code=404, detail=str(e))
-        except Exception as e:
-            logger.exception(e)
-            raise HTTPException(status_code=500)
+    async def get_demo_result(
+        demo_id: str, wait: float = Query(default=0.0, ge=0.0, le=MAX_WAIT_SEC)
+    ):
+        result = await get_result(demo_id, wait)
+        return ORJSONResponse(build_demo_content(result))
 
-        return DemoResponse(
-            outputs=result.outputs,  # type: ignore
-            status=result.status,
-            error_message=result.error_message,
-            demo_outputs=result.demo_outputs,
-            logs=result.logs,
-        )
+    @app.get("/demo/{demo_id}/events")
+    async def stream_demo_events(demo_id: str):
+        return await stream_results(demo_id, build_demo_content)
 
     @app.post(
         "/demo/{demo_id}/cancel",
@@ -191,6 +294,26 @@ def _add_endpoints(
         return cancel(demo_id)
 
 
+# Outputs in results were validated and serialized when they were predicted, so responses
+# are built from them as they are. Response models are only for the OpenAPI schema, since
+# FastAPI doesn't validate responses returned directly.
+def build_prediction_content(result: Result) -> t.Dict[str, t.Any]:
+    """Get the body of ``schema.PredictionResponse`` from a result"""
+    return {
+        "outputs": result.outputs,
+        "status": result.status,
+        "error_message": result.error_message,
+    }
+
+
+def build_demo_content(result: Result) -> t.Dict[str, t.Any]:
+    """Get the body of ``schema.DemoResponse`` from a result"""
+    content = build_prediction_content(result)
+    content["demo_outputs"] = result.demo_outputs
+    content["logs"] = result.logs
+    return content
+
+
 def _setup_openapi(app: FastAPI):
     # TODO use user-defined readme here
     openapi_schema = get_openapi(
@@ -14,5 +14,9 @@ def get_prediction_id_from_input_id(input_id: str) -> str:
     return input_id.split("-")[0]
 
 
+def get_input_index_from_input_id(input_id: str) -> int:
+    return int(input_id.split("-")[1])
+
+
 def check_input_in_prediction(input_id: str, prediction_id: str) -> bool:
     return input_id.startswith(prediction_id)
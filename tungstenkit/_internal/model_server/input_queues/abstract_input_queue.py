@@ -17,9 +17,25 @@ class AbstractInputQueue(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def pop(self, max_batch_size: int, timeout: t.Optional[float] = None) -> Batch:
+    def pop(
+        self,
+        max_batch_size: int,
+        timeout: t.Optional[float] = None,
+        max_batch_delay: float = 0.0,
+        only_full: bool = False,
+    ) -> Batch:
+        """
+        Pop a batch of the oldest input, waiting up to ``max_batch_delay`` for it to be filled.
+        If ``only_full`` is set, wait until it's filled regardless of ``max_batch_delay``.
+        Raises ``TimeoutError`` if no batch is popped in ``timeout`` seconds.
+        """
         pass
 
     @abc.abstractmethod
     def remove(self, prediction_id: str) -> t.List[str]:
         pass
+
+    @abc.abstractmethod
+    def get_num_queued(self) -> int:
+        """Get the number of inputs in the queue"""
+        pass
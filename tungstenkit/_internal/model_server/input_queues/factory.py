@@ -1,10 +1,16 @@
-from ..config import BaseCacheConfig, LocalCacheConfig
+import redis
+
+from ..config import BaseCacheConfig, LocalCacheConfig, RedisConfig
 from .abstract_input_queue import AbstractInputQueue
 from .local_input_queue import LocalInputQueue
+from .redis_input_queue import RedisInputQueue
 
 
 def create_input_queue(cache_config: BaseCacheConfig) -> AbstractInputQueue:
     if isinstance(cache_config, LocalCacheConfig):
         return LocalInputQueue()
 
-    raise NotADirectoryError
+    if isinstance(cache_config, RedisConfig):
+        return RedisInputQueue(redis.Redis.from_url(cache_config.redis_url, decode_responses=True))
+
+    raise NotImplementedError()
@@ -1,6 +1,7 @@
 import time
 import typing as t
-from threading import Lock
+from collections import deque
+from threading import Condition
 
 import attrs
 from fastapi.encoders import jsonable_encoder
@@ -8,10 +9,12 @@ from loguru import logger
 
 from tungstenkit._internal.io import BaseIO
 
-from ..ids import check_input_in_prediction, get_input_ids_from_prediction_id
+from ..ids import get_input_ids_from_prediction_id, get_prediction_id_from_input_id
 from .abstract_input_queue import AbstractInputQueue
 from .shared import Batch
 
+BucketKey = t.Tuple[str, bool]
+
 
 @attrs.frozen(eq=True)
 class Input:
@@ -19,13 +22,30 @@ class Input:
     data: dict = attrs.field(eq=False)
     hash_for_batching: str = attrs.field(eq=False)
     demo: bool = attrs.field(eq=False)
+    pushed_at: float = attrs.field(eq=False, factory=time.monotonic)
+
+    @property
+    def bucket_key(self) -> BucketKey:
+        return (self.hash_for_batching, self.demo)
 
 
 class LocalInputQueue(AbstractInputQueue):
+    """
+    Input queue indexed by ``(hash_for_batching, demo)``.
+
+    Each bucket is a FIFO of inputs which can be batched together, and a global FIFO
+    keeps the arrival order across buckets. Removed inputs are dropped lazily from both
+    FIFOs, so that assembling a batch costs O(batch size) instead of O(queue size).
+    """
+
     def __init__(self) -> None:
         super().__init__()
-        self._list: t.List[Input] = list()
-        self._lock: Lock = Lock()
+        self._order: t.Deque[Input] = deque()
+        self._buckets: t.Dict[BucketKey, t.Deque[Input]] = dict()
+        self._bucket_sizes: t.Dict[BucketKey, int] = dict()
+        self._queued: t.Dict[str, Input] = dict()
+        self._map_pred_id_to_inp_ids: t.Dict[str, t.Set[str]] = dict()
+        self._cond: Condition = Condition()
 
     def push(
         self,
@@ -34,7 +54,8 @@ class LocalInputQueue(AbstractInputQueue):
         is_demo: bool,
     ) -> t.List[str]:
         input_ids = get_input_ids_from_prediction_id(prediction_id, len(inputs))
-        self._list.extend(
+        # Encode outside the lock not to block poppers
+        encoded = [
             Input(
                 input_id=input_id,
                 data=jsonable_encoder(inp),
@@ -42,60 +63,111 @@ class LocalInputQueue(AbstractInputQueue):
                 demo=is_demo,
             )
             for input_id, inp in zip(input_ids, inputs)
-        )
+        ]
+        with self._cond:
+            for inp in encoded:
+                key = inp.bucket_key
+                self._order.append(inp)
+                self._buckets.setdefault(key, deque()).append(inp)
+                self._bucket_sizes[key] = self._bucket_sizes.get(key, 0) + 1
+                self._queued[inp.input_id] = inp
+            self._map_pred_id_to_inp_ids.setdefault(prediction_id, set()).update(input_ids)
+            self._cond.notify_all()
 
         logger.debug(f"Pushed {len(inputs)} inputs of prediction {prediction_id} to input queue")
         return input_ids
 
-    def pop(self, max_batch_size: int, timeout: t.Optional[float] = None) -> Batch:
+    def pop(
+        self,
+        max_batch_size: int,
+        timeout: t.Optional[float] = None,
+        max_batch_delay: float = 0.0,
+        only_full: bool = False,
+    ) -> Batch:
         assert max_batch_size > 0
-        inputs: t.List[Input] = []
-        if timeout:
-            start_time = time.monotonic()
-
-        while True:
-            if timeout and time.monotonic() - start_time > timeout:
-                raise TimeoutError
-            try:
-                inputs.append(self._list.pop(0))
-                is_demo = inputs[0].demo
-                hash_for_batching = inputs[0].hash_for_batching
-                break
-            except IndexError:
-                time.sleep(0.005)
-
-        with self._lock:
-            i = 0
-            while len(inputs) < max_batch_size and i < len(self._list):
-                if (
-                    self._list[i].hash_for_batching == hash_for_batching
-                    and self._list[i].demo == is_demo
-                ):
-                    inputs.append(self._list.pop(i))
-                else:
-                    i += 1
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fill_started_at: t.Optional[float] = None
+
+        with self._cond:
+            while True:
+                first = self._peek()
+                if first is None:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError
+                    self._cond.wait(remaining)
+                    continue
 
+                # Wait for the batch of the oldest input to be filled
+                if fill_started_at is None:
+                    fill_started_at = time.monotonic()
+                remaining = fill_started_at + max_batch_delay - time.monotonic()
+                if self._bucket_sizes[first.bucket_key] >= max_batch_size:
+                    break
+                if only_full:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError
+                elif remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            self._order.popleft()
+            bucket = self._buckets[first.bucket_key]
+            inputs: t.List[Input] = []
+            while bucket and len(inputs) < max_batch_size:
+                inp = bucket.popleft()
+                if inp.input_id in self._queued:
+                    self._discard(inp)
+                    inputs.append(inp)
+
+        popped_at = time.monotonic()
         return Batch(
             input_ids=[inp.input_id for inp in inputs],
             data=[inp.data for inp in inputs],
-            is_demo=is_demo,
+            is_demo=first.demo,
+            batching_delay=popped_at - fill_started_at,
+            queue_waits=[popped_at - inp.pushed_at for inp in inputs],
         )
 
     def remove(self, prediction_id: str) -> t.List[str]:
-        with self._lock:
-            to_be_removed: t.List[Input] = []
-            for inp in self._list:
-                if check_input_in_prediction(input_id=inp.input_id, prediction_id=prediction_id):
-                    to_be_removed.append(inp)
-
-            removed: t.List[Input] = []
-        
-            for inp in to_be_removed:
-                try:
-                    self._list.remove(inp)
-                    removed.append(inp)
-                    logger.debug(f"Input {inp.input_id} was removed from input queue")
-                except ValueError:
-                    continue
+        removed: t.List[Input] = []
+        with self._cond:
+            for input_id in sorted(self._map_pred_id_to_inp_ids.get(prediction_id, ())):
+                inp = self._queued[input_id]
+                self._discard(inp)
+                removed.append(inp)
+
+        for inp in removed:
+            logger.debug(f"Input {inp.input_id} was removed from input queue")
 
         return [r.input_id for r in removed]
+
+    def get_num_queued(self) -> int:
+        return len(self._queued)
+
+    def _peek(self) -> t.Optional[Input]:
+        """Get the oldest input in the queue, skipping inputs already popped or removed"""
+        if not self._queued:
+            return None
+        while self._order[0].input_id not in self._queued:
+            self._order.popleft()
+        return self._order[0]
+
+    def _discard(self, inp: Input) -> None:
+        """Unindex an input. Entries left in the FIFOs are skipped when reached."""
+        del self._queued[inp.input_id]
+        if not self._queued:
+            self._order.clear()
+
+        pred_id = get_prediction_id_from_input_id(inp.input_id)
+        inp_ids = self._map_pred_id_to_inp_ids[pred_id]
+        inp_ids.discard(inp.input_id)
+        if not inp_ids:
+            del self._map_pred_id_to_inp_ids[pred_id]
+
+        key = inp.bucket_key
+        self._bucket_sizes[key] -= 1
+        if self._bucket_sizes[key] == 0:
+            del self._bucket_sizes[key]
+            del self._buckets[key]
@@ -0,0 +1,227 @@
+import json
+import time
+import typing as t
+
+import redis
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+
+from tungstenkit._internal.io import BaseIO
+
+from ..ids import get_input_ids_from_prediction_id
+from .abstract_input_queue import AbstractInputQueue
+from .shared import Batch
+
+MAX_SIGNALS = 64
+# Seconds between peeks while waiting for a full batch
+FULL_BATCH_POLL_INTERVAL = 0.01
+
+# Same layout as LocalInputQueue:
+#   <prefix>:order             list of input ids in arrival order
+#   <prefix>:bucket:<bucket>   list of input ids per bucket
+#   <prefix>:sizes             hash of bucket -> number of queued inputs
+#   <prefix>:data              hash of input id -> serialized input
+#   <prefix>:bucket_of         hash of input id -> bucket
+#   <prefix>:pred:<pred id>    set of queued input ids of a prediction
+# Stale ids left in the lists are dropped lazily.
+_DISCARD = """
+local function discard(prefix, input_id, bucket)
+    redis.call('HDEL', prefix .. ':data', input_id)
+    redis.call('HDEL', prefix .. ':bucket_of', input_id)
+    local pred_id = string.match(input_id, '^([^-]+)')
+    redis.call('SREM', prefix .. ':pred:' .. pred_id, input_id)
+    if redis.call('HINCRBY', prefix .. ':sizes', bucket, -1) <= 0 then
+        redis.call('HDEL', prefix .. ':sizes', bucket)
+        redis.call('DEL', prefix .. ':bucket:' .. bucket)
+    end
+    if redis.call('HLEN', prefix .. ':data') == 0 then
+        redis.call('DEL', prefix .. ':order')
+    end
+end
+"""
+
+# Get the oldest input with its bucket and the bucket size
+_PEEK = """
+local prefix = ARGV[1]
+while true do
+    local head = redis.call('LINDEX', prefix .. ':order', 0)
+    if not head then
+        return false
+    end
+    local bucket = redis.call('HGET', prefix .. ':bucket_of', head)
+    if bucket then
+        return {head, bucket, tonumber(redis.call('HGET', prefix .. ':sizes', bucket))}
+    end
+    redis.call('LPOP', prefix .. ':order')
+end
+"""
+
+# Pop up to ARGV[3] inputs from a bucket
+_POP = (
+    _DISCARD
+    + """
+local prefix = ARGV[1]
+local bucket = ARGV[2]
+local max_batch_size = tonumber(ARGV[3])
+local popped = {}
+while #popped < 2 * max_batch_size do
+    local input_id = redis.call('LPOP', prefix .. ':bucket:' .. bucket)
+    if not input_id then
+        break
+    end
+    local data = redis.call('HGET', prefix .. ':data', input_id)
+    if data then
+        discard(prefix, input_id, bucket)
+        table.insert(popped, input_id)
+        table.insert(popped, data)
+    end
+end
+return popped
+"""
+)
+
+# Remove queued inputs of a prediction
+_REMOVE = (
+    _DISCARD
+    + """
+local prefix = ARGV[1]
+local removed = {}
+for _, input_id in ipairs(redis.call('SMEMBERS', prefix .. ':pred:' .. ARGV[2])) do
+    local bucket = redis.call('HGET', prefix .. ':bucket_of', input_id)
+    if bucket then
+        discard(prefix, input_id, bucket)
+        table.insert(removed, input_id)
+    end
+end
+return removed
+"""
+)
+
+
+class RedisInputQueue(AbstractInputQueue):
+    """
+    Input queue in Redis, shared by model servers using the same key prefix.
+
+    Batches are popped atomically by Lua scripts. Pushes signal a list that poppers
+    wait on with ``BLPOP``. The client should be created with ``decode_responses=True``.
+    """
+
+    def __init__(self, client: redis.Redis, key_prefix: str = "tungsten") -> None:
+        super().__init__()
+        self._client = client
+        self._prefix = key_prefix + ":queue"
+        self._signal_key = self._prefix + ":signal"
+        self._peek_script = client.register_script(_PEEK)
+        self._pop_script = client.register_script(_POP)
+        self._remove_script = client.register_script(_REMOVE)
+
+    def push(
+        self,
+        prediction_id: str,
+        inputs: t.List[BaseIO],
+        is_demo: bool,
+    ) -> t.List[str]:
+        input_ids = get_input_ids_from_prediction_id(prediction_id, len(inputs))
+        pipe = self._client.pipeline(transaction=True)
+        # Wall clock time, since the input may be popped by another server
+        pushed_at = time.time()
+        for input_id, inp in zip(input_ids, inputs):
+            bucket = inp._hash_for_batching() + ":" + str(int(is_demo))
+            data = json.dumps(
+                {"data": jsonable_encoder(inp), "demo": is_demo, "pushed_at": pushed_at}
+            )
+            pipe.hset(self._prefix + ":data", input_id, data)
+            pipe.hset(self._prefix + ":bucket_of", input_id, bucket)
+            pipe.rpush(self._prefix + ":order", input_id)
+            pipe.rpush(self._prefix + ":bucket:" + bucket, input_id)
+            pipe.hincrby(self._prefix + ":sizes", bucket, 1)
+            pipe.sadd(self._prefix + ":pred:" + prediction_id, input_id)
+        self._signal(pipe, len(input_ids))
+        pipe.execute()
+
+        logger.debug(f"Pushed {len(inputs)} inputs of prediction {prediction_id} to input queue")
+        return input_ids
+
+    def pop(
+        self,
+        max_batch_size: int,
+        timeout: t.Optional[float] = None,
+        max_batch_delay: float = 0.0,
+        only_full: bool = False,
+    ) -> Batch:
+        assert max_batch_size > 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fill_started_at: t.Optional[float] = None
+        # Waiting for a full batch polls instead of taking signals meant for other poppers
+        wait = self._poll if only_full else self._wait
+
+        while True:
+            peeked = self._peek_script(args=[self._prefix])
+            if not peeked:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError
+                wait(remaining)
+                continue
+
+            # Wait for the batch of the oldest input to be filled
+            _, bucket, bucket_size = peeked
+            if fill_started_at is None:
+                fill_started_at = time.monotonic()
+            remaining = fill_started_at + max_batch_delay - time.monotonic()
+            if int(bucket_size) < max_batch_size:
+                if only_full:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError
+                    wait(remaining)
+                    continue
+                if remaining > 0:
+                    self._wait(remaining)
+                    continue
+
+            popped = self._pop_script(args=[self._prefix, bucket, max_batch_size])
+            if popped:
+                break
+            # Taken by another popper
+
+        # Wake up other poppers if inputs are left
+        if self._client.exists(self._prefix + ":order"):
+            self._signal(self._client, 1)
+
+        input_ids = popped[0::2]
+        decoded = [json.loads(d) for d in popped[1::2]]
+        popped_at = time.time()
+        return Batch(
+            input_ids=input_ids,
+            data=[d["data"] for d in decoded],
+            is_demo=decoded[0]["demo"],
+            batching_delay=time.monotonic() - fill_started_at,
+            queue_waits=[max(popped_at - d.get("pushed_at", popped_at), 0.0) for d in decoded],
+        )
+
+    def remove(self, prediction_id: str) -> t.List[str]:
+        removed = sorted(self._remove_script(args=[self._prefix, prediction_id]))
+        for input_id in removed:
+            logger.debug(f"Input {input_id} was removed from input queue")
+        return removed
+
+    def get_num_queued(self) -> int:
+        return self._client.hlen(self._prefix + ":data")
+
+    def _signal(self, client: t.Union[redis.Redis, "redis.client.Pipeline"], num: int) -> None:
+        client.lpush(self._signal_key, *(["1"] * num))
+        client.ltrim(self._signal_key, 0, MAX_SIGNALS - 1)
+
+    def _wait(self, timeout: t.Optional[float]) -> None:
+        """Block until inputs are pushed or timeout expires"""
+        # BLPOP blocks forever with 0, so don't pass too small timeouts
+        self._client.blpop(
+            [self._signal_key], timeout=0 if timeout is None else max(timeout, 0.01)
+        )
+
+    def _poll(self, timeout: t.Optional[float]) -> None:
+        """Sleep until the next peek without consuming signals"""
+        time.sleep(
+            FULL_BATCH_POLL_INTERVAL if timeout is None else min(timeout, FULL_BATCH_POLL_INTERVAL)
+        )
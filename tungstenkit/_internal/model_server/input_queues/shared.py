@@ -8,3 +8,6 @@ class Batch:
     input_ids: List[str]
     data: List[dict]
     is_demo: bool
+    batching_delay: float = 0.0
+    # Seconds each input waited in the queue, from being pushed to being popped
+    queue_waits: List[float] = attrs.field(factory=list)
@@ -0,0 +1,123 @@
+import math
+import typing as t
+from threading import Lock
+
+import attrs
+from loguru import logger
+
+from .. import server_exceptions
+
+# Weight of the latest batch in the moving average of batch latencies
+LATENCY_SMOOTHING = 0.2
+# Retry-After when there's nothing to estimate it from
+DEFAULT_RETRY_AFTER_SEC = 1.0
+# Number of tracked predictions between sweeps of finished predictions of all clients
+SWEEP_PERIOD = 1000
+
+
+@attrs.define(kw_only=True)
+class AdmissionStats:
+    admitted: int = 0
+    rejected_queue_full: int = 0
+    rejected_queue_wait: int = 0
+    rejected_client_limit: int = 0
+    queued_inputs: int = 0
+    batch_latency: t.Optional[float] = None
+
+
+class AdmissionController:
+    """
+    Rejects predictions the server can't take in time.
+
+    A prediction is rejected if:
+    - the queue would exceed ``max_queued_inputs``
+    - the estimated wait in the queue would exceed ``max_queue_wait`` seconds
+    - its client already has ``max_client_concurrency`` unfinished predictions
+
+    The wait is estimated from the moving average of batch latencies, assuming queued
+    inputs are predicted in full batches of ``batch_capacity`` inputs. Finished
+    predictions of clients are detected with ``is_done``. Each limit is disabled if it's 0.
+    """
+
+    def __init__(
+        self,
+        batch_capacity: int,
+        is_done: t.Callable[[str], bool],
+        max_queued_inputs: int = 0,
+        max_queue_wait: float = 0.0,
+        max_client_concurrency: int = 0,
+    ) -> None:
+        self._batch_capacity = batch_capacity
+        self._max_queued_inputs = max_queued_inputs
+        self._max_queue_wait = max_queue_wait
+        self._max_client_concurrency = max_client_concurrency
+        self._is_done = is_done
+        self._num_tracked = 0
+        self._batch_latency: t.Optional[float] = None
+        self._active: t.Dict[str, t.Set[str]] = dict()
+        self._stats = AdmissionStats()
+        self._lock = Lock()
+
+    def record_batch(self, latency: float) -> None:
+        with self._lock:
+            if self._batch_latency is None:
+                self._batch_latency = latency
+            else:
+                self._batch_latency += LATENCY_SMOOTHING * (latency - self._batch_latency)
+
+    def admit(self, num_inputs: int, num_queued: int, client_id: t.Optional[str] = None) -> None:
+        """
+        Check if a prediction can be admitted, or raise ``PredictionRejected``
+        with the seconds to retry after.
+        """
+        with self._lock:
+            self._stats.queued_inputs = num_queued
+            if self._max_queued_inputs and num_queued + num_inputs > self._max_queued_inputs:
+                self._stats.rejected_queue_full += 1
+                excess = num_queued + num_inputs - self._max_queued_inputs
+                self._reject("Too many queued inputs", self._estimate_wait(excess))
+
+            wait = self._estimate_wait(num_queued + num_inputs)
+            if self._max_queue_wait and wait is not None and wait > self._max_queue_wait:
+                self._stats.rejected_queue_wait += 1
+                self._reject("Queue wait is too long", wait - self._max_queue_wait)
+
+            if self._max_client_concurrency and client_id is not None:
+                active = self._active.get(client_id, set())
+                self._forget_done(active)
+                if len(active) >= self._max_client_concurrency:
+                    self._stats.rejected_client_limit += 1
+                    self._reject("Too many predictions of the client", self._batch_latency)
+
+            self._stats.admitted += 1
+
+    def track(self, client_id: t.Optional[str], prediction_id: str) -> None:
+        """Count an admitted prediction against the concurrency of its client"""
+        if not self._max_client_concurrency or client_id is None:
+            return
+        with self._lock:
+            self._active.setdefault(client_id, set()).add(prediction_id)
+            self._num_tracked += 1
+            if self._num_tracked % SWEEP_PERIOD == 0:
+                # Forget clients which don't come back
+                for c, active in list(self._active.items()):
+                    self._forget_done(active)
+                    if not active:
+                        del self._active[c]
+
+    def get_stats(self) -> AdmissionStats:
+        with self._lock:
+            return attrs.evolve(self._stats, batch_latency=self._batch_latency)
+
+    def _forget_done(self, prediction_ids: t.Set[str]) -> None:
+        prediction_ids.difference_update([p for p in prediction_ids if self._is_done(p)])
+
+    def _estimate_wait(self, num_inputs: int) -> t.Optional[float]:
+        if self._batch_latency is None:
+            return None
+        return math.ceil(num_inputs / self._batch_capacity) * self._batch_latency
+
+    def _reject(self, reason: str, retry_after: t.Optional[float]) -> t.NoReturn:
+        retry_after = max(retry_after or DEFAULT_RETRY_AFTER_SEC, DEFAULT_RETRY_AFTER_SEC)
+        logger.warning(f"Rejected a prediction: {reason}")
+        raise server_exceptions.PredictionRejected(reason, retry_after=retry_after)
@@ -0,0 +1,52 @@
+import bisect
+import time
+import typing as t
+from collections import Counter
+from threading import Lock
+
+from loguru import logger
+
+LOG_PERIOD_SEC = 60.0
+DELAY_BUCKETS_MS: t.List[float] = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
+DELAY_BUCKET_LABELS: t.List[str] = [f"<={b}ms" for b in DELAY_BUCKETS_MS] + [
+    f">{DELAY_BUCKETS_MS[-1]}ms"
+]
+
+
+class BatchStats:
+    """
+    Histograms of batch sizes and batching delays.
+
+    The histograms are logged and reset every ``log_period`` seconds.
+    """
+
+    def __init__(self, log_period: float = LOG_PERIOD_SEC) -> None:
+        self._log_period = log_period
+        self._batch_sizes: t.Counter[int] = Counter()
+        self._delays: t.List[int] = [0] * (len(DELAY_BUCKETS_MS) + 1)
+        self._last_logged_at = time.monotonic()
+        self._lock = Lock()
+
+    def record(self, batch_size: int, batching_delay: float) -> None:
+        with self._lock:
+            self._batch_sizes[batch_size] += 1
+            self._delays[bisect.bisect_left(DELAY_BUCKETS_MS, batching_delay * 1000)] += 1
+
+            if time.monotonic() - self._last_logged_at >= self._log_period:
+                self._log()
+
+    def _log(self) -> None:
+        self._last_logged_at = time.monotonic()
+        num_batches = sum(self._batch_sizes.values())
+        if num_batches == 0:
+            return
+
+        sizes = ", ".join(f"{size}: {cnt}" for size, cnt in sorted(self._batch_sizes.items()))
+        delays = ", ".join(
+            f"{label}: {cnt}" for label, cnt in zip(DELAY_BUCKET_LABELS, self._delays) if cnt > 0
+        )
+        logger.info(f"Batch sizes over {num_batches} batches: {{{sizes}}}")
+        logger.info(f"Batching delays over {num_batches} batches: {{{delays}}}")
+
+        self._batch_sizes.clear()
+        self._delays = [0] * (len(DELAY_BUCKETS_MS) + 1)
@@ -1,4 +1,5 @@
 import multiprocessing as mp
+import multiprocessing.connection as mp_connection
 import os
 import signal
 import tempfile
@@ -7,7 +8,7 @@ import typing as t
 from pathlib import Path
 from threading import Lock
 
-from fastapi.encoders import jsonable_encoder
+import attrs
 
 from tungstenkit._internal.io import BaseIO
 from tungstenkit._internal.model_def_loader import ModelDefLoader
@@ -15,8 +16,38 @@ from tungstenkit._internal.utils.console import LogFileRedirector
 
 from .. import server_exceptions
 from .subproc import PredictionFailure, PredictionRequest, PredictionSuccess, WorkerSubprocess
+from .template_subproc import ForkedReplica, TemplateSubprocess
+from .transport import (
+    create_spool_dir,
+    remove_spool_dir,
+    remove_spooled_files,
+    spool_large_data_uris,
+)
 
-ACK_TIMEOUT_SEC = 1
+SETUP_LOG_UPDATE_INTERVAL_SEC = 0.1
+
+
+@attrs.define
+class PreparedInputs:
+    """Inputs ready to be sent to the subprocess, with large files spooled"""
+
+    inputs: t.List[t.Dict]
+    # Files spooled for each input
+    spooled_paths: t.List[t.List[Path]]
+
+    def remove(self, indices: t.Collection[int]) -> None:
+        """Remove inputs at ``indices`` with their spooled files"""
+        for idx in indices:
+            remove_spooled_files(self.spooled_paths[idx])
+        self.inputs = [inp for idx, inp in enumerate(self.inputs) if idx not in indices]
+        self.spooled_paths = [
+            paths for idx, paths in enumerate(self.spooled_paths) if idx not in indices
+        ]
+
+    def clear(self) -> None:
+        """Remove all spooled files"""
+        for paths in self.spooled_paths:
+            remove_spooled_files(paths)
 
 
 class Executor:
@@ -25,6 +56,8 @@ class Executor:
         model_def_loader: ModelDefLoader,
         setup_timeout: float,
         prediction_timeout: float,
+        cpu_set: t.Optional[t.Set[int]] = None,
+        template: t.Optional[TemplateSubprocess] = None,
     ) -> None:
         self._setup_timeout = float(setup_timeout)
         self._predict_timeout = float(prediction_timeout)
@@ -43,78 +76,123 @@ class Executor:
         fd, path_str = tempfile.mkstemp()
         self._predict_log_path = Path(path_str)
         os.close(fd)
+        self._spool_dir = create_spool_dir()
+
+        self._pid: t.Optional[int] = None
+        self._subproc: t.Union[WorkerSubprocess, ForkedReplica]
+        if template is None:
+            self._subproc = WorkerSubprocess(
+                model_def_loader,
+                conn_in_subproc,
+                self._setup_log_path,
+                self._predict_log_path,
+                cpu_set=cpu_set,
+            )
+        else:
+            self._subproc = template.add_replica(
+                conn_in_subproc,
+                self._setup_log_path,
+                self._predict_log_path,
+                cpu_set=cpu_set,
+            )
 
-        self._subproc = WorkerSubprocess(
-            model_def_loader,
-            conn_in_subproc,
-            self._setup_log_path,
-            self._predict_log_path,
-        )
+    @property
+    def pid(self) -> t.Optional[int]:
+        """PID of the subprocess running predictions. Available after setup."""
+        return self._pid
 
     def setup(self) -> bool:
-        start_time = time.monotonic()
+        deadline = time.monotonic() + self._setup_timeout
+        log_file_redirector = LogFileRedirector(self._setup_log_path)
 
         try:
-            log_file_redirector = LogFileRedirector(self._setup_log_path)
-            while self._subproc.is_alive() and not self._conn.poll(0.1):
-                log_file_redirector.update()
-                if time.monotonic() - start_time > self._setup_timeout:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
                     self._subproc.terminate()
                     raise server_exceptions.SetupFailed("Timeout")
+                # Wake up periodically only to stream setup logs
+                if self._wait_for_message(min(remaining, SETUP_LOG_UPDATE_INTERVAL_SEC)):
+                    break
+                log_file_redirector.update()
 
-            if self._subproc.is_alive():
-                self._conn.recv()
+            self._pid = self._conn.recv()
             log_file_redirector.update()
-            if not self._subproc.is_alive():
-                return False
             return True
         except BaseException:
+            log_file_redirector.update()
             return False
 
+    def prepare(self, inputs: t.List[t.Dict]) -> PreparedInputs:
+        """
+        Prepare inputs to be sent to the subprocess.
+        It can be done ahead, e.g. while the previous prediction is running.
+        """
+        # Pass large files by path instead of sending them through the pipe.
+        # Spool each input separately, so that inputs can be removed with their files.
+        encoded_inputs: t.List[t.Dict] = []
+        spooled_paths: t.List[t.List[Path]] = []
+        for inp in inputs:
+            encoded, spooled = spool_large_data_uris(inp, self._spool_dir)
+            encoded_inputs.append(encoded)
+            spooled_paths.append(list(spooled.values()))
+        return PreparedInputs(inputs=encoded_inputs, spooled_paths=spooled_paths)
+
     def predict(
         self,
-        inputs: t.List[t.Dict],
+        inputs: t.Union[t.List[t.Dict], PreparedInputs],
         is_demo: bool,
         log_path: t.Optional[Path],
     ) -> t.Union[PredictionSuccess, PredictionFailure]:
-        assert self._subproc.pid is not None
-
-        # Acquire lock to block cancelation
-        with self._lock:
-            req = PredictionRequest(
-                inputs=[jsonable_encoder(inp) for inp in inputs],
-                is_demo=is_demo,
-                log_path=log_path,
-            )
-            self._conn.send(req)
-
-            start_time = time.monotonic()
+        assert self._pid is not None
 
-            # Wait unitl ack received
-            while self._subproc.is_alive() and not self._conn.poll(0.01):
-                pass
-            if not self._subproc.is_alive():
-                raise server_exceptions.SubprocessTerminated(self._predict_log_path.read_text())
-            self._conn.recv()
-
-        # Wait until result received
-        while self._subproc.is_alive() and not self._conn.poll(0.05):
-            if time.monotonic() - start_time > self._predict_timeout:
-                os.kill(self._subproc.pid, signal.SIGUSR2)
-                break
+        prepared = inputs if isinstance(inputs, PreparedInputs) else self.prepare(inputs)
+        try:
+            # Acquire lock to block cancelation
+            with self._lock:
+                req = PredictionRequest(
+                    inputs=prepared.inputs,
+                    is_demo=is_demo,
+                    log_path=log_path,
+                    spool_dir=self._spool_dir,
+                )
+                self._conn.send(req)
+
+                deadline = time.monotonic() + self._predict_timeout
+
+                # Wait unitl ack received
+                self._wait_for_message(timeout=None)
+                self._conn.recv()
 
-        if not self._subproc.is_alive():
+            # Wait until result received
+            if not self._wait_for_message(timeout=max(deadline - time.monotonic(), 0.0)):
+                os.kill(self._pid, signal.SIGUSR2)
+                self._wait_for_message(timeout=None)
+
+            return self._conn.recv()
+        finally:
+            prepared.clear()
+
+    def _wait_for_message(self, timeout: t.Optional[float]) -> bool:
+        """
+        Wait until a message from the subprocess is ready or the subprocess exits.
+        Return ``False`` on timeout, and raise ``SubprocessTerminated`` if the subprocess exits.
+        """
+        ready = mp_connection.wait([self._conn, self._subproc.sentinel], timeout=timeout)
+        if self._conn in ready:
+            return True
+        if ready:
             raise server_exceptions.SubprocessTerminated(self._predict_log_path.read_text())
-
-        return self._conn.recv()
+        return False
 
     def cancel(self):
         with self._lock:
-            assert self._subproc.pid is not None
-            os.kill(self._subproc.pid, signal.SIGUSR1)
+            assert self._pid is not None
+            os.kill(self._pid, signal.SIGUSR1)
 
     def start(self):
         self._subproc.start()
 
     def terminate(self):
         self._subproc.terminate()
+        remove_spool_dir(self._spool_dir)
@@ -0,0 +1,181 @@
+import hashlib
+import time
+import typing as t
+from collections import OrderedDict
+from threading import Lock
+
+import attrs
+from typing_extensions import Literal
+
+from tungstenkit._internal.io import BaseIO
+
+
+@attrs.define(kw_only=True)
+class MemoizerStats:
+    hits: int = 0
+    coalesced: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Rate of predictions that didn't run the model"""
+        total = self.hits + self.coalesced + self.misses
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+
+@attrs.define(kw_only=True)
+class Lookup:
+    """
+    Result of looking up a prediction.
+
+    - hit: outputs of a finished prediction are memoized
+    - coalesced: the same prediction is running, and its result will be shared
+    - miss: the prediction should run
+    """
+
+    kind: Literal["hit", "coalesced", "miss"]
+    outputs: t.Optional[t.List[t.Dict]] = None
+    demo_outputs: t.Optional[t.List[t.Optional[t.Dict]]] = None
+
+
+@attrs.define(kw_only=True)
+class InFlight:
+    key: str
+    leader_id: str
+    inputs: t.List[BaseIO]
+    is_demo: bool
+    follower_ids: t.List[str] = attrs.field(factory=list)
+    follower_inputs: t.Dict[str, t.List[BaseIO]] = attrs.field(factory=dict)
+
+
+@attrs.define(kw_only=True)
+class _Memo:
+    outputs: t.List[t.Dict]
+    demo_outputs: t.List[t.Optional[t.Dict]]
+    expires_at: float
+
+
+class PredictionMemoizer:
+    """
+    Memoizes successful predictions by the hash of their inputs.
+
+    Duplicates of a running prediction follow it instead of running again.
+    Outputs of up to ``max_entries`` finished predictions are kept for ``ttl`` seconds.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._memos: "OrderedDict[str, _Memo]" = OrderedDict()
+        self._in_flight_by_key: t.Dict[str, InFlight] = dict()
+        self._in_flight_by_id: t.Dict[str, InFlight] = dict()
+        self._stats = MemoizerStats()
+        self._lock = Lock()
+
+    @staticmethod
+    def get_key(inputs: t.List[BaseIO], is_demo: bool) -> str:
+        m = hashlib.sha256()
+        m.update(b"demo\n" if is_demo else b"prediction\n")
+        for inp in inputs:
+            m.update(inp._hash_for_memoization().encode("utf-8") + b"\n")
+        return m.hexdigest()
+
+    def lookup(
+        self, key: str, prediction_id: str, inputs: t.List[BaseIO], is_demo: bool
+    ) -> Lookup:
+        """
+        Look up a prediction. On a miss, the prediction is registered as running
+        and duplicates follow it until ``finish`` or ``abandon`` is called.
+        """
+        with self._lock:
+            memo = self._memos.get(key)
+            if memo is not None and memo.expires_at <= time.monotonic():
+                del self._memos[key]
+                memo = None
+            if memo is not None:
+                self._memos.move_to_end(key)
+                self._stats.hits += 1
+                return Lookup(kind="hit", outputs=memo.outputs, demo_outputs=memo.demo_outputs)
+
+            in_flight = self._in_flight_by_key.get(key)
+            if in_flight is not None:
+                in_flight.follower_ids.append(prediction_id)
+                in_flight.follower_inputs[prediction_id] = inputs
+                self._in_flight_by_id[prediction_id] = in_flight
+                self._stats.coalesced += 1
+                return Lookup(kind="coalesced")
+
+            in_flight = InFlight(key=key, leader_id=prediction_id, inputs=inputs, is_demo=is_demo)
+            self._in_flight_by_key[key] = in_flight
+            self._in_flight_by_id[prediction_id] = in_flight
+            self._stats.misses += 1
+            return Lookup(kind="miss")
+
+    def finish(
+        self,
+        prediction_id: str,
+        outputs: t.Optional[t.List[t.Dict]] = None,
+        demo_outputs: t.Optional[t.List[t.Optional[t.Dict]]] = None,
+    ) -> t.List[str]:
+        """
+        Finish a running prediction and return its followers.
+        Outputs are memoized if given.
+        """
+        with self._lock:
+            in_flight = self._in_flight_by_id.get(prediction_id)
+            if in_flight is None or in_flight.leader_id != prediction_id:
+                return []
+
+            self._forget(in_flight)
+            if outputs is not None and demo_outputs is not None and self._max_entries > 0:
+                self._memos[in_flight.key] = _Memo(
+                    outputs=outputs,
+                    demo_outputs=demo_outputs,
+                    expires_at=time.monotonic() + self._ttl,
+                )
+                self._memos.move_to_end(in_flight.key)
+                while len(self._memos) > self._max_entries:
+                    self._memos.popitem(last=False)
+            return in_flight.follower_ids
+
+    def abandon(self, prediction_id: str) -> t.Optional[InFlight]:
+        """
+        Stop sharing the result of a prediction, e.g. when it's canceled.
+
+        If a running prediction is abandoned, its first follower takes it over and the
+        running prediction is returned with the new leader and its inputs, so that it can
+        be restarted. Otherwise, ``None`` is returned.
+        """
+        with self._lock:
+            in_flight = self._in_flight_by_id.pop(prediction_id, None)
+            if in_flight is None:
+                return None
+
+            if in_flight.leader_id != prediction_id:
+                in_flight.follower_ids.remove(prediction_id)
+                in_flight.follower_inputs.pop(prediction_id, None)
+                return None
+
+            if not in_flight.follower_ids:
+                del self._in_flight_by_key[in_flight.key]
+                return None
+
+            # Inputs of the leader may refer to files which are removed with it
+            in_flight.leader_id = in_flight.follower_ids.pop(0)
+            in_flight.inputs = in_flight.follower_inputs.pop(in_flight.leader_id)
+            return in_flight
+
+    def is_following(self, prediction_id: str) -> bool:
+        with self._lock:
+            in_flight = self._in_flight_by_id.get(prediction_id)
+            return in_flight is not None and in_flight.leader_id != prediction_id
+
+    def get_stats(self) -> MemoizerStats:
+        with self._lock:
+            return attrs.evolve(self._stats)
+
+    def _forget(self, in_flight: InFlight) -> None:
+        self._in_flight_by_key.pop(in_flight.key, None)
+        self._in_flight_by_id.pop(in_flight.leader_id, None)
+        for follower_id in in_flight.follower_ids:
+            self._in_flight_by_id.pop(follower_id, None)
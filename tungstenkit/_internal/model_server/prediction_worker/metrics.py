@@ -0,0 +1,213 @@
+import bisect
+import typing as t
+from threading import Lock
+
+import attrs
+
+from ..file_uploaders import DedupStats
+from ..result_caches import ResultCacheStats
+from .admission import AdmissionStats
+from .memoizer import MemoizerStats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "tungsten_"
+
+LATENCY_BUCKETS_SEC: t.List[float] = [
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+]
+BATCH_SIZE_BUCKETS: t.List[float] = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+# Stages of an input, in the order they run
+# - queue_wait: from being pushed to the input queue to being popped
+# - transport: encoding inputs and passing inputs and outputs to and from the subprocess
+# - predict: the predict function of the model
+# - validation: validating and serializing outputs
+# - upload: uploading files in outputs
+# - result_cache_write: saving outputs to the result cache
+STAGES = ("queue_wait", "transport", "predict", "validation", "upload", "result_cache_write")
+
+
+@attrs.frozen(kw_only=True)
+class HistogramSnapshot:
+    buckets: t.List[float]
+    counts: t.List[int]
+    sum: float
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Histogram:
+    """
+    Counts of observations per bucket, with their sum.
+
+    Observing takes a bisect and a short critical section, so it's cheap enough to be
+    called on the hot path.
+    """
+
+    def __init__(self, buckets: t.List[float]) -> None:
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        with self._lock:
+            return HistogramSnapshot(
+                buckets=self._buckets, counts=list(self._counts), sum=self._sum
+            )
+
+
+class PredictionMetrics:
+    """Latency histograms of the stages of predictions, and a histogram of batch sizes"""
+
+    def __init__(self) -> None:
+        self._stage_latencies = {stage: Histogram(LATENCY_BUCKETS_SEC) for stage in STAGES}
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self._stage_latencies[stage].observe(seconds)
+
+    def observe_batch_size(self, batch_size: int) -> None:
+        self._batch_sizes.observe(batch_size)
+
+    def get_stage_latencies(self) -> t.Dict[str, HistogramSnapshot]:
+        return {stage: hist.snapshot() for stage, hist in self._stage_latencies.items()}
+
+    def get_batch_sizes(self) -> HistogramSnapshot:
+        return self._batch_sizes.snapshot()
+
+
+def render_metrics(
+    metrics: PredictionMetrics,
+    queued_inputs: int,
+    inputs_in_flight: int,
+    busy_replicas: int,
+    admission_stats: AdmissionStats,
+    result_cache_stats: ResultCacheStats,
+    memoizer_stats: t.Optional[MemoizerStats] = None,
+    output_dedup_stats: t.Optional[DedupStats] = None,
+) -> str:
+    """Render metrics in the Prometheus text exposition format"""
+    lines: t.List[str] = []
+
+    _add_header(lines, "stage_latency_seconds", "histogram", "Latency of prediction stages")
+    for stage, snapshot in metrics.get_stage_latencies().items():
+        _add_histogram(lines, "stage_latency_seconds", snapshot, {"stage": stage})
+
+    _add_header(lines, "batch_size", "histogram", "Number of inputs in a batch")
+    _add_histogram(lines, "batch_size", metrics.get_batch_sizes())
+
+    _add_gauge(lines, "queued_inputs", "Number of inputs in the input queue", queued_inputs)
+    _add_gauge(lines, "inputs_in_flight", "Number of inputs being predicted", inputs_in_flight)
+    _add_gauge(lines, "busy_replicas", "Number of replicas running a batch", busy_replicas)
+
+    _add_header(lines, "admitted_predictions_total", "counter", "Number of admitted predictions")
+    _add_sample(lines, "admitted_predictions_total", admission_stats.admitted)
+    _add_header(lines, "rejected_predictions_total", "counter", "Number of rejected predictions")
+    for reason, value in [
+        ("queue_full", admission_stats.rejected_queue_full),
+        ("queue_wait", admission_stats.rejected_queue_wait),
+        ("client_limit", admission_stats.rejected_client_limit),
+    ]:
+        _add_sample(lines, "rejected_predictions_total", value, {"reason": reason})
+
+    _add_header(lines, "result_cache_lookups_total", "counter", "Number of result cache lookups")
+    _add_sample(lines, "result_cache_lookups_total", result_cache_stats.hits, {"result": "hit"})
+    _add_sample(lines, "result_cache_lookups_total", result_cache_stats.misses, {"result": "miss"})
+    _add_header(lines, "result_cache_spills_total", "counter", "Number of results spilled to disk")
+    _add_sample(lines, "result_cache_spills_total", result_cache_stats.spills)
+    _add_header(lines, "result_cache_evictions_total", "counter", "Number of evicted results")
+    _add_sample(lines, "result_cache_evictions_total", result_cache_stats.evictions)
+    _add_header(lines, "result_cache_bytes", "gauge", "Size of results in the result cache")
+    _add_sample(lines, "result_cache_bytes", result_cache_stats.memory_bytes, {"tier": "memory"})
+    _add_sample(lines, "result_cache_bytes", result_cache_stats.disk_bytes, {"tier": "disk"})
+
+    if memoizer_stats is not None:
+        _add_header(lines, "memoizer_lookups_total", "counter", "Number of memoizer lookups")
+        for kind, value in [
+            ("hit", memoizer_stats.hits),
+            ("coalesced", memoizer_stats.coalesced),
+            ("miss", memoizer_stats.misses),
+        ]:
+            _add_sample(lines, "memoizer_lookups_total", value, {"result": kind})
+
+    if output_dedup_stats is not None:
+        _add_header(
+            lines, "output_dedup_lookups_total", "counter", "Number of output file lookups"
+        )
+        _add_sample(
+            lines, "output_dedup_lookups_total", output_dedup_stats.hits, {"result": "hit"}
+        )
+        _add_sample(
+            lines, "output_dedup_lookups_total", output_dedup_stats.misses, {"result": "miss"}
+        )
+        _add_header(
+            lines,
+            "output_dedup_saved_bytes_total",
+            "counter",
+            "Bytes of output files not uploaded",
+        )
+        _add_sample(lines, "output_dedup_saved_bytes_total", output_dedup_stats.bytes_saved)
+
+    return "\n".join(lines) + "\n"
+
+
+def _add_header(lines: t.List[str], name: str, metric_type: str, help: str) -> None:
+    lines.append(f"# HELP {PREFIX}{name} {help}")
+    lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+
+
+def _add_gauge(lines: t.List[str], name: str, help: str, value: float) -> None:
+    _add_header(lines, name, "gauge", help)
+    _add_sample(lines, name, value)
+
+
+def _add_histogram(
+    lines: t.List[str],
+    name: str,
+    snapshot: HistogramSnapshot,
+    labels: t.Optional[t.Dict[str, str]] = None,
+) -> None:
+    labels = labels or dict()
+    cumulative = 0
+    for bound, cnt in zip(snapshot.buckets, snapshot.counts):
+        cumulative += cnt
+        _add_sample(lines, name + "_bucket", cumulative, {**labels, "le": _format(bound)})
+    _add_sample(lines, name + "_bucket", snapshot.count, {**labels, "le": "+Inf"})
+    _add_sample(lines, name + "_sum", snapshot.sum, labels)
+    _add_sample(lines, name + "_count", snapshot.count, labels)
+
+
+def _add_sample(
+    lines: t.List[str], name: str, value: float, labels: t.Optional[t.Dict[str, str]] = None
+) -> None:
+    label_str = ""
+    if labels:
+        label_str = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+    lines.append(f"{PREFIX}{name}{label_str} {_format(value)}")
+
+
+def _format(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
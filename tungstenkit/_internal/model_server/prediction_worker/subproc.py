@@ -1,5 +1,7 @@
 import multiprocessing as mp
+import os
 import signal
+import time
 import traceback
 import typing as t
 from contextlib import ExitStack, redirect_stderr, redirect_stdout
@@ -18,6 +20,7 @@ from tungstenkit._internal.utils.pydantic import run_validation
 from tungstenkit._internal.utils.types import get_qualname
 
 from .. import server_exceptions
+from .transport import spool_large_data_uris
 
 
 @attrs.define
@@ -25,6 +28,7 @@ class PredictionRequest:
     inputs: t.List[t.Dict]
     is_demo: bool
     log_path: t.Optional[Path] = None
+    spool_dir: t.Optional[Path] = None
 
 
 @attrs.define(kw_only=True)
@@ -32,6 +36,10 @@ class PredictionSuccess:
     outputs: t.List[t.Dict]
     demo_outputs: t.List[t.Optional[t.Dict]]
     files: t.List[File]
+    spooled_paths: t.List[Path] = attrs.field(factory=list)
+    # Seconds spent in the subprocess, to break down the latency of the prediction
+    predict_time: float = 0.0
+    validation_time: float = 0.0
 
 
 @attrs.define
@@ -46,8 +54,10 @@ class WorkerSubprocess(mp.Process):
         conn: Connection,
         setup_log_path: Path,
         predict_log_path: Path,
+        cpu_set: t.Optional[t.Set[int]] = None,
     ) -> None:
         self._model_def_loader = model_def_loader
+        self._cpu_set = cpu_set
         self._conn = conn
         self._setup_log_path = setup_log_path
         self._predict_log_path = predict_log_path
@@ -60,30 +70,41 @@ class WorkerSubprocess(mp.Process):
         super().__init__(daemon=True, name="worker-subprocess")
 
     def run(self):
+        if self._cpu_set:
+            os.sched_setaffinity(0, self._cpu_set)
+
         with ExitStack() as exit_stack:
             _redirect_stream(exit_stack, self._setup_log_path, flush=True)
+            self._setup()
+            self._conn.send(os.getpid())
 
-            signal.signal(signal.SIGUSR1, self._handle_cancellation)
-            signal.signal(signal.SIGUSR2, self._handle_timeout)
+        self._serve()
 
-            self._model = self._model_def_loader.model
-            self._model.setup()
-            self._input_cls = self._model_def_loader.input_class
-            self._output_cls = self._model_def_loader.output_class
-            self._demo_output_cls = self._model_def_loader.demo_output_class
-            self._conn.send(None)
+    def _setup(self):
+        """Install signal handlers and set up the model"""
+        signal.signal(signal.SIGUSR1, self._handle_cancellation)
+        signal.signal(signal.SIGUSR2, self._handle_timeout)
+
+        self._model = self._model_def_loader.model
+        self._model.setup()
+        self._input_cls = self._model_def_loader.input_class
+        self._output_cls = self._model_def_loader.output_class
+        self._demo_output_cls = self._model_def_loader.demo_output_class
 
+    def _serve(self):
+        """Loop for receiving prediction requests and sending results"""
         with ExitStack() as exit_stack:
             _redirect_stream(exit_stack, self._predict_log_path, flush=True)
             while True:
                 received: PredictionRequest = self._conn.recv()
-                inputs = [self._input_cls.parse_obj(inp) for inp in received.inputs]
                 is_demo = received.is_demo
                 log_path = received.log_path
                 if log_path:
                     exit_stack.pop_all()
                     _redirect_stream(exit_stack, log_path, flush=False)
-                prediction_result = self._predict(inputs=inputs, is_demo=is_demo)
+                prediction_result = self._predict(
+                    inputs=received.inputs, is_demo=is_demo, spool_dir=received.spool_dir
+                )
                 exit_stack.pop_all()
                 _redirect_stream(exit_stack, self._predict_log_path, flush=True)
                 self._conn.send(prediction_result)
@@ -92,6 +113,7 @@ class WorkerSubprocess(mp.Process):
         self,
         inputs: t.List[t.Dict],
         is_demo: bool,
+        spool_dir: t.Optional[Path] = None,
     ) -> t.Union[PredictionSuccess, PredictionFailure]:
         assert self._model
         assert self._input_cls
@@ -103,8 +125,9 @@ class WorkerSubprocess(mp.Process):
             # Send ACK to the main proc and release lock blocking cancelation
             self._conn.send(None)
 
-            # print(f"working dir: {Path('.').resolve()}")
-            parsed_inputs = [self._input_cls.parse_obj(inp) for inp in inputs]
+            # Inputs were validated when the prediction was created, so skip validators here
+            parsed_inputs = [self._input_cls._construct_from_jsonable(inp) for inp in inputs]
+            predict_started_at = time.monotonic()
             if is_demo:
                 fn_name = self._model.__class__.__name__ + "." + self._model.predict_demo.__name__
                 tup = self._model.predict_demo(parsed_inputs)
@@ -151,16 +174,34 @@ class WorkerSubprocess(mp.Process):
                     )
                 demo_outputs = [None] * len(outputs)
 
+            validation_started_at = time.monotonic()
             files = _get_files([outputs, demo_outputs])
 
             validated_outputs = _validate_and_serialize_outputs(outputs, self._output_cls)
             validated_demo_outputs = _validate_and_serialize_demo_outputs(
                 demo_outputs, self._demo_output_cls
             )
+            validation_ended_at = time.monotonic()
+
+            # Pass large files by path instead of sending them through the pipe
+            spooled: t.Dict[str, Path] = dict()
+            if spool_dir:
+                (validated_outputs, validated_demo_outputs), spooled = spool_large_data_uris(
+                    [validated_outputs, validated_demo_outputs], spool_dir
+                )
+                files = [
+                    f.__class__.from_path(spooled[f.__root__]) if f.__root__ in spooled else f
+                    for f in files
+                ]
 
             self._is_running = False
             return PredictionSuccess(
-                outputs=validated_outputs, demo_outputs=validated_demo_outputs, files=files
+                outputs=validated_outputs,
+                demo_outputs=validated_demo_outputs,
+                files=files,
+                spooled_paths=list(spooled.values()),
+                predict_time=validation_started_at - predict_started_at,
+                validation_time=validation_ended_at - validation_started_at,
             )
 
         except BaseException as e:
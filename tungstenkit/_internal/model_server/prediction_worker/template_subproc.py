@@ -0,0 +1,146 @@
+import os
+import signal
+import traceback
+import typing as t
+from contextlib import ExitStack
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+import attrs
+
+from tungstenkit._internal.model_def_loader import ModelDefLoader
+
+from .subproc import WorkerSubprocess, _redirect_stream
+
+
+@attrs.define(kw_only=True)
+class _ReplicaSpec:
+    conn: Connection
+    setup_log_path: Path
+    predict_log_path: Path
+    cpu_set: t.Optional[t.Set[int]] = None
+
+
+class TemplateSubprocess(WorkerSubprocess):
+    """
+    Subprocess setting up the model once and forking replicas from itself.
+
+    Since replicas are forked after setup, read-only model weights are shared between them
+    copy-on-write. Setup logs are written to the setup log of the first replica.
+    If any replica exits, the template kills all the others and exits.
+    """
+
+    def __init__(self, model_def_loader: ModelDefLoader) -> None:
+        self._replicas: t.List[_ReplicaSpec] = []
+        self._child_pids: t.List[int] = []
+        super().__init__(
+            model_def_loader,
+            conn=None,  # type: ignore
+            setup_log_path=None,  # type: ignore
+            predict_log_path=None,  # type: ignore
+        )
+        self.name = "template-subprocess"
+
+    def add_replica(
+        self,
+        conn: Connection,
+        setup_log_path: Path,
+        predict_log_path: Path,
+        cpu_set: t.Optional[t.Set[int]] = None,
+    ) -> "ForkedReplica":
+        assert self.pid is None, "Cannot add replicas after the template is started"
+        if not self._replicas:
+            self._setup_log_path = setup_log_path
+        self._replicas.append(
+            _ReplicaSpec(
+                conn=conn,
+                setup_log_path=setup_log_path,
+                predict_log_path=predict_log_path,
+                cpu_set=cpu_set,
+            )
+        )
+        return ForkedReplica(self)
+
+    def run(self):
+        assert self._replicas
+
+        with ExitStack() as exit_stack:
+            _redirect_stream(exit_stack, self._setup_log_path, flush=True)
+            self._setup()
+
+        for replica in self._replicas:
+            pid = os.fork()
+            if pid == 0:
+                self._run_replica(replica)
+            self._child_pids.append(pid)
+
+        for replica in self._replicas:
+            replica.conn.close()
+        signal.signal(signal.SIGTERM, self._kill_replicas_and_exit)
+
+        # Exit if any replica exits
+        os.wait()
+        self._kill_replicas_and_exit()
+
+    def _run_replica(self, replica: _ReplicaSpec):
+        """Run the prediction loop in a forked child. Never returns."""
+        exit_code = 0
+        try:
+            for other in self._replicas:
+                if other is not replica:
+                    other.conn.close()
+            self._conn = replica.conn
+            self._setup_log_path = replica.setup_log_path
+            self._predict_log_path = replica.predict_log_path
+            self._cpu_set = replica.cpu_set
+
+            with ExitStack() as exit_stack:
+                _redirect_stream(exit_stack, self._setup_log_path, flush=False)
+                if self._cpu_set:
+                    os.sched_setaffinity(0, self._cpu_set)
+                print(f"Forked from the template subprocess (pid: {os.getppid()})")
+                self._conn.send(os.getpid())
+
+            self._serve()
+        except EOFError:
+            pass
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _kill_replicas_and_exit(self, *args, **kwargs):
+        for pid in self._child_pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        os._exit(0)
+
+
+class ForkedReplica:
+    """
+    Handle for a replica forked from a template subprocess.
+
+    A replica is regarded as alive while its template is alive, since the template exits when
+    any replica exits.
+    """
+
+    def __init__(self, template: TemplateSubprocess) -> None:
+        self._template = template
+
+    def start(self):
+        if self._template.pid is None:
+            self._template.start()
+
+    def is_alive(self) -> bool:
+        return self._template.is_alive()
+
+    @property
+    def sentinel(self) -> int:
+        return self._template.sentinel
+
+    def terminate(self):
+        if self._template.is_alive():
+            self._template.terminate()
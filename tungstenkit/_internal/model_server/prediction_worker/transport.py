@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import typing as t
+from pathlib import Path
+
+from tungstenkit._internal.utils.json import apply_to_jsonable
+from tungstenkit._internal.utils.uri import check_if_data_uri, save_data_url
+
+SPOOL_THRESHOLD_BYTES = 1024 * 1024
+SHM_DIR = Path("/dev/shm")
+
+
+def create_spool_dir() -> Path:
+    """
+    Create a directory for passing large files between processes by path.
+    It is created in ``/dev/shm`` if available, so that spooled files stay in memory.
+    """
+    parent = str(SHM_DIR) if SHM_DIR.is_dir() and os.access(SHM_DIR, os.W_OK) else None
+    return Path(tempfile.mkdtemp(prefix="tungsten-spool-", dir=parent))
+
+
+def remove_spool_dir(spool_dir: Path) -> None:
+    shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def spool_large_data_uris(
+    jsonable: t.Any, spool_dir: Path, threshold: int = SPOOL_THRESHOLD_BYTES
+) -> t.Tuple[t.Any, t.Dict[str, Path]]:
+    """
+    Decode data uris longer than ``threshold`` into files in ``spool_dir``
+    and replace them with file uris.
+
+    Returns the converted object and the mapping from the data uris to the spooled files.
+    """
+    spooled: t.Dict[str, Path] = dict()
+
+    def spool(data_uri: str) -> str:
+        if data_uri not in spooled:
+            spooled[data_uri] = save_data_url(data_uri, spool_dir)
+        return spooled[data_uri].as_uri()
+
+    converted = apply_to_jsonable(
+        jsonable,
+        cond=lambda o: isinstance(o, str) and len(o) > threshold and check_if_data_uri(o),
+        fn=spool,
+    )
+    return converted, spooled
+
+
+def remove_spooled_files(paths: t.Iterable[Path]) -> None:
+    for p in paths:
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
@@ -4,23 +4,47 @@ import tempfile
 import time
 import traceback
 import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from threading import Event, Thread
+from threading import Event, Lock, Thread
 
+import attrs
 from loguru import logger
 
 from tungstenkit._internal.io import BaseIO, File
 from tungstenkit._internal.model_def_loader import ModelDefLoader
+from tungstenkit._internal.utils.file import format_file_size
 from tungstenkit._internal.utils.json import apply_to_jsonable
+from tungstenkit._internal.utils.memory import get_memory_usage
 
 from .. import server_exceptions
 from ..config import BaseCacheConfig, BaseStorageConfig
 from ..event_buses import create_event_bus
-from ..file_uploaders import create_file_uploader
-from ..ids import check_input_in_prediction, get_prediction_id_from_input_id
+from ..file_uploaders import DedupFileUploader, DedupStats, create_file_uploader
+from ..ids import (
+    check_input_in_prediction,
+    get_input_ids_from_prediction_id,
+    get_prediction_id_from_input_id,
+)
 from ..input_queues import create_input_queue
 from ..result_caches import Result, create_result_cache
-from .executor import Executor, PredictionFailure, PredictionSuccess
+from .admission import AdmissionController, AdmissionStats
+from .batch_stats import BatchStats
+from .executor import Executor, PredictionFailure, PredictionSuccess, PreparedInputs
+from .memoizer import MemoizerStats, PredictionMemoizer
+from .metrics import PredictionMetrics, render_metrics
+from .template_subproc import TemplateSubprocess
+from .transport import remove_spooled_files
+
+# Seconds between checks if the next batch can be prefetched
+PREFETCH_POLL_INTERVAL = 0.01
+
+
+@attrs.define(kw_only=True)
+class _PreparedBatch:
+    input_ids: t.List[str]
+    is_demo: bool
+    prepared: PreparedInputs
 
 
 # TODO Upload after prediction done if requested
@@ -30,7 +54,7 @@ class PredictionWorker(Thread):
     Worker for running model setup and predictions.
 
     A worker communicates with five components:
-    - subprocess: a child process to run predictions
+    - subprocesses: child processes to run predictions, one per replica
     - input queue: a queue to push inputs and pop a batch
     - result cache: a cache containing 'predictions'
     - event bus: propagates and listens on events
@@ -45,39 +69,120 @@ class PredictionWorker(Thread):
         max_batch_size: int,
         setup_timeout: float,
         prediction_timeout: float,
+        max_batch_delay: float = 0.0,
+        pipelined: bool = False,
+        num_replicas: int = 1,
+        replica_cpu_sets: t.Optional[t.List[t.Set[int]]] = None,
+        fork_replicas: bool = False,
+        memoize_size: int = 0,
+        memoize_ttl: float = 3600.0,
+        output_dedup_size: int = 0,
+        output_dedup_ttl: float = 600.0,
+        max_queued_inputs: int = 0,
+        max_queue_wait: float = 0.0,
+        max_client_concurrency: int = 0,
     ):
+        assert num_replicas > 0
+        assert replica_cpu_sets is None or len(replica_cpu_sets) == num_replicas
+
         self._setup_timeout = setup_timeout
         self._prediction_timeout = prediction_timeout
 
         self._max_batch_size = max_batch_size
-        self._running_input_ids: t.List[str] = []
+        self._max_batch_delay = max_batch_delay
+        self._batch_stats = BatchStats()
+        self._metrics = PredictionMetrics()
+        self._pipelined = pipelined
+        self._running_input_ids: t.List[t.List[str]] = [[] for _ in range(num_replicas)]
+        # Batches popped and prepared for replicas, but not started yet
+        self._prefetched_batches: t.List[t.Optional[_PreparedBatch]] = [None] * num_replicas
+        self._prefetch_lock = Lock()
         self._setup_done: Event = Event()
         self._is_setup_succeeded = False
 
         self._input_queue = create_input_queue(cache_config)
         self._result_cache = create_result_cache(cache_config)
         self._event_bus = create_event_bus(cache_config)
-        self._executor = Executor(
-            model_def_loader,
-            setup_timeout=setup_timeout,
-            prediction_timeout=prediction_timeout,
+        # Fork replicas from a template subprocess after setup to share memory copy-on-write
+        template = TemplateSubprocess(model_def_loader) if fork_replicas else None
+        self._executors = [
+            Executor(
+                model_def_loader,
+                setup_timeout=setup_timeout,
+                prediction_timeout=prediction_timeout,
+                cpu_set=replica_cpu_sets[idx] if replica_cpu_sets else None,
+                template=template,
+            )
+            for idx in range(num_replicas)
+        ]
+        file_uploader = create_file_uploader(storage_config)
+        # Skip uploading files with the same contents as files uploaded before
+        self._output_dedup = (
+            DedupFileUploader(file_uploader, max_entries=output_dedup_size, ttl=output_dedup_ttl)
+            if output_dedup_size > 0
+            else None
+        )
+        self._file_uploader = file_uploader if self._output_dedup is None else self._output_dedup
+        # Share results of predictions with the same inputs
+        self._memoizer = (
+            PredictionMemoizer(max_entries=memoize_size, ttl=memoize_ttl)
+            if memoize_size > 0
+            else None
+        )
+        self._admission = AdmissionController(
+            batch_capacity=max_batch_size * num_replicas,
+            is_done=self._is_done,
+            max_queued_inputs=max_queued_inputs,
+            max_queue_wait=max_queue_wait,
+            max_client_concurrency=max_client_concurrency,
         )
-        self._file_uploader = create_file_uploader(storage_config)
         super().__init__(daemon=True, name="prediction-worker")
 
     @property
     def max_batch_size(self) -> int:
         return self._max_batch_size
 
+    @property
+    def num_replicas(self) -> int:
+        return len(self._executors)
+
     def wait_for_setup(self):
-        """Wait until setup in the subprocess is done"""
+        """Wait until setup in all subprocesses is done"""
         self._setup_done.wait()
         if not self._is_setup_succeeded:
             raise server_exceptions.SetupFailed
 
-    def create_prediction(self, inputs: t.List[BaseIO], is_demo: bool) -> str:
-        """Create a prediction by pushing inputs to the input queue"""
+    def create_prediction(
+        self, inputs: t.List[BaseIO], is_demo: bool, client_id: t.Optional[str] = None
+    ) -> str:
+        """
+        Create a prediction by pushing inputs to the input queue.
+        Raises ``PredictionRejected`` if the prediction is over the admission limits.
+        If memoization is enabled, memoized outputs are set at once, and duplicates of
+        a running prediction wait for its result without being pushed.
+        """
+        self._admission.admit(
+            num_inputs=len(inputs),
+            num_queued=self._get_num_queued(),
+            client_id=client_id,
+        )
         prediction_id = self._result_cache.register(num_inputs=len(inputs))
+        self._admission.track(client_id, prediction_id)
+        if self._memoizer is not None:
+            key = self._memoizer.get_key(inputs, is_demo)
+            lookup = self._memoizer.lookup(key, prediction_id, inputs, is_demo)
+            if lookup.kind == "hit":
+                assert lookup.outputs is not None and lookup.demo_outputs is not None
+                self._result_cache.set_success(
+                    input_ids=get_input_ids_from_prediction_id(prediction_id, len(inputs)),
+                    outputs=lookup.outputs,
+                    demo_outputs=lookup.demo_outputs,
+                )
+                return prediction_id
+            if lookup.kind == "coalesced":
+                logger.debug(f"Prediction {prediction_id} follows a running duplicate")
+                return prediction_id
+
         self._input_queue.push(
             prediction_id=prediction_id,
             inputs=inputs,
@@ -91,6 +196,18 @@ class PredictionWorker(Thread):
             prediction_id=prediction_id, timeout=self._prediction_timeout
         )
 
+    async def wait_for_prediction_async(
+        self, prediction_id: str, timeout: t.Optional[float] = None
+    ) -> None:
+        """
+        Wait until the prediction result is ready without blocking the event loop.
+        Waits up to the prediction timeout if ``timeout`` is not given.
+        """
+        await self._result_cache.wait_until_done_async(
+            prediction_id=prediction_id,
+            timeout=self._prediction_timeout if timeout is None else timeout,
+        )
+
     def cancel_prediction(self, prediction_id: str, failure_message: str = "Canceled") -> None:
         """
         Cancel the prediction request
@@ -99,6 +216,22 @@ class PredictionWorker(Thread):
             to cancel running predictions
         3. Set the prediction result in the result cache as failure
         """
+        if self._memoizer is not None:
+            if self._memoizer.is_following(prediction_id):
+                # Not in the input queue, so the result can be set at once
+                self._memoizer.abandon(prediction_id)
+                self._result_cache.set_failure(prediction_id, failure_message)
+                return
+
+            in_flight = self._memoizer.abandon(prediction_id)
+            if in_flight is not None:
+                # Run again for the duplicates that followed this prediction
+                self._input_queue.push(
+                    prediction_id=in_flight.leader_id,
+                    inputs=in_flight.inputs,
+                    is_demo=in_flight.is_demo,
+                )
+
         result = self._result_cache.get_result(prediction_id)
         status = result.status
         try:
@@ -106,6 +239,7 @@ class PredictionWorker(Thread):
                 return
 
             removed_input_ids = self._input_queue.remove(prediction_id=prediction_id)
+            removed_input_ids += self._remove_prefetched_inputs(prediction_id)
             num_inputs = self._result_cache.get_num_inputs(prediction_id)
             if len(removed_input_ids) == num_inputs:
                 return
@@ -122,6 +256,31 @@ class PredictionWorker(Thread):
             if status == "running" or status == "pending":
                 self._result_cache.set_failure(prediction_id, failure_message)
 
+    def get_admission_stats(self) -> AdmissionStats:
+        """Get the queue depth and rejection counts"""
+        return self._admission.get_stats()
+
+    def get_memoizer_stats(self) -> t.Optional[MemoizerStats]:
+        """Get hit counts of memoization, or ``None`` if it's disabled"""
+        return self._memoizer.get_stats() if self._memoizer is not None else None
+
+    def get_output_dedup_stats(self) -> t.Optional[DedupStats]:
+        """Get hit counts and saved bytes of output dedup, or ``None`` if it's disabled"""
+        return self._output_dedup.get_stats() if self._output_dedup is not None else None
+
+    def get_metrics(self) -> str:
+        """Get stage latencies, batch sizes, queue depth and counters in Prometheus format"""
+        return render_metrics(
+            self._metrics,
+            queued_inputs=self._get_num_queued(),
+            inputs_in_flight=sum(len(input_ids) for input_ids in self._running_input_ids),
+            busy_replicas=sum(1 for input_ids in self._running_input_ids if input_ids),
+            admission_stats=self._admission.get_stats(),
+            result_cache_stats=self._result_cache.get_stats(),
+            memoizer_stats=self.get_memoizer_stats(),
+            output_dedup_stats=self.get_output_dedup_stats(),
+        )
+
     def get_prediction_result(self, prediction_id: str) -> Result:
         """Get the prediction result from the result cache"""
         return self._result_cache.get_result(prediction_id=prediction_id)
@@ -131,60 +290,210 @@ class PredictionWorker(Thread):
         return self._result_cache.remove(prediction_id=prediction_id)
 
     def run(self):
-        """Start child threads and run predictions"""
+        """Start child threads and run predictions in all replicas"""
         try:
             self._event_bus.add_handler("cancel", self._handle_cancel_event)
             self._result_cache.start()
             self._event_bus.start()
-            self._executor.start()
-            self._is_setup_succeeded = self._executor.setup()
+            setup_started_at = time.monotonic()
+            for executor in self._executors:
+                executor.start()
+            with ThreadPoolExecutor(max_workers=self.num_replicas) as pool:
+                self._is_setup_succeeded = all(pool.map(Executor.setup, self._executors))
+            if self._is_setup_succeeded:
+                self._log_replicas(setup_time=time.monotonic() - setup_started_at)
         finally:
             self._setup_done.set()
 
         if not self._is_setup_succeeded:
+            for executor in self._executors:
+                executor.terminate()
             return
 
+        replica_exited = Event()
+
+        def run_replica(replica_idx: int):
+            try:
+                self._predict_forever(replica_idx)
+            finally:
+                replica_exited.set()
+
         try:
-            self._predict_forever()
+            for idx in range(self.num_replicas):
+                Thread(
+                    target=run_replica, args=(idx,), daemon=True, name=f"prediction-replica-{idx}"
+                ).start()
+            replica_exited.wait()
         finally:
             # Unexpected termination. Terminate both this and main thread.
-            self._executor.terminate()
+            for executor in self._executors:
+                executor.terminate()
             os.kill(os.getpid(), signal.SIGTERM)
 
-    def _predict_forever(self):
+    def _log_replicas(self, setup_time: float):
+        """Log startup time and memory usage of replicas"""
+        logger.info(f"Set up {self.num_replicas} replica(s) in {setup_time:.2f}s")
+        for idx, executor in enumerate(self._executors):
+            mem = get_memory_usage(executor.pid) if executor.pid else None
+            if mem is None:
+                continue
+            logger.info(
+                f"Replica {idx} (pid: {executor.pid}) memory usage: "
+                f"RSS {format_file_size(mem.rss)}, PSS {format_file_size(mem.pss)}, "
+                f"USS {format_file_size(mem.uss)}"
+            )
+
+    def _predict_forever(self, replica_idx: int):
         """
-        Loop for running predictions
-        1. Pop a batch from the input queue
+        Loop for running predictions in a replica
+        1. Pop a batch from the input queue and prepare it
         2. Run a prediction
         3. Save the result
+
+        In pipelined mode, the stages overlap. While a prediction is running, the next batch
+        is popped and prepared in a separate thread, if it's full and all replicas are busy.
+        So prefetching doesn't shrink batches or take inputs an idle replica could run.
+        Successful results are uploaded and saved in another thread while the next batch is
+        predicted. Results are still saved in the order of predictions, since at most one
+        save is in flight and failures are saved after it.
         """
-        while True:
-            result = None
-            logger.info("Getting inputs from the input queue")
-            batch = self._input_queue.pop(self.max_batch_size)
-            input_ids = batch.input_ids
+        pending_save: t.Optional[Future] = None
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-saver") as saver:
             try:
-                logger.info("Starting a batch prediction")
-                logger.debug("Batch: " + str(batch))
-                result = self._do_prediction(
-                    input_ids=input_ids,
-                    inputs=batch.data,
-                    is_demo=batch.is_demo,
-                )
+                while True:
+                    result = None
+                    batch = self._take_prefetched_batch(replica_idx)
+                    if batch is None:
+                        logger.info("Getting inputs from the input queue")
+                        batch = self._pop_batch(replica_idx)
+                    if not batch.input_ids:
+                        # All inputs were removed while prefetched
+                        continue
+
+                    input_ids = batch.input_ids
+                    stop_prefetch = Event()
+                    pending_prefetch = (
+                        _run_in_daemon_thread(
+                            self._prefetch_batch,
+                            replica_idx,
+                            stop_prefetch,
+                            name=f"batch-prefetcher-{replica_idx}",
+                        )
+                        if self._pipelined
+                        else None
+                    )
+                    try:
+                        logger.info("Starting a batch prediction")
+                        logger.debug("Batch: " + str(batch))
+                        started_at = time.monotonic()
+                        result = self._do_prediction(
+                            replica_idx=replica_idx,
+                            input_ids=input_ids,
+                            inputs=batch.prepared,
+                            is_demo=batch.is_demo,
+                        )
+                        self._admission.record_batch(time.monotonic() - started_at)
+                    finally:
+                        if pending_prefetch is not None:
+                            stop_prefetch.set()
+                            pending_prefetch.result()
+                        if result is None:
+                            result = PredictionFailure(err_msg=traceback.format_exc())
+                        if pending_save is not None:
+                            pending_save.result()
+                            pending_save = None
+
+                        logger.info("Saving results")
+                        if self._pipelined and isinstance(result, PredictionSuccess):
+                            pending_save = saver.submit(self._save_result, input_ids, result)
+                        else:
+                            self._save_result(input_ids=input_ids, result=result)
             finally:
-                logger.info("Saving results")
-                self._save_result(
-                    input_ids=input_ids,
-                    result=PredictionFailure(err_msg=traceback.format_exc())
-                    if result is None
-                    else result,
+                if pending_save is not None:
+                    pending_save.result()
+
+    def _pop_batch(
+        self, replica_idx: int, timeout: t.Optional[float] = None, only_full: bool = False
+    ) -> _PreparedBatch:
+        """Pop a batch from the input queue and prepare it to be run in a replica"""
+        batch = self._input_queue.pop(
+            self.max_batch_size,
+            timeout=timeout,
+            max_batch_delay=self._max_batch_delay,
+            only_full=only_full,
+        )
+        self._batch_stats.record(len(batch.input_ids), batch.batching_delay)
+        self._metrics.observe_batch_size(len(batch.input_ids))
+        for queue_wait in batch.queue_waits:
+            self._metrics.observe_stage("queue_wait", queue_wait)
+        return _PreparedBatch(
+            input_ids=batch.input_ids,
+            is_demo=batch.is_demo,
+            prepared=self._executors[replica_idx].prepare(batch.data),
+        )
+
+    def _prefetch_batch(self, replica_idx: int, stop: Event) -> None:
+        """
+        Pop and prepare the next batch of a replica until ``stop`` is set.
+        Only a full batch is popped, and only while all replicas are busy.
+        The batch is kept where it can be canceled until the replica takes it.
+        """
+        while not stop.is_set():
+            if not all(self._running_input_ids):
+                stop.wait(PREFETCH_POLL_INTERVAL)
+                continue
+            try:
+                batch = self._pop_batch(
+                    replica_idx, timeout=PREFETCH_POLL_INTERVAL, only_full=True
                 )
+            except TimeoutError:
+                continue
+            with self._prefetch_lock:
+                assert self._prefetched_batches[replica_idx] is None
+                self._prefetched_batches[replica_idx] = batch
+            logger.info(f"Prefetched a batch of {len(batch.input_ids)} inputs")
+            return
+
+    def _take_prefetched_batch(self, replica_idx: int) -> t.Optional[_PreparedBatch]:
+        with self._prefetch_lock:
+            batch = self._prefetched_batches[replica_idx]
+            self._prefetched_batches[replica_idx] = None
+        return batch
+
+    def _remove_prefetched_inputs(self, prediction_id: str) -> t.List[str]:
+        """Remove inputs of a prediction from prefetched batches, like from the input queue"""
+        removed: t.List[str] = []
+        with self._prefetch_lock:
+            for batch in self._prefetched_batches:
+                if batch is None:
+                    continue
+                indices = [
+                    idx
+                    for idx, input_id in enumerate(batch.input_ids)
+                    if check_input_in_prediction(input_id=input_id, prediction_id=prediction_id)
+                ]
+                if not indices:
+                    continue
+                removed.extend(batch.input_ids[idx] for idx in indices)
+                batch.input_ids = [
+                    input_id for idx, input_id in enumerate(batch.input_ids) if idx not in indices
+                ]
+                batch.prepared.remove(indices)
+        return removed
+
+    def _get_num_queued(self) -> int:
+        """Get the number of inputs in the input queue or prefetched but not started"""
+        with self._prefetch_lock:
+            num_prefetched = sum(
+                len(batch.input_ids) for batch in self._prefetched_batches if batch is not None
+            )
+        return self._input_queue.get_num_queued() + num_prefetched
 
     def _do_prediction(
-        self, input_ids: t.List[str], inputs: t.List[t.Dict], is_demo: bool
+        self, replica_idx: int, input_ids: t.List[str], inputs: PreparedInputs, is_demo: bool
     ) -> t.Union[PredictionSuccess, PredictionFailure]:
-        """Request a prediction to the subprocess and get the result"""
-        self._running_input_ids = input_ids
+        """Request a prediction to the subprocess of a replica and get the result"""
+        self._running_input_ids[replica_idx] = input_ids
 
         if is_demo:
             fd, name = tempfile.mkstemp(prefix="prediction-log-")
@@ -196,15 +505,24 @@ class PredictionWorker(Thread):
 
         self._result_cache.set_running(input_ids=input_ids)
 
-        result = self._executor.predict(inputs=inputs, is_demo=is_demo, log_path=log_path)
+        started_at = time.monotonic()
+        result = self._executors[replica_idx].predict(
+            inputs=inputs, is_demo=is_demo, log_path=log_path
+        )
+        elapsed = time.monotonic() - started_at
 
         if isinstance(result, PredictionFailure):
             logger.warning(f"Prediction on {input_ids} was failed:\n{result.err_msg}")
         else:
+            self._metrics.observe_stage("predict", result.predict_time)
+            self._metrics.observe_stage("validation", result.validation_time)
+            self._metrics.observe_stage(
+                "transport", max(elapsed - result.predict_time - result.validation_time, 0.0)
+            )
             logger.info(f"Prediction on {input_ids} was successful")
             logger.debug(f"Result: {result}")
 
-        self._running_input_ids = []
+        self._running_input_ids[replica_idx] = []
         return result
 
     def _save_result(
@@ -215,36 +533,121 @@ class PredictionWorker(Thread):
         """Save the result to the result cache"""
         pred_ids = set(get_prediction_id_from_input_id(input_id) for input_id in input_ids)
         if isinstance(result, PredictionSuccess):
+            spooled_paths = result.spooled_paths
             try:
+                started_at = time.monotonic()
                 uploaded = self._file_uploader.upload(result.files)
                 result.outputs, result.demo_outputs = _replace_files_in_outputs(
                     [result.outputs, result.demo_outputs], result.files, uploaded
                 )
+                uploaded_at = time.monotonic()
                 self._result_cache.set_success(
                     input_ids=input_ids, outputs=result.outputs, demo_outputs=result.demo_outputs
                 )
+                self._metrics.observe_stage("upload", uploaded_at - started_at)
+                self._metrics.observe_stage("result_cache_write", time.monotonic() - uploaded_at)
             except Exception:
                 result = PredictionFailure(err_msg=traceback.format_exc())
+            finally:
+                remove_spooled_files(spooled_paths)
 
         if isinstance(result, PredictionFailure):
             for pred_id in pred_ids:
                 self._input_queue.remove(pred_id)
+                self._remove_prefetched_inputs(pred_id)
                 self._result_cache.set_failure(
                     pred_id,
                     result.err_msg,
                 )
 
+        if self._memoizer is not None:
+            for pred_id in pred_ids:
+                self._share_result(pred_id)
+
+    def _share_result(self, prediction_id: str) -> None:
+        """Memoize the result of a finished prediction and set it to its followers"""
+        assert self._memoizer is not None
+        try:
+            result = self._result_cache.get_result(prediction_id)
+        except server_exceptions.PredictionIDNotFound:
+            # Removed as soon as it's done. Run again for the followers.
+            in_flight = self._memoizer.abandon(prediction_id)
+            if in_flight is not None:
+                self._input_queue.push(
+                    prediction_id=in_flight.leader_id,
+                    inputs=in_flight.inputs,
+                    is_demo=in_flight.is_demo,
+                )
+            return
+
+        if result.status == "success":
+            assert result.outputs is not None
+            demo_outputs = result.demo_outputs or [None] * len(result.outputs)
+            follower_ids = self._memoizer.finish(prediction_id, result.outputs, demo_outputs)
+        elif result.status == "failed":
+            follower_ids = self._memoizer.finish(prediction_id)
+        else:
+            return
+
+        for follower_id in follower_ids:
+            try:
+                if result.status == "success":
+                    self._result_cache.set_success(
+                        input_ids=get_input_ids_from_prediction_id(
+                            follower_id, len(result.outputs)  # type: ignore
+                        ),
+                        outputs=result.outputs,  # type: ignore
+                        demo_outputs=demo_outputs,
+                    )
+                else:
+                    self._result_cache.set_failure(follower_id, result.error_message or "")
+            except (server_exceptions.PredictionIDNotFound, server_exceptions.InputIDNotFound):
+                # Removed while following
+                continue
+
+    def _is_done(self, prediction_id: str) -> bool:
+        """Check if a prediction is done. A removed prediction is also regarded as done."""
+        try:
+            self._result_cache.wait_until_done(prediction_id, timeout=0.0)
+        except server_exceptions.PredictionTimeout:
+            return False
+        except server_exceptions.PredictionIDNotFound:
+            pass
+        return True
+
     def _handle_cancel_event(self, pred_id: t.Optional[str]):
-        """Handle cancel event. This is called by the event bus."""
-        if (
-            pred_id
-            and self._running_input_ids
-            and all(
+        """
+        Handle cancel event. This is called by the event bus.
+        Only replicas running the prediction are canceled.
+        """
+        if not pred_id:
+            return
+
+        for executor, running_input_ids in zip(self._executors, self._running_input_ids):
+            if running_input_ids and all(
                 check_input_in_prediction(input_id=input_id, prediction_id=pred_id)
-                for input_id in self._running_input_ids
-            )
-        ):
-            self._executor.cancel()
+                for input_id in running_input_ids
+            ):
+                executor.cancel()
+
+
+def _run_in_daemon_thread(fn: t.Callable[..., t.Any], *args: t.Any, name: str) -> Future:
+    """
+    Run a function in a new daemon thread.
+    Unlike thread pools, it doesn't block exiting while the function is blocked, e.g. in pop.
+    """
+    future: Future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    Thread(target=run, daemon=True, name=name).start()
+    return future
 
 
 def _replace_files_in_outputs(
@@ -1,10 +1,11 @@
 from .abstract_result_cache import AbstractResultCache
 from .factory import create_result_cache
-from .shared import PredictionStatus, Result
+from .shared import PredictionStatus, Result, ResultCacheStats
 
 __all__ = [
     "AbstractResultCache",
     "Result",
+    "ResultCacheStats",
     "create_result_cache",
     "PredictionStatus",
 ]
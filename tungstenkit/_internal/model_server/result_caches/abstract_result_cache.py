@@ -4,7 +4,7 @@ import typing as t
 from pathlib import Path
 from threading import Thread
 
-from .shared import Result
+from .shared import Result, ResultCacheStats
 
 CLEANUP_PERIOD_SEC = 10
 
@@ -51,6 +51,10 @@ class AbstractResultCache(Thread):
     def wait_until_done(self, prediction_id: str, timeout: float) -> None:
         pass
 
+    @abc.abstractmethod
+    async def wait_until_done_async(self, prediction_id: str, timeout: float) -> None:
+        pass
+
     @abc.abstractmethod
     def remove(self, prediction_id: str) -> None:
         pass
@@ -59,6 +63,10 @@ class AbstractResultCache(Thread):
     def cleanup(self) -> None:
         pass
 
+    @abc.abstractmethod
+    def get_stats(self) -> ResultCacheStats:
+        pass
+
     def run(self):
         while True:
             time.sleep(CLEANUP_PERIOD_SEC)
@@ -1,10 +1,23 @@
-from ..config import BaseCacheConfig, LocalCacheConfig
+import redis
+
+from ..config import BaseCacheConfig, LocalCacheConfig, RedisConfig
 from .abstract_result_cache import AbstractResultCache
 from .local_result_cache import LocalResultCache
+from .redis_result_cache import RedisResultCache
 
 
 def create_result_cache(cache_config: BaseCacheConfig) -> AbstractResultCache:
     if isinstance(cache_config, LocalCacheConfig):
-        return LocalResultCache(expiration=cache_config.result_expiration)
+        return LocalResultCache(
+            expiration=cache_config.result_expiration,
+            max_bytes=cache_config.max_bytes,
+            max_disk_bytes=cache_config.max_disk_bytes,
+        )
+
+    if isinstance(cache_config, RedisConfig):
+        return RedisResultCache(
+            redis.Redis.from_url(cache_config.redis_url, decode_responses=True),
+            expiration=cache_config.result_expiration,
+        )
 
-    raise NotADirectoryError
+    raise NotImplementedError()
@@ -1,143 +1,186 @@
+import asyncio
+import heapq
 import os
 import time
 import typing as t
+from collections import OrderedDict
 from pathlib import Path
-from threading import Event
+from threading import Event, Lock
 from uuid import uuid4
 
 import attrs
-from fasteners import ReaderWriterLock
 from loguru import logger
 
+from tungstenkit._internal.utils.json import get_jsonable_size
+
 from .. import server_exceptions
-from ..ids import get_input_ids_from_prediction_id, get_prediction_id_from_input_id
+from ..ids import (
+    get_input_ids_from_prediction_id,
+    get_input_index_from_input_id,
+    get_prediction_id_from_input_id,
+)
 from .abstract_result_cache import AbstractResultCache
-from .shared import PredictionStatus, Result
+from .shared import PredictionStatus, Result, ResultCacheStats
+from .spill_store import SpillStore
 
 
 def _get_curr_time() -> float:
     return time.monotonic()
 
 
-@attrs.define(kw_only=True)
-class UnitResult:
+@attrs.define(kw_only=True, eq=False)
+class PredictionRecord:
+    """
+    Results of the inputs of a prediction, with counters to keep the aggregate status.
+
+    Writers hold ``lock``. Readers don't lock: outputs are set before the statuses,
+    and ``status`` is updated last, so a read of it is a consistent snapshot.
+    An output is ``None`` until it's set or after it's spilled to disk.
+    """
+
+    statuses: t.List[PredictionStatus]
+    outputs: t.List[t.Optional[t.Tuple[t.Dict, t.Optional[t.Dict]]]]
+    log_ids: t.List[t.Optional[str]]
     status: PredictionStatus = attrs.field(default="pending")
-    log_id: t.Optional[str] = attrs.field(default=None)
-    output: t.Optional[t.Dict] = attrs.field(default=None)
-    demo_output: t.Optional[t.Dict] = attrs.field(default=None)
+    num_started: int = attrs.field(default=0)
+    num_success: int = attrs.field(default=0)
+    num_failed: int = attrs.field(default=0)
     error_message: t.Optional[str] = attrs.field(default=None)
-    done_event: Event = attrs.field(factory=Event)
     done_at: t.Optional[float] = attrs.field(default=None)
+    done_event: Event = attrs.field(factory=Event)
+    lock: Lock = attrs.field(factory=Lock)
+
+    @classmethod
+    def create(cls, num_inputs: int) -> "PredictionRecord":
+        return cls(
+            statuses=["pending"] * num_inputs,
+            outputs=[None] * num_inputs,
+            log_ids=[None] * num_inputs,
+        )
 
-    def _set_running(self):
-        if self.status == "success" or self.status == "failed":
+    def _set_running(self, idx: int):
+        if self.statuses[idx] != "pending":
             return
 
-        self.status = "running"
+        self.statuses[idx] = "running"
+        self.num_started += 1
 
-    def _set_output(
-        self,
-        output: t.Dict,
-        demo_output: t.Optional[t.Dict] = None,
-    ):
-        if self.status == "success" or self.status == "failed":
+    def _set_output(self, idx: int, output: t.Dict, demo_output: t.Optional[t.Dict] = None):
+        if self.statuses[idx] == "success" or self.statuses[idx] == "failed":
             return
 
-        self.output = output
-        self.demo_output = demo_output
-        self.status = "success"
-        self.done_at = _get_curr_time()
-        self.done_event.set()
+        self.outputs[idx] = (output, demo_output)
+        self._set_done(idx, "success")
+        self.num_success += 1
 
-    def _set_error_message(self, error_message: str):
-        if self.status == "success" or self.status == "failed":
+    def _set_error_message(self, idx: int, error_message: str):
+        if self.statuses[idx] == "success" or self.statuses[idx] == "failed":
             return
 
-        self.status = "failed"
-        self.error_message = error_message
-        self.done_at = _get_curr_time()
-        self.done_event.set()
+        if self.error_message is None:
+            self.error_message = error_message
+        self._set_done(idx, "failed")
+        self.num_failed += 1
 
+    def _set_done(self, idx: int, status: PredictionStatus):
+        if self.statuses[idx] == "pending":
+            self.num_started += 1
+        self.statuses[idx] = status
+        if self.done_at is None:
+            self.done_at = _get_curr_time()
 
-def _get_status_from_unit_results(
-    unit_results: t.List[UnitResult],
-) -> PredictionStatus:
-    running_or_success_any = False
-    success_all = True
-    for r in unit_results:
-        if r.status == "failed":
-            return "failed"
+    def _update_status(self):
+        num_inputs = len(self.statuses)
+        if self.num_failed > 0:
+            self.status = "failed"
+        elif self.num_success == num_inputs:
+            self.status = "success"
+        elif self.num_started > 0:
+            self.status = "running"
+        else:
+            self.status = "pending"
 
-        success = r.status == "success"
-        running = r.status == "running"
-        success_all &= success
-        running_or_success_any |= success or running
-    if success_all:
-        return "success"
-    if running_or_success_any:
-        return "running"
-    return "pending"
+        if self.num_success + self.num_failed == num_inputs:
+            self.done_event.set()
 
 
-def _get_error_message_from_unit_results(
-    unit_results: t.List[UnitResult],
-):
-    for r in unit_results:
-        if r.error_message is not None:
-            return r.error_message
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
 
 
 class LocalResultCache(AbstractResultCache):
-    def __init__(self, expiration: float):
-        self._map_pred_id_to_inp_ids: t.Dict[str, t.List[str]] = dict()
-        self._results: t.Dict[str, UnitResult] = dict()
+    """
+    Result cache in the memory of the server process.
+
+    Each prediction has a record updated under its own lock and read without locking,
+    so polling results doesn't contend with the prediction worker.
+
+    If ``max_bytes`` is set, outputs of the least recently used results are spilled
+    to disk when outputs in memory exceed it. If ``max_disk_bytes`` is also set,
+    predictions whose outputs are least recently used on disk are evicted.
+    """
+
+    def __init__(
+        self,
+        expiration: float,
+        max_bytes: t.Optional[int] = None,
+        max_disk_bytes: t.Optional[int] = None,
+    ):
+        self._records: t.Dict[str, PredictionRecord] = dict()
         self._logs: t.Dict[str, Path] = dict()
+        self._log_refcounts: t.Dict[str, int] = dict()
+        self._logs_lock = Lock()
         self._last_log_num = 0
-        self._locks: t.Dict[str, ReaderWriterLock] = dict()
+        # Min-heap of (done_at, prediction_id) so cleanup only visits expired predictions
+        self._expiry_heap: t.List[t.Tuple[float, str]] = []
+        self._expiry_scheduled: t.Set[str] = set()
+        self._expiry_lock = Lock()
+        self._waiters: t.Dict[str, t.List[asyncio.Future]] = dict()
+        self._waiters_lock = Lock()
+        # Sizes of outputs in memory in LRU order
+        self._max_bytes = max_bytes
+        self._in_memory: "OrderedDict[str, int]" = OrderedDict()
+        self._num_bytes = 0
+        self._spill_store = SpillStore(max_bytes=max_disk_bytes)
+        self._stats = ResultCacheStats()
+        self._stats_lock = Lock()
         AbstractResultCache.__init__(self, expiration=expiration)
 
     def register(self, num_inputs: int) -> str:
         prediction_id = uuid4().hex
-        input_ids = get_input_ids_from_prediction_id(prediction_id, num_inputs)
-        self._map_pred_id_to_inp_ids[prediction_id] = input_ids
-
-        for input_id in input_ids:
-            if input_id in self._results:
-                raise server_exceptions.InputIDAlreadyExists(prediction_id)
-
-            self._results[input_id] = UnitResult()
-            self._locks[prediction_id] = ReaderWriterLock()
+        if prediction_id in self._records:
+            raise server_exceptions.InputIDAlreadyExists(prediction_id)
 
+        self._records[prediction_id] = PredictionRecord.create(num_inputs)
         return prediction_id
 
     def set_log_path(self, input_ids: t.List[str], log_path: Path) -> None:
-        self._last_log_num += 1
-        log_id = str(self._last_log_num)
+        with self._logs_lock:
+            self._last_log_num += 1
+            log_id = str(self._last_log_num)
         for input_id in input_ids:
-            if input_id not in self._results.keys():
-                raise server_exceptions.InputIDNotFound(input_id)
-
-            self._results[input_id].log_id = log_id
-
-        self._logs[log_id] = log_path
+            record, idx = self._get_record_of_input(input_id)
+            with record.lock:
+                prev_log_id = record.log_ids[idx]
+                record.log_ids[idx] = log_id
+            with self._logs_lock:
+                self._logs[log_id] = log_path
+                self._log_refcounts[log_id] = self._log_refcounts.get(log_id, 0) + 1
+            if prev_log_id is not None:
+                self._release_log(prev_log_id)
 
         return None
 
     def get_num_inputs(self, prediction_id: str) -> int:
-        if prediction_id not in self._map_pred_id_to_inp_ids.keys():
-            raise server_exceptions.PredictionIDNotFound(prediction_id)
-
-        return len(self._map_pred_id_to_inp_ids[prediction_id])
+        return len(self._get_record(prediction_id).statuses)
 
     def set_running(self, input_ids: t.List[str]) -> None:
-        for input_id in input_ids:
-            if input_id not in self._results.keys():
-                raise server_exceptions.InputIDNotFound(input_id)
-
-            pred_id = get_prediction_id_from_input_id(input_id)
-            with self._locks[pred_id].write_lock():
-                if self._results[input_id].status == "pending":
-                    self._results[input_id]._set_running()
+        for record, indices in self._group_by_record(input_ids).values():
+            with record.lock:
+                for _, idx in indices:
+                    record._set_running(idx)
+                record._update_status()
 
         return None
 
@@ -147,140 +190,289 @@ class LocalResultCache(AbstractResultCache):
         outputs: t.List[t.Dict],
         demo_outputs: t.List[t.Optional[t.Dict]],
     ) -> None:
-        for input_id, output, demo_output in zip(input_ids, outputs, demo_outputs):
-            if input_id not in self._results.keys():
-                raise server_exceptions.InputIDNotFound(input_id)
-
-            pred_id = get_prediction_id_from_input_id(input_id)
-            with self._locks[pred_id].write_lock():
-                if (
-                    self._results[input_id].status == "pending"
-                    or self._results[input_id].status == "running"
-                ):
-                    self._results[input_id]._set_output(output, demo_output)
+        outputs_of_inputs = dict(zip(input_ids, zip(outputs, demo_outputs)))
+        sizes: t.Dict[str, int] = dict()
+        done_pred_ids: t.List[str] = []
+        for pred_id, (record, indices) in self._group_by_record(list(outputs_of_inputs)).items():
+            with record.lock:
+                for input_id, idx in indices:
+                    if record.statuses[idx] == "success" or record.statuses[idx] == "failed":
+                        continue
+                    output, demo_output = outputs_of_inputs[input_id]
+                    record._set_output(idx, output, demo_output)
+                    sizes[input_id] = get_jsonable_size(output) + get_jsonable_size(demo_output)
+                record._update_status()
+            self._schedule_expiry(pred_id, record.done_at)
+            if record.done_event.is_set():
+                done_pred_ids.append(pred_id)
+
+        with self._stats_lock:
+            for input_id, size in sizes.items():
+                self._in_memory[input_id] = size
+                self._num_bytes += size
+        self._spill_cold_results()
+
+        for pred_id in done_pred_ids:
+            self._notify_waiters(pred_id)
 
         return None
 
     def set_failure(self, prediction_id: str, error_message: str) -> None:
-        with self._locks[prediction_id].write_lock():
-            for input_id in get_input_ids_from_prediction_id(
-                prediction_id, self.get_num_inputs(prediction_id)
-            ):
-                if (
-                    self._results[input_id].status == "pending"
-                    or self._results[input_id].status == "running"
-                ):
-                    self._results[input_id]._set_error_message(error_message)
+        record = self._get_record(prediction_id)
+        with record.lock:
+            for idx in range(len(record.statuses)):
+                record._set_error_message(idx, error_message)
+            record._update_status()
+        self._schedule_expiry(prediction_id, record.done_at)
+
+        self._notify_waiters(prediction_id)
 
         return None
 
     def get_result(self, prediction_id: str) -> Result:
-        if prediction_id not in self._locks.keys():
-            raise server_exceptions.PredictionIDNotFound(prediction_id)
-
-        with self._locks[prediction_id].read_lock():
-            if prediction_id not in self._map_pred_id_to_inp_ids.keys():
-                raise server_exceptions.PredictionIDNotFound(prediction_id)
-
-            unit_results: t.List[UnitResult] = []
-            for input_id in self._map_pred_id_to_inp_ids[prediction_id]:
-                if input_id not in self._results.keys():
-                    raise server_exceptions.InputIDNotFound(input_id)
-
-                unit_results.append(self._results[input_id])
-
-            status = _get_status_from_unit_results(unit_results)
-            log = None
-            if any(r.log_id for r in unit_results):
-                log = self._get_log_str_from_unit_results(unit_results)
+        record = self._get_record(prediction_id)
+        status = record.status
+        log = None
+        if any(log_id is not None for log_id in record.log_ids):
+            log = self._get_log_str(record.log_ids)
 
         if status == "failed":
-            error_message = _get_error_message_from_unit_results(unit_results)
-            return Result(status=status, error_message=error_message, logs=log)
+            return Result(status=status, error_message=record.error_message, logs=log)
 
         if status == "success":
-            outputs = [r.output for r in unit_results]
-            _demo_outputs = [r.demo_output for r in unit_results]
-            demo_outputs = _demo_outputs if all(o is not None for o in _demo_outputs) else None
-
+            outputs, demo_outputs = self._load_outputs(prediction_id, record)
             return Result(
-                status=status, outputs=outputs, logs=log, demo_outputs=demo_outputs  # type: ignore
+                status=status,
+                outputs=outputs,
+                logs=log,
+                demo_outputs=demo_outputs if all(o is not None for o in demo_outputs) else None,
             )
 
         return Result(status=status, logs=log)
 
     def wait_until_done(self, prediction_id: str, timeout: float) -> None:
-        if prediction_id not in self._locks.keys():
-            raise server_exceptions.PredictionIDNotFound(prediction_id)
-
-        with self._locks[prediction_id].read_lock():
-            input_ids = self._map_pred_id_to_inp_ids[prediction_id]
-            unit_results = [self._results[input_id] for input_id in input_ids]
-            done_events = [r.done_event for r in unit_results]
-
-        success = True
-        for event in done_events:
-            success &= event.wait(timeout=timeout)
-        if not success:
+        record = self._get_record(prediction_id)
+        if not record.done_event.wait(timeout=timeout):
             raise server_exceptions.PredictionTimeout
         return None
 
+    async def wait_until_done_async(self, prediction_id: str, timeout: float) -> None:
+        self._get_record(prediction_id)
+
+        # The future is resolved from the thread setting the last result, so waiting
+        # doesn't hold a thread.
+        future = asyncio.get_running_loop().create_future()
+        with self._waiters_lock:
+            self._waiters.setdefault(prediction_id, []).append(future)
+        try:
+            if self._is_done(prediction_id):
+                return None
+            try:
+                await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                raise server_exceptions.PredictionTimeout
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(prediction_id, [])
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    self._waiters.pop(prediction_id, None)
+        return None
+
     def cleanup(self) -> None:
-        curr_t = _get_curr_time()
+        expired_before = _get_curr_time() - self._expiration
         predictions_to_be_deleted = []
-        for prediction_id, input_ids in self._map_pred_id_to_inp_ids.items():
-            if any(
-                isinstance(self._results[input_id].done_at, float)
-                and curr_t - self._results[input_id].done_at > self._expiration  # type: ignore
-                for input_id in input_ids
-            ):
+        with self._expiry_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] < expired_before:
+                _, prediction_id = heapq.heappop(self._expiry_heap)
+                self._expiry_scheduled.discard(prediction_id)
                 predictions_to_be_deleted.append(prediction_id)
 
         logger.debug(f"Cleanup predictions: {predictions_to_be_deleted}")
         for prediction_id in predictions_to_be_deleted:
-            self.remove(prediction_id)
-
-        logger.debug(f"Remaining results: {', '.join([str(key) for key in self._results.keys()])}")
+            try:
+                self.remove(prediction_id)
+            except server_exceptions.PredictionIDNotFound:
+                # Already removed
+                pass
 
-        logs_to_be_deleted = []
-        for log_id in self._logs.keys():
-            if not any(result.log_id == log_id for result in self._results.values()):
-                logs_to_be_deleted.append(log_id)
-        logger.debug(f"Cleanup logs: {logs_to_be_deleted}")
-        for log_id in logs_to_be_deleted:
-            if self._logs[log_id].exists():
-                os.remove(self._logs[log_id])
-            del self._logs[log_id]
-        logger.debug(f"Remaining logs: {', '.join([str(key) for key in self._logs.keys()])}")
+        logger.debug(f"Remaining: {len(self._records)} predictions, {len(self._logs)} logs")
+        logger.debug(f"Result cache stats: {self.get_stats()}")
 
     def remove(self, prediction_id: str) -> None:
-        if prediction_id not in self._locks.keys():
+        record = self._records.pop(prediction_id, None)
+        if record is None:
             raise server_exceptions.PredictionIDNotFound(prediction_id)
 
-        with self._locks[prediction_id].write_lock():
-            input_ids = self._map_pred_id_to_inp_ids[prediction_id]
-            del self._map_pred_id_to_inp_ids[prediction_id]
-            for input_id in input_ids:
-                del self._results[input_id]
+        with record.lock:
+            log_ids = [log_id for log_id in record.log_ids if log_id is not None]
+            input_ids = get_input_ids_from_prediction_id(prediction_id, len(record.statuses))
 
-        del self._locks[prediction_id]
+        with self._stats_lock:
+            for input_id in input_ids:
+                self._num_bytes -= self._in_memory.pop(input_id, 0)
+        for input_id in input_ids:
+            self._spill_store.remove(input_id)
+        with self._expiry_lock:
+            # The heap entry is skipped when it expires
+            self._expiry_scheduled.discard(prediction_id)
+        for log_id in log_ids:
+            self._release_log(log_id)
+        self._notify_waiters(prediction_id)
 
         return None
 
-    def _get_log_str_from_unit_results(
-        self,
-        unit_results: t.List[UnitResult],
-    ) -> t.Optional[str]:
-        log_id_set: t.Set[str] = set(
-            result.log_id for result in unit_results if result.log_id is not None
-        )
+    def get_stats(self) -> ResultCacheStats:
+        with self._stats_lock:
+            return attrs.evolve(
+                self._stats,
+                memory_bytes=self._num_bytes,
+                disk_bytes=self._spill_store.num_bytes,
+            )
+
+    def _get_record(self, prediction_id: str) -> PredictionRecord:
+        record = self._records.get(prediction_id)
+        if record is None:
+            raise server_exceptions.PredictionIDNotFound(prediction_id)
+        return record
+
+    def _get_record_of_input(self, input_id: str) -> t.Tuple[PredictionRecord, int]:
+        record = self._records.get(get_prediction_id_from_input_id(input_id))
+        idx = get_input_index_from_input_id(input_id)
+        if record is None or idx >= len(record.statuses):
+            raise server_exceptions.InputIDNotFound(input_id)
+        return record, idx
+
+    def _group_by_record(
+        self, input_ids: t.List[str]
+    ) -> t.Dict[str, t.Tuple[PredictionRecord, t.List[t.Tuple[str, int]]]]:
+        """Group input ids and their indices by prediction"""
+        groups: t.Dict[str, t.Tuple[PredictionRecord, t.List[t.Tuple[str, int]]]] = dict()
+        for input_id in input_ids:
+            record, idx = self._get_record_of_input(input_id)
+            pred_id = get_prediction_id_from_input_id(input_id)
+            groups.setdefault(pred_id, (record, []))[1].append((input_id, idx))
+        return groups
+
+    def _load_outputs(
+        self, prediction_id: str, record: PredictionRecord
+    ) -> t.Tuple[t.List[t.Dict], t.List[t.Optional[t.Dict]]]:
+        """Get outputs and demo outputs of a prediction, reading spilled ones from disk"""
+        outputs: t.List[t.Dict] = []
+        demo_outputs: t.List[t.Optional[t.Dict]] = []
+        input_ids = get_input_ids_from_prediction_id(prediction_id, len(record.outputs))
+        spilled_input_ids = []
+        for input_id, output_pair in zip(input_ids, record.outputs):
+            if output_pair is None:
+                spilled_input_ids.append(input_id)
+                try:
+                    spilled = self._spill_store.get(input_id)
+                except KeyError:
+                    # Evicted or removed while reading
+                    raise server_exceptions.PredictionIDNotFound(prediction_id)
+                output_pair = (spilled["output"], spilled["demo_output"])
+            outputs.append(output_pair[0])
+            demo_outputs.append(output_pair[1])
+
+        # Mark outputs in memory as recently used
+        with self._stats_lock:
+            self._stats.hits += len(input_ids) - len(spilled_input_ids)
+            self._stats.misses += len(spilled_input_ids)
+            for input_id in input_ids:
+                if input_id in self._in_memory:
+                    self._in_memory.move_to_end(input_id)
+        return outputs, demo_outputs
+
+    def _spill_cold_results(self) -> None:
+        """Spill least recently used outputs to disk while memory usage exceeds the budget"""
+        if self._max_bytes is None:
+            return
+
+        evicted_pred_ids: t.Set[str] = set()
+        while True:
+            with self._stats_lock:
+                if self._num_bytes <= self._max_bytes or not self._in_memory:
+                    break
+                input_id, size = self._in_memory.popitem(last=False)
+                self._num_bytes -= size
+
+            try:
+                record, idx = self._get_record_of_input(input_id)
+            except server_exceptions.InputIDNotFound:
+                continue
+            with record.lock:
+                output_pair = record.outputs[idx]
+                if output_pair is None:
+                    continue
+                # Readers fall back to the spill store once the output is unset
+                evicted = self._spill_store.put(
+                    input_id, {"output": output_pair[0], "demo_output": output_pair[1]}
+                )
+                record.outputs[idx] = None
+
+            with self._stats_lock:
+                self._stats.spills += 1
+            evicted_pred_ids.update(get_prediction_id_from_input_id(key) for key in evicted)
+
+        for pred_id in evicted_pred_ids:
+            logger.debug(f"Evict prediction {pred_id} from the disk")
+            try:
+                self.remove(pred_id)
+            except server_exceptions.PredictionIDNotFound:
+                continue
+            with self._stats_lock:
+                self._stats.evictions += 1
+
+    def _schedule_expiry(self, prediction_id: str, done_at: t.Optional[float]) -> None:
+        """Schedule the expiry of a prediction when its first input is done"""
+        if done_at is None:
+            return
+
+        with self._expiry_lock:
+            if prediction_id not in self._expiry_scheduled:
+                self._expiry_scheduled.add(prediction_id)
+                heapq.heappush(self._expiry_heap, (done_at, prediction_id))
+
+    def _release_log(self, log_id: str) -> None:
+        """Decrease the reference count of a log and delete it if no longer referenced"""
+        with self._logs_lock:
+            self._log_refcounts[log_id] -= 1
+            if self._log_refcounts[log_id] > 0:
+                return
+
+            del self._log_refcounts[log_id]
+            log_path = self._logs.pop(log_id)
+
+        if log_path.exists():
+            os.remove(log_path)
+        logger.debug(f"Removed log {log_id}")
+
+    def _is_done(self, prediction_id: str) -> bool:
+        """Check if all inputs are done. A removed prediction is also regarded as done."""
+        record = self._records.get(prediction_id)
+        return record is None or record.done_event.is_set()
+
+    def _notify_waiters(self, prediction_id: str) -> None:
+        with self._waiters_lock:
+            waiters = self._waiters.pop(prediction_id, [])
+        for future in waiters:
+            future.get_loop().call_soon_threadsafe(_resolve_future, future)
+
+    def _get_log_str(self, log_ids: t.List[t.Optional[str]]) -> t.Optional[str]:
+        log_id_set: t.Set[str] = set(log_id for log_id in log_ids if log_id is not None)
         if len(log_id_set) == 0:
             return None
 
-        log_str = ""
-        for idx, log_id in enumerate(sorted(log_id_set)):
-            with open(self._logs[log_id], "r") as f:
-                log_str += f.read()
-                if idx != len(log_id_set) - 1:
-                    log_str += "\n"
-        return log_str
+        logs = []
+        for log_id in sorted(log_id_set):
+            # Skip logs released while reading
+            log_path = self._logs.get(log_id)
+            if log_path is None:
+                continue
+            try:
+                with open(log_path, "r") as f:
+                    logs.append(f.read())
+            except FileNotFoundError:
+                continue
+        return "\n".join(logs)
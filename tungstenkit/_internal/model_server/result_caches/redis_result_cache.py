@@ -0,0 +1,295 @@
+import asyncio
+import json
+import typing as t
+from pathlib import Path
+from threading import Event, Lock
+from uuid import uuid4
+
+import redis
+from loguru import logger
+
+from .. import server_exceptions
+from ..ids import get_input_index_from_input_id, get_prediction_id_from_input_id
+from .abstract_result_cache import AbstractResultCache
+from .shared import PredictionStatus, Result, ResultCacheStats, aggregate_statuses
+
+# Each prediction is a hash with fields:
+#   n                number of inputs
+#   done             number of inputs done
+#   <idx>:status     status of an input
+#   <idx>:output     serialized output
+#   <idx>:demo       serialized demo output
+#   <idx>:error      error message
+#   <idx>:log        log path
+# It expires ``expiration`` after all inputs are done.
+# The prediction id is published when all inputs are done or the prediction is removed.
+_FINISH_INPUT = """
+local function finish_input(key, idx, status, output, demo, error, expiration, channel, pred_id)
+    local curr = redis.call('HGET', key, idx .. ':status')
+    if not curr or curr == 'success' or curr == 'failed' then
+        return
+    end
+    redis.call('HSET', key, idx .. ':status', status)
+    if output ~= '' then
+        redis.call('HSET', key, idx .. ':output', output)
+    end
+    if demo ~= '' then
+        redis.call('HSET', key, idx .. ':demo', demo)
+    end
+    if error ~= '' then
+        redis.call('HSET', key, idx .. ':error', error)
+    end
+    local done = redis.call('HINCRBY', key, 'done', 1)
+    if done == tonumber(redis.call('HGET', key, 'n')) then
+        redis.call('PEXPIRE', key, expiration)
+        redis.call('PUBLISH', channel, pred_id)
+    end
+end
+"""
+
+# KEYS: prediction hashes, ARGV: channel, expiration, then (pred id, idx, output, demo) per input
+_SET_SUCCESS = (
+    _FINISH_INPUT
+    + """
+for i, key in ipairs(KEYS) do
+    local base = 2 + (i - 1) * 4
+    finish_input(
+        key, ARGV[base + 2], 'success', ARGV[base + 3], ARGV[base + 4], '',
+        ARGV[2], ARGV[1], ARGV[base + 1]
+    )
+end
+"""
+)
+
+# KEYS: prediction hash, ARGV: channel, expiration, prediction id, error message
+_SET_FAILURE = (
+    _FINISH_INPUT
+    + """
+local n = redis.call('HGET', KEYS[1], 'n')
+if not n then
+    return
+end
+for idx = 0, tonumber(n) - 1 do
+    finish_input(KEYS[1], tostring(idx), 'failed', '', '', ARGV[4], ARGV[2], ARGV[1], ARGV[3])
+end
+"""
+)
+
+# KEYS: prediction hashes, ARGV: indices
+_SET_RUNNING = """
+for i, key in ipairs(KEYS) do
+    local field = ARGV[i] .. ':status'
+    if redis.call('HGET', key, field) == 'pending' then
+        redis.call('HSET', key, field, 'running')
+    end
+end
+"""
+
+
+class RedisResultCache(AbstractResultCache):
+    """
+    Result cache in Redis, shared by model servers using the same key prefix.
+
+    Expiration is left to Redis. The thread of this cache listens on a pub/sub channel
+    for finished predictions to wake up waiters, instead of cleaning up periodically.
+    The client should be created with ``decode_responses=True``.
+    """
+
+    def __init__(self, client: redis.Redis, expiration: float, key_prefix: str = "tungsten"):
+        self._client = client
+        self._prefix = key_prefix + ":result"
+        self._channel = self._prefix + ":done"
+        self._set_success_script = client.register_script(_SET_SUCCESS)
+        self._set_failure_script = client.register_script(_SET_FAILURE)
+        self._set_running_script = client.register_script(_SET_RUNNING)
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self._channel)
+        self._waiters: t.Dict[str, t.List[t.Union[Event, asyncio.Future]]] = dict()
+        self._waiters_lock = Lock()
+        AbstractResultCache.__init__(self, expiration=expiration)
+
+    def register(self, num_inputs: int) -> str:
+        prediction_id = uuid4().hex
+        fields: t.Dict[str, t.Union[str, int]] = {"n": num_inputs, "done": 0}
+        for idx in range(num_inputs):
+            fields[f"{idx}:status"] = "pending"
+        self._client.hset(self._key(prediction_id), mapping=fields)
+        return prediction_id
+
+    def get_num_inputs(self, prediction_id: str) -> int:
+        n = self._client.hget(self._key(prediction_id), "n")
+        if n is None:
+            raise server_exceptions.PredictionIDNotFound(prediction_id)
+        return int(n)
+
+    def set_log_path(self, input_ids: t.List[str], log_path: Path) -> None:
+        pipe = self._client.pipeline(transaction=False)
+        for input_id in input_ids:
+            pipe.hset(self._key_of_input(input_id), f"{_get_idx(input_id)}:log", str(log_path))
+        pipe.execute()
+
+    def set_running(self, input_ids: t.List[str]) -> None:
+        self._set_running_script(
+            keys=[self._key_of_input(input_id) for input_id in input_ids],
+            args=[_get_idx(input_id) for input_id in input_ids],
+        )
+
+    def set_success(
+        self,
+        input_ids: t.List[str],
+        outputs: t.List[t.Dict],
+        demo_outputs: t.List[t.Optional[t.Dict]],
+    ) -> None:
+        args: t.List[t.Union[str, int]] = [self._channel, self._expiration_ms]
+        for input_id, output, demo_output in zip(input_ids, outputs, demo_outputs):
+            args.extend(
+                [
+                    get_prediction_id_from_input_id(input_id),
+                    _get_idx(input_id),
+                    json.dumps(output),
+                    json.dumps(demo_output) if demo_output is not None else "",
+                ]
+            )
+        self._set_success_script(
+            keys=[self._key_of_input(input_id) for input_id in input_ids], args=args
+        )
+
+    def set_failure(self, prediction_id: str, error_message: str) -> None:
+        self._set_failure_script(
+            keys=[self._key(prediction_id)],
+            args=[self._channel, self._expiration_ms, prediction_id, error_message],
+        )
+
+    def get_result(self, prediction_id: str) -> Result:
+        fields = self._client.hgetall(self._key(prediction_id))
+        if not fields:
+            raise server_exceptions.PredictionIDNotFound(prediction_id)
+
+        indices = [str(idx) for idx in range(int(fields["n"]))]
+        status = aggregate_statuses(
+            [t.cast(PredictionStatus, fields[f"{idx}:status"]) for idx in indices]
+        )
+        log_paths = list(
+            dict.fromkeys(fields[f"{idx}:log"] for idx in indices if f"{idx}:log" in fields)
+        )
+        log = _read_logs(log_paths) if log_paths else None
+
+        if status == "failed":
+            error_message = next(
+                (fields[f"{idx}:error"] for idx in indices if f"{idx}:error" in fields), None
+            )
+            return Result(status=status, error_message=error_message, logs=log)
+
+        if status == "success":
+            outputs = [json.loads(fields[f"{idx}:output"]) for idx in indices]
+            demo_outputs = None
+            if all(f"{idx}:demo" in fields for idx in indices):
+                demo_outputs = [json.loads(fields[f"{idx}:demo"]) for idx in indices]
+            return Result(status=status, outputs=outputs, logs=log, demo_outputs=demo_outputs)
+
+        return Result(status=status, logs=log)
+
+    def wait_until_done(self, prediction_id: str, timeout: float) -> None:
+        event = Event()
+        self._add_waiter(prediction_id, event)
+        try:
+            if self._is_done(prediction_id):
+                return None
+            if not event.wait(timeout=timeout):
+                raise server_exceptions.PredictionTimeout
+        finally:
+            self._remove_waiter(prediction_id, event)
+        return None
+
+    async def wait_until_done_async(self, prediction_id: str, timeout: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._add_waiter(prediction_id, future)
+        try:
+            if self._is_done(prediction_id):
+                return None
+            try:
+                await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                raise server_exceptions.PredictionTimeout
+        finally:
+            self._remove_waiter(prediction_id, future)
+        return None
+
+    def remove(self, prediction_id: str) -> None:
+        if not self._client.delete(self._key(prediction_id)):
+            raise server_exceptions.PredictionIDNotFound(prediction_id)
+        self._client.publish(self._channel, prediction_id)
+
+    def cleanup(self) -> None:
+        # Results expire in Redis
+        pass
+
+    def get_stats(self) -> ResultCacheStats:
+        return ResultCacheStats()
+
+    def run(self):
+        for message in self._pubsub.listen():
+            if message["type"] == "message":
+                self._notify_waiters(message["data"])
+
+    @property
+    def _expiration_ms(self) -> int:
+        return max(int(self._expiration * 1000), 1)
+
+    def _key(self, prediction_id: str) -> str:
+        return f"{self._prefix}:{prediction_id}"
+
+    def _key_of_input(self, input_id: str) -> str:
+        return self._key(get_prediction_id_from_input_id(input_id))
+
+    def _is_done(self, prediction_id: str) -> bool:
+        """Check if all inputs are done. A removed prediction is also regarded as done."""
+        n, done = self._client.hmget(self._key(prediction_id), ["n", "done"])
+        if n is None:
+            return True
+        return int(done) >= int(n)
+
+    def _add_waiter(self, prediction_id: str, waiter: t.Union[Event, asyncio.Future]) -> None:
+        if not self._client.exists(self._key(prediction_id)):
+            raise server_exceptions.PredictionIDNotFound(prediction_id)
+        with self._waiters_lock:
+            self._waiters.setdefault(prediction_id, []).append(waiter)
+
+    def _remove_waiter(self, prediction_id: str, waiter: t.Union[Event, asyncio.Future]) -> None:
+        with self._waiters_lock:
+            waiters = self._waiters.get(prediction_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self._waiters.pop(prediction_id, None)
+
+    def _notify_waiters(self, prediction_id: str) -> None:
+        with self._waiters_lock:
+            waiters = self._waiters.pop(prediction_id, [])
+        for waiter in waiters:
+            if isinstance(waiter, Event):
+                waiter.set()
+            else:
+                waiter.get_loop().call_soon_threadsafe(_resolve_future, waiter)
+        if waiters:
+            logger.debug(f"Notified {len(waiters)} waiters of prediction {prediction_id}")
+
+
+def _get_idx(input_id: str) -> str:
+    return str(get_input_index_from_input_id(input_id))
+
+
+def _read_logs(log_paths: t.List[str]) -> t.Optional[str]:
+    """Read logs written by this or other servers sharing the filesystem"""
+    logs = []
+    for log_path in log_paths:
+        try:
+            logs.append(Path(log_path).read_text())
+        except FileNotFoundError:
+            continue
+    return "\n".join(logs) if logs else None
+
+
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
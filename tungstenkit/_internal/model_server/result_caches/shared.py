@@ -6,6 +6,25 @@ from typing_extensions import Literal
 PredictionStatus = Literal["pending", "running", "success", "failed"]
 
 
+def aggregate_statuses(statuses: t.List[PredictionStatus]) -> PredictionStatus:
+    """Get the status of a prediction from the statuses of its inputs"""
+    running_or_success_any = False
+    success_all = True
+    for status in statuses:
+        if status == "failed":
+            return "failed"
+
+        success = status == "success"
+        running = status == "running"
+        success_all &= success
+        running_or_success_any |= success or running
+    if success_all:
+        return "success"
+    if running_or_success_any:
+        return "running"
+    return "pending"
+
+
 @attrs.define(kw_only=True)
 class Result:
     status: PredictionStatus
@@ -13,3 +32,13 @@ class Result:
     demo_outputs: t.Optional[t.List[t.Dict]] = attrs.field(default=None)
     logs: t.Optional[str] = attrs.field(default=None)
     error_message: t.Optional[str] = attrs.field(default=None)
+
+
+@attrs.define(kw_only=True)
+class ResultCacheStats:
+    hits: int = 0
+    misses: int = 0
+    spills: int = 0
+    evictions: int = 0
+    memory_bytes: int = 0
+    disk_bytes: int = 0
@@ -0,0 +1,71 @@
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import typing as t
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+
+class SpillStore:
+    """
+    On-disk store for results spilled out of memory.
+    Least recently used entries are evicted when the store exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: t.Optional[int] = None):
+        self._max_bytes = max_bytes
+        self._dir: t.Optional[Path] = None
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._num_bytes = 0
+        self._lock = Lock()
+
+    @property
+    def num_bytes(self) -> int:
+        return self._num_bytes
+
+    def put(self, key: str, value: t.Any) -> t.List[str]:
+        """Store a jsonable value and return the keys evicted to stay within the budget"""
+        data = json.dumps(value).encode("utf-8")
+        with self._lock:
+            if self._dir is None:
+                self._dir = Path(tempfile.mkdtemp(prefix="tungsten-result-cache-"))
+                atexit.register(shutil.rmtree, self._dir, ignore_errors=True)
+            self._remove(key)
+            self._path(key).write_bytes(data)
+            self._sizes[key] = len(data)
+            self._num_bytes += len(data)
+
+            evicted: t.List[str] = []
+            while self._max_bytes is not None and self._num_bytes > self._max_bytes:
+                evicted_key = next(iter(self._sizes))
+                self._remove(evicted_key)
+                evicted.append(evicted_key)
+            return evicted
+
+    def get(self, key: str) -> t.Any:
+        with self._lock:
+            if key not in self._sizes:
+                raise KeyError(key)
+            self._sizes.move_to_end(key)
+            return json.loads(self._path(key).read_bytes())
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        size = self._sizes.pop(key, None)
+        if size is None:
+            return
+        self._num_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _path(self, key: str) -> Path:
+        assert self._dir is not None
+        return self._dir / f"{key}.json"
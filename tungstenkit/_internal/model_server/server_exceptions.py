@@ -31,3 +31,10 @@ class PredictionTimeout(TungstenException):
 
 class SubprocessTerminated(TungstenException):
     pass
+
+
+class PredictionRejected(TungstenException):
+    def __init__(self, reason: str, retry_after: float) -> None:
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{reason}. Retry after {retry_after:.1f}s.")
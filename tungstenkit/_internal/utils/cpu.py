@@ -0,0 +1,24 @@
+import os
+import typing as t
+
+
+def get_available_cpus() -> t.List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cpus(num_groups: int) -> t.List[t.Set[int]]:
+    """Split available CPUs into disjoint groups of (almost) equal sizes"""
+    cpus = get_available_cpus()
+    if num_groups > len(cpus):
+        raise ValueError(f"Cannot split {len(cpus)} CPUs into {num_groups} groups")
+
+    group_size, remainder = divmod(len(cpus), num_groups)
+    groups: t.List[t.Set[int]] = []
+    start = 0
+    for idx in range(num_groups):
+        end = start + group_size + (1 if idx < remainder else 0)
+        groups.append(set(cpus[start:end]))
+        start = end
+    return groups
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import shutil
 import tempfile
@@ -10,6 +11,8 @@ from pathspec import PathSpec
 if t.TYPE_CHECKING:
     from _typeshed import StrPath
 
+BUF_SIZE_FOR_HASHING = 1048576  # 1MB
+
 
 def format_file_size(size_in_bytes: int, suffix="B"):
     num = float(size_in_bytes)
@@ -121,3 +124,15 @@ def get_file_size(p: Path, follow_symlinks: bool = False) -> int:
     if not follow_symlinks and p.is_symlink():
         return p.lstat().st_size
     return p.stat().st_size
+
+
+def hash_file(path: Path) -> str:
+    """Get the SHA-256 hex digest of a file"""
+    hash_ = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(BUF_SIZE_FOR_HASHING)
+            if not data:
+                break
+            hash_.update(data)
+    return hash_.hexdigest()
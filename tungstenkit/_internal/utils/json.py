@@ -55,3 +55,14 @@ def change_strings_in_jsonable(jsonable: t.Any, values: t.List[str], updates: t.
     if len(values) > 0:
         return apply_to_jsonable(jsonable, cond=lambda o: isinstance(o, str), fn=fn)
     return jsonable
+
+
+def get_jsonable_size(jsonable: t.Any) -> int:
+    """Estimate the memory size of a jsonable object, dominated by the lengths of strings"""
+    if isinstance(jsonable, str):
+        return len(jsonable)
+    if isinstance(jsonable, dict):
+        return sum(len(key) + get_jsonable_size(value) for key, value in jsonable.items())
+    if isinstance(jsonable, list):
+        return sum(get_jsonable_size(item) for item in jsonable)
+    return 8
@@ -0,0 +1,39 @@
+import typing as t
+from pathlib import Path
+
+import attrs
+
+
+@attrs.frozen(kw_only=True)
+class MemoryUsage:
+    rss: int
+    """Resident set size in bytes"""
+    pss: int
+    """Proportional set size in bytes. Shared pages are divided among processes sharing them."""
+    uss: int
+    """Unique set size in bytes. Only pages private to the process are counted."""
+
+
+def get_memory_usage(pid: int) -> t.Optional[MemoryUsage]:
+    """Read memory usage of a process from procfs. Returns ``None`` if unavailable."""
+    try:
+        text = Path(f"/proc/{pid}/smaps_rollup").read_text()
+    except OSError:
+        return None
+
+    values: t.Dict[str, int] = dict()
+    for line in text.splitlines()[1:]:
+        try:
+            key, val = line.split(":", maxsplit=1)
+            values[key] = int(val.split()[0]) * 1024
+        except (ValueError, IndexError):
+            continue
+
+    try:
+        return MemoryUsage(
+            rss=values["Rss"],
+            pss=values["Pss"],
+            uss=values["Private_Clean"] + values["Private_Dirty"],
+        )
+    except KeyError:
+        return None
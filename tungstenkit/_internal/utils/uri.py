@@ -1,11 +1,13 @@
+import base64
 import mimetypes
 import os
 import tempfile
 from pathlib import Path, PurePath, PurePosixPath
-from typing import TYPE_CHECKING, List, TypeVar
+from typing import TYPE_CHECKING, List, Optional, TypeVar
 from urllib.parse import unquote
 from uuid import uuid4
 
+from binaryornot.helpers import is_binary_string
 from furl import furl
 from w3lib.url import parse_data_uri
 
@@ -16,6 +18,9 @@ if TYPE_CHECKING:
 
 T = TypeVar("T", bound=PurePath)
 
+# Multiple of 3, so that base64 of chunks can be concatenated without padding in between
+DATA_URI_CHUNK_SIZE = 3 * 1024 * 1024
+
 
 def get_uri_scheme(uri_str: str) -> str:
     return furl(uri_str[:50]).scheme
@@ -88,6 +93,43 @@ def save_data_url(data_url: str, directory: "StrPath") -> Path:
     return Path(path).resolve()
 
 
+def build_data_uri_from_path(
+    path: Path, mimetype: Optional[str] = None, chunk_size: int = DATA_URI_CHUNK_SIZE
+) -> str:
+    """
+    Encode a file as a base64 data uri, reading it in chunks.
+
+    Chunks are encoded into a buffer preallocated for the whole data uri, so that neither
+    the whole file nor another copy of the encoded data is held in memory. If ``mimetype``
+    is not given, it's guessed from the file name, or from the first chunk.
+    """
+    assert chunk_size % 3 == 0
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        chunk = f.read(chunk_size)
+        if mimetype is None:
+            mimetype = mimetypes.guess_type(path.name, strict=False)[0]
+        if mimetype is None:
+            mimetype = (
+                "application/octet-stream" if is_binary_string(chunk[:1024]) else "text/plain"
+            )
+
+        header = f"data:{mimetype};base64,".encode()
+        pos = len(header)
+        buf = bytearray(pos + (size + 2) // 3 * 4)
+        buf[:pos] = header
+        while chunk:
+            encoded = base64.b64encode(chunk)
+            end = pos + len(encoded)
+            buf[pos:end] = encoded
+            pos = end
+            chunk = f.read(chunk_size)
+
+    # The file may have been changed since its size was read
+    del buf[pos:]
+    return buf.decode("ascii")
+
+
 def strip_scheme_in_http_url(http_url: str) -> str:
     f = furl(http_url)
     if f.scheme == "http" or f.scheme == "https":